@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Load test for database access from the event loop.
+
+Runs concurrent slow queries (pg_sleep) on one event loop alongside a
+stream of quick requests (SELECT 1 through the same layer) and reports the
+quick requests' latency percentiles. With the synchronous psycopg2 helpers
+every slow query blocks the loop, so quick requests queue behind it; with
+the asyncpg layer the quick requests' tail latency should stay close to the
+idle baseline.
+
+Example:
+    python benchmark_async_db.py --slow-queries 8 --slow-seconds 0.5 --quick-requests 200
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import numpy as np
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.async_database import async_db_connection, close_async_pool, get_async_pool
+from utils.database import DB_POOL_MAX_SIZE, close_pool, db_connection
+
+async def sync_query(sql: str):
+    """Run a query the way the handlers used to: psycopg2 called on the loop."""
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(sql)
+        cursor.fetchall()
+        cursor.close()
+        conn.rollback()
+
+async def async_query(sql: str):
+    async with async_db_connection() as conn:
+        await conn.fetch(sql)
+
+async def run(query, args) -> np.ndarray:
+    """Latencies in ms of quick requests issued while slow queries are running."""
+    async def slow():
+        for _ in range(args.slow_rounds):
+            await query(f"SELECT pg_sleep({args.slow_seconds})")
+
+    async def quick(latencies):
+        for _ in range(args.quick_requests):
+            # Measured from when the request was due, so time spent waiting
+            # for a blocked loop to wake the coroutine counts as well
+            due = time.perf_counter() + args.quick_interval
+            await asyncio.sleep(args.quick_interval)
+            await query("SELECT 1")
+            latencies.append(1000 * (time.perf_counter() - due))
+
+    latencies = []
+    await asyncio.gather(quick(latencies), *(slow() for _ in range(args.slow_queries)))
+    return np.array(latencies)
+
+def report(name: str, latencies: np.ndarray):
+    print(f"{name:<10} p50 {np.percentile(latencies, 50):8.2f} ms   p99 {np.percentile(latencies, 99):8.2f} ms   "
+          f"max {latencies.max():8.2f} ms")
+
+async def main_async(args):
+    idle = argparse.Namespace(**dict(vars(args), slow_queries=0))
+
+    await get_async_pool()
+    report("idle", await run(async_query, idle))
+    report("async", await run(async_query, args))
+    await close_async_pool()
+    if not args.skip_sync:
+        report("sync", await run(sync_query, args))
+        close_pool()
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure request latency on the event loop under concurrent slow queries.")
+    parser.add_argument("--slow-queries", type=int, default=8, help="Concurrent slow query loops")
+    parser.add_argument("--slow-seconds", type=float, default=0.5, help="Duration of each slow query")
+    parser.add_argument("--slow-rounds", type=int, default=4, help="Slow queries per loop")
+    parser.add_argument("--quick-requests", type=int, default=200, help="Quick requests timed")
+    parser.add_argument("--quick-interval", type=float, default=0.01, help="Pause between quick requests in seconds")
+    parser.add_argument("--skip-sync", action="store_true", help="Only measure the async layer")
+    args = parser.parse_args()
+    if args.slow_queries >= DB_POOL_MAX_SIZE:
+        # The quick requests need a connection while every slow query holds one
+        parser.error(f"--slow-queries must be below DB_POOL_MAX_SIZE ({DB_POOL_MAX_SIZE})")
+    asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
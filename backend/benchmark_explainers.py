@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Benchmark the exact explainers against the generic SHAP explainer.
+
+For each sample it times one explanation from the model-specific explainer
+(linear log-probability contributions for the message model, decision-path
+attribution for the URL forest) and from shap.Explainer wrapped around
+predict_proba, then reports how often both agree on the top features for
+the predicted class and how well the exact attributions add up to the
+model's own probabilities.
+
+Example:
+    python benchmark_explainers.py --messages messages.txt --urls urls.txt --samples 20
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import shap
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from models.message_classifier import MessageClassifier
+from models.url_classifier import URLClassifier
+from models.explainers import top_feature_indices
+
+def read_lines(path: str, limit: int) -> list:
+    """Read up to limit non-empty lines."""
+    lines = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                lines.append(line)
+            if len(lines) == limit:
+                break
+    return lines
+
+def _generic_top_features(values: np.ndarray, class_index: int, k: int) -> list:
+    """Top-k feature indices by absolute SHAP value for one class."""
+    class_values = values[:, class_index]
+    order = np.argsort(-np.abs(class_values), kind='stable')
+    return [int(i) for i in order[:k] if class_values[i] != 0]
+
+def _summarize(name: str, exact_times: list, generic_times: list, overlaps: list, additivity: list):
+    exact_ms = 1000 * float(np.mean(exact_times))
+    generic_ms = 1000 * float(np.mean(generic_times))
+    print(f"{name}: {len(exact_times)} samples")
+    print(f"  exact explainer:   {exact_ms:.3f} ms/explanation")
+    print(f"  generic explainer: {generic_ms:.3f} ms/explanation ({generic_ms / exact_ms:.0f}x slower)")
+    print(f"  top-feature agreement: {np.mean(overlaps):.2%}")
+    print(f"  max additivity error vs predict_proba: {max(additivity):.2e}")
+
+def benchmark_messages(model: MessageClassifier, messages: list, top_k: int):
+    """Compare the contribution explainer with permutation SHAP on the message model."""
+    vectorizer = model.model.named_steps['vectorizer']
+    classifier = model.model.named_steps['classifier']
+    vectors = vectorizer.transform([model.preprocess(m) for m in messages])
+
+    # The generic explainer needs dense rows and at least 2 * n_features + 1 evaluations
+    background = vectors.toarray()
+    generic = shap.Explainer(classifier.predict_proba, background)
+    max_evals = 2 * vectors.shape[1] + 1
+
+    exact_times, generic_times, overlaps, additivity = [], [], [], []
+    for i in range(vectors.shape[0]):
+        row = vectors[i]
+        started = time.perf_counter()
+        explanation = model.explainer.explain(row)
+        exact_times.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        generic_values = generic(row.toarray(), max_evals=max_evals).values[0]
+        generic_times.append(time.perf_counter() - started)
+
+        probabilities = classifier.predict_proba(row)[0]
+        class_index = int(np.argmax(probabilities))
+        additivity.append(float(np.abs(model.explainer.probabilities(explanation) - probabilities).max()))
+        overlaps.append(_overlap(
+            top_feature_indices(explanation, class_index, top_k),
+            _generic_top_features(generic_values, class_index, top_k)
+        ))
+
+    _summarize("Message model", exact_times, generic_times, overlaps, additivity)
+
+def benchmark_urls(model: URLClassifier, urls: list, top_k: int):
+    """Compare decision-path attribution with permutation SHAP on the URL forest."""
+    features = model.extract_features_batch(urls)
+    scaled = model.scaler.transform(features)
+    generic = shap.Explainer(model.model.predict_proba, scaled)
+
+    exact_times, generic_times, overlaps, additivity = [], [], [], []
+    for i in range(len(urls)):
+        started = time.perf_counter()
+        explanation = model.explainer.explain(features[i])
+        exact_times.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        generic_values = generic(scaled[i:i + 1]).values[0]
+        generic_times.append(time.perf_counter() - started)
+
+        probabilities = model.model.predict_proba(scaled[i:i + 1])[0]
+        class_index = int(np.argmax(probabilities))
+        additivity.append(float(np.abs(model.explainer.probabilities(explanation) - probabilities).max()))
+        overlaps.append(_overlap(
+            top_feature_indices(explanation, class_index, top_k),
+            _generic_top_features(generic_values, class_index, top_k)
+        ))
+
+    _summarize("URL model", exact_times, generic_times, overlaps, additivity)
+
+def _overlap(exact: list, generic: list) -> float:
+    """Share of the exact explainer's top features that the generic one also ranks on top."""
+    if not exact:
+        return 1.0 if not generic else 0.0
+    return len(set(exact) & set(generic)) / len(exact)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark exact explainers against generic SHAP.")
+    parser.add_argument("--messages", help="Text file with one message per line")
+    parser.add_argument("--urls", help="Text file with one URL per line")
+    parser.add_argument("--samples", type=int, default=20, help="Items explained per model")
+    parser.add_argument("--top-k", type=int, default=5, help="Features compared for agreement")
+    parser.add_argument("--message-model", default=os.getenv("MESSAGE_MODEL_PATH", "models/message_model.pkl"))
+    parser.add_argument("--url-model", default=os.getenv("URL_MODEL_PATH", "models/url_model.pkl"))
+    args = parser.parse_args()
+    if not args.messages and not args.urls:
+        parser.error("Give --messages and/or --urls")
+
+    if args.messages:
+        message_model = MessageClassifier(args.message_model)
+        message_model.load_model()
+        if message_model.explainer is None:
+            sys.exit("Message model has no exact explainer (is it trained?)")
+        benchmark_messages(message_model, read_lines(args.messages, args.samples), args.top_k)
+
+    if args.urls:
+        url_model = URLClassifier(args.url_model)
+        url_model.load_model()
+        if url_model.explainer is None:
+            sys.exit("URL model has no exact explainer (is it a trained random forest?)")
+        benchmark_urls(url_model, read_lines(args.urls, args.samples), args.top_k)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Bulk scanner for retroactive sweeps over archived messages and URLs.
+
+Streams a JSONL or CSV file in chunks, scores the chunks in a process pool
+where every worker loads the classifiers once, and writes one NDJSON verdict
+per input item in input order. Progress is checkpointed after every chunk so
+an interrupted run can be resumed with --resume.
+
+Example:
+    python bulk_scan.py proxy_urls.csv verdicts.ndjson --scan-type url --workers 8
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Tuple
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+SCAN_TYPES = ("message", "url", "email", "password")
+
+# Classifiers loaded once per worker process by _init_worker
+_worker_models = {}
+
+def read_records(path: str, input_format: str) -> Iterator[Dict[str, Any]]:
+    """Yield input records one at a time without loading the whole file."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if input_format == "csv":
+            for row in csv.DictReader(f):
+                yield row
+        else:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield {"_error": f"Invalid JSON: {e}"}
+                    continue
+                # Workers read fields from records, so a bare string or list is an error row too
+                yield record if isinstance(record, dict) else {"_error": "expected a JSON object"}
+
+def read_chunks(records: Iterator[Dict[str, Any]], chunk_size: int, skip: int = 0) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+    """Group records into (first_item_index, records) chunks, skipping the first skip records."""
+    index = 0
+    chunk = []
+    for record in records:
+        if index < skip:
+            index += 1
+            continue
+        chunk.append(record)
+        if len(chunk) == chunk_size:
+            yield index - len(chunk) + 1, chunk
+            chunk = []
+        index += 1
+    if chunk:
+        yield index - len(chunk), chunk
+
+def _init_worker(message_model_path: str, url_model_path: str):
+    """Load the classifiers once for this worker process."""
+    from models.message_classifier import MessageClassifier
+    from models.url_classifier import URLClassifier
+    from services.breach_service import BreachService
+
+    message_model = MessageClassifier(message_model_path)
+    message_model.load_model()
+    url_model = URLClassifier(url_model_path)
+    url_model.load_model()
+
+    _worker_models["message"] = message_model
+    _worker_models["url"] = url_model
+    _worker_models["breach"] = BreachService()
+
+def _scan_chunk(first_index: int, records: List[Dict[str, Any]], options: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Score one chunk in a worker, returning verdicts in the chunk's order."""
+    verdicts = []
+    groups = {}
+    for offset, record in enumerate(records):
+        verdict = {"index": first_index + offset}
+        if options["id_field"] and options["id_field"] in record:
+            verdict["id"] = record[options["id_field"]]
+
+        scan_type = record.get(options["type_field"]) or options["scan_type"]
+        content = record.get(options["content_field"])
+        verdict["scan_type"] = scan_type
+        if "_error" in record:
+            verdict["error"] = record["_error"]
+        elif scan_type not in SCAN_TYPES:
+            verdict["error"] = f"Unsupported scan type: {scan_type}"
+        elif not isinstance(content, str):
+            verdict["error"] = f"Missing '{options['content_field']}' field"
+        else:
+            groups.setdefault(scan_type, []).append((offset, content))
+        verdicts.append(verdict)
+
+    for scan_type, items in groups.items():
+        contents = [content for _, content in items]
+        try:
+            if scan_type in ("message", "url"):
+                predictions = _worker_models[scan_type].predict_batch(contents)
+            elif scan_type == "email":
+                predictions = [_email_verdict(content) for content in contents]
+            else:
+                predictions = [_password_verdict(content) for content in contents]
+        except Exception as e:
+            for offset, _ in items:
+                verdicts[offset]["error"] = f"Analysis failed: {str(e)}"
+            continue
+
+        for (offset, _), prediction in zip(items, predictions):
+            verdicts[offset].update(prediction)
+
+    return verdicts
+
+def _email_verdict(email: str) -> Dict[str, Any]:
+    breach_result = _worker_models["breach"].check_email_breaches(email)
+    return {
+        "prediction": "breach_detected" if breach_result["breach_count"] > 0 else "safe",
+        "confidence": min(breach_result["breach_count"] / 10.0, 1.0)
+    }
+
+def _password_verdict(password: str) -> Dict[str, Any]:
+    password_result = _worker_models["breach"].check_password_safety(password)
+    return {
+        "prediction": password_result["safety_status"],
+        "confidence": 0.9 if password_result["safety_status"] == "compromised" else 0.1
+    }
+
+def load_checkpoint(checkpoint_path: str, input_path: str) -> Dict[str, Any]:
+    """Return the saved progress for input_path, or a fresh start."""
+    if not os.path.exists(checkpoint_path):
+        return {"items_done": 0, "output_bytes": 0}
+    with open(checkpoint_path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("input") != os.path.abspath(input_path):
+        raise SystemExit(f"Checkpoint {checkpoint_path} belongs to {checkpoint.get('input')}, not {input_path}")
+    return checkpoint
+
+def save_checkpoint(checkpoint_path: str, input_path: str, items_done: int, output_bytes: int):
+    """Atomically record how many items have been durably written."""
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({
+            "input": os.path.abspath(input_path),
+            "items_done": items_done,
+            "output_bytes": output_bytes
+        }, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, checkpoint_path)
+
+def run(args) -> int:
+    input_format = args.format
+    if input_format == "auto":
+        input_format = "csv" if args.input.lower().endswith(".csv") else "jsonl"
+    checkpoint_path = args.checkpoint or f"{args.output}.checkpoint"
+
+    checkpoint = {"items_done": 0, "output_bytes": 0}
+    if args.resume:
+        checkpoint = load_checkpoint(checkpoint_path, args.input)
+    items_done = checkpoint["items_done"]
+
+    # Drop anything written after the last checkpoint before appending again
+    output = open(args.output, "ab" if args.resume else "wb")
+    output.truncate(checkpoint["output_bytes"])
+    output.seek(checkpoint["output_bytes"])
+    if items_done:
+        print(f"Resuming after {items_done} items", file=sys.stderr)
+
+    options = {
+        "content_field": args.content_field,
+        "type_field": args.type_field,
+        "id_field": args.id_field,
+        "scan_type": args.scan_type
+    }
+    chunks = read_chunks(read_records(args.input, input_format), args.chunk_size, skip=items_done)
+    max_in_flight = args.workers * 2
+    started = time.monotonic()
+    scanned = 0
+
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        initializer=_init_worker,
+        initargs=(args.message_model, args.url_model)
+    ) as pool:
+        pending = deque()
+        exhausted = False
+        while pending or not exhausted:
+            # Keep a bounded number of chunks in flight so memory stays flat
+            while not exhausted and len(pending) < max_in_flight:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                else:
+                    pending.append(pool.submit(_scan_chunk, chunk[0], chunk[1], options))
+            if not pending:
+                break
+
+            # Write results strictly in submission (= input) order
+            verdicts = pending.popleft().result()
+            output.write("".join(json.dumps(verdict) + "\n" for verdict in verdicts).encode("utf-8"))
+            output.flush()
+            os.fsync(output.fileno())
+
+            items_done += len(verdicts)
+            scanned += len(verdicts)
+            save_checkpoint(checkpoint_path, args.input, items_done, output.tell())
+
+            elapsed = time.monotonic() - started
+            rate = scanned / elapsed if elapsed > 0 else 0.0
+            print(f"{items_done} items done, {rate:.1f} items/s", file=sys.stderr)
+
+    output.close()
+    elapsed = time.monotonic() - started
+    print(f"Finished: {scanned} items scanned in {elapsed:.1f}s -> {args.output}", file=sys.stderr)
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan a JSONL or CSV file of messages/URLs and write NDJSON verdicts.")
+    parser.add_argument("input", help="Input JSONL or CSV file")
+    parser.add_argument("output", help="Output NDJSON file")
+    parser.add_argument("--format", choices=["auto", "jsonl", "csv"], default="auto", help="Input format (default: by extension)")
+    parser.add_argument("--scan-type", choices=SCAN_TYPES, default="message", help="Scan type for records without a type field")
+    parser.add_argument("--content-field", default="content", help="Field holding the content to scan")
+    parser.add_argument("--type-field", default="scan_type", help="Field holding the scan type")
+    parser.add_argument("--id-field", default=None, help="Field copied into each verdict as 'id'")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Records per worker task")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--message-model", default=os.getenv("MESSAGE_MODEL_PATH", "models/message_model.pkl"))
+    parser.add_argument("--url-model", default=os.getenv("URL_MODEL_PATH", "models/url_model.pkl"))
+    parser.add_argument("--checkpoint", default=None, help="Checkpoint file (default: OUTPUT.checkpoint)")
+    parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint of an earlier run")
+    args = parser.parse_args()
+    sys.exit(run(args))
+
+if __name__ == "__main__":
+    main()
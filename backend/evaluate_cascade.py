@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Offline evaluator for the cascade's first stage.
+
+Fits a logistic regression first stage on the features a trained model
+already uses (scaled URL features, or the message model's TF-IDF/hashed
+vectors), then replays a held-out split through the cascade at each
+threshold. For every threshold it prints how many inputs the first stage
+settles, how often those exits disagree with the true label and with the
+full model, the cascade's accuracy next to the full model's, and the
+estimated time per scan. With --write, the thresholds with the most exits
+whose accuracy cost stays within --max-accuracy-loss are saved next to the
+model, where workers with CASCADE_INFERENCE=on pick them up.
+
+Example:
+    python evaluate_cascade.py message labelled_messages.jsonl --max-accuracy-loss 0.002 --write
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bulk_scan import read_records
+from train_pipeline import label_ids_for, split_records
+from models.cascade import FirstStage, cascade_path_for
+from models.message_classifier import MessageClassifier
+from models.url_classifier import URLClassifier
+
+MODEL_TYPES = ("message", "url")
+
+DEFAULT_THRESHOLDS = "0.8,0.9,0.95,0.98,0.99,0.995,0.999"
+
+# Items timed one at a time to estimate per-scan latency of each stage
+TIMED_ITEMS = 200
+
+def _load_model(args):
+    if args.model_type == "url":
+        model = URLClassifier(args.model)
+    else:
+        model = MessageClassifier(args.model)
+    model.load_model()
+    # Compare against the full model alone, whatever the environment says
+    model.first_stage = None
+    return model
+
+def _features(model, contents: List[str]):
+    """Rows the first stage scores: raw URL features or transformed messages."""
+    if isinstance(model, URLClassifier):
+        return model.extract_features_batch(contents)
+    processed_messages = [model.preprocess(message) for message in contents]
+    return model.model.named_steps['vectorizer'].transform(processed_messages)
+
+def _model_classes(model) -> List[Any]:
+    if isinstance(model, URLClassifier):
+        return list(model.model.classes_)
+    return list(model.model.named_steps['classifier'].classes_)
+
+def fit_first_stage(model, contents: List[str], labels: List[int], C: float) -> FirstStage:
+    """Fit the first stage on labelled rows; alerts are the top label (malicious or scam)."""
+    X = _features(model, contents)
+    mean = scale = None
+    if isinstance(model, URLClassifier) and hasattr(model.scaler, 'mean_'):
+        mean, scale = model.scaler.mean_, model.scaler.scale_
+    return FirstStage.fit(X, labels, _model_classes(model), 0, max(model.label_map), model.model_version,
+                          mean=mean, scale=scale, C=C)
+
+def _mean_ms(function, items: List[Any]) -> float:
+    started = time.perf_counter()
+    for item in items:
+        function(item)
+    return 1000 * (time.perf_counter() - started) / max(len(items), 1)
+
+def evaluate(model, first_stage: FirstStage, contents: List[str], labels: List[int],
+             thresholds: List[float]) -> Dict[str, Any]:
+    """Replay held-out rows through the cascade at each (safe, alert) threshold pair."""
+    y = np.asarray(labels)
+    label_ids = {name: label for label, name in model.label_map.items()}
+    full = np.array([label_ids.get(p["prediction"], -1) for p in model.predict_batch(contents)])
+    full_accuracy = float(np.mean(full == y))
+
+    # Per-scan latency: features plus the first stage on one row, versus the
+    # full analyze (prediction and explanation) an escalated scan also pays for
+    timed = contents[:TIMED_ITEMS]
+    first_stage_ms = _mean_ms(lambda content: first_stage.settle(_features(model, [content])), timed)
+    if isinstance(model, URLClassifier):
+        full_ms = _mean_ms(model.analyze, timed)
+    else:
+        full_ms = _mean_ms(lambda message: model.analyze(message, include_shap=False), timed)
+
+    X = _features(model, contents)
+    rows = []
+    for safe_threshold, alert_threshold in thresholds:
+        settled, first, _ = first_stage.settle(X, safe_threshold, alert_threshold)
+        cascade = np.where(settled, first, full)
+        exits = int(settled.sum())
+        exit_rate = exits / len(y)
+        cascade_accuracy = float(np.mean(cascade == y))
+        rows.append({
+            "safe_threshold": safe_threshold,
+            "alert_threshold": alert_threshold,
+            "exit_rate": exit_rate,
+            "exit_error": float(np.mean(first[settled] != y[settled])) if exits else 0.0,
+            "exit_disagreement": float(np.mean(first[settled] != full[settled])) if exits else 0.0,
+            "cascade_accuracy": cascade_accuracy,
+            "accuracy_cost": full_accuracy - cascade_accuracy,
+            "estimated_ms": first_stage_ms + (1 - exit_rate) * full_ms
+        })
+    return {
+        "rows": len(y),
+        "full_model_accuracy": full_accuracy,
+        "first_stage_ms": first_stage_ms,
+        "full_model_ms": full_ms,
+        "thresholds": rows
+    }
+
+def choose(report: Dict[str, Any], max_accuracy_loss: float):
+    """Threshold pair with the most exits whose accuracy cost is within budget, or None."""
+    allowed = [row for row in report["thresholds"] if row["accuracy_cost"] <= max_accuracy_loss]
+    return max(allowed, key=lambda row: (row["exit_rate"], -row["accuracy_cost"]), default=None)
+
+def _print_report(report: Dict[str, Any], chosen):
+    print(f"{report['rows']} held-out rows; full model accuracy {report['full_model_accuracy']:.4f}, "
+          f"{report['full_model_ms']:.3f} ms per scan; first stage {report['first_stage_ms']:.3f} ms per scan")
+    print(f"{'safe':>6} {'alert':>6} {'exits':>7} {'exit err':>9} {'vs full':>8} {'accuracy':>9} {'cost':>8} {'ms/scan':>8}")
+    for row in report["thresholds"]:
+        marker = " *" if row is chosen else ""
+        print(f"{row['safe_threshold']:>6} {row['alert_threshold']:>6} {row['exit_rate']:>7.1%} {row['exit_error']:>9.2%} "
+              f"{row['exit_disagreement']:>8.2%} {row['cascade_accuracy']:>9.4f} {row['accuracy_cost']:>8.4f} "
+              f"{row['estimated_ms']:>8.3f}{marker}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit the cascade's first stage and measure the accuracy cost of its thresholds.")
+    parser.add_argument("model_type", choices=MODEL_TYPES)
+    parser.add_argument("input", help="Labelled JSONL or CSV file")
+    parser.add_argument("--model", default=None, help="Trained model file (default: MESSAGE_MODEL_PATH / URL_MODEL_PATH)")
+    parser.add_argument("--format", choices=["auto", "jsonl", "csv"], default="auto", help="Input format (default: by extension)")
+    parser.add_argument("--content-field", default="content", help="Field holding the message or URL")
+    parser.add_argument("--label-field", default="label", help="Field holding the label name or number")
+    parser.add_argument("--max-rows", type=int, default=100000, help="Labelled rows read from the input")
+    parser.add_argument("--eval-fraction", type=float, default=0.3, help="Share of rows held out for the evaluation")
+    parser.add_argument("--thresholds", default=DEFAULT_THRESHOLDS, help="Comma-separated probability thresholds to try")
+    parser.add_argument("--pairs", action="store_true", help="Try every safe/alert combination instead of equal thresholds")
+    parser.add_argument("--C", type=float, default=1.0, help="Inverse regularization strength of the first stage")
+    parser.add_argument("--max-accuracy-loss", type=float, default=0.005, help="Accuracy the cascade may lose against the full model")
+    parser.add_argument("--write", action="store_true", help="Save the first stage with the chosen thresholds next to the model")
+    parser.add_argument("--report", default=None, help="Also write the evaluation to this JSON file")
+    args = parser.parse_args()
+
+    if args.model is None:
+        args.model = (os.getenv("MESSAGE_MODEL_PATH", "models/message_model.pkl") if args.model_type == "message"
+                      else os.getenv("URL_MODEL_PATH", "models/url_model.pkl"))
+    if args.format == "auto":
+        args.format = "csv" if args.input.lower().endswith(".csv") else "jsonl"
+    try:
+        values = sorted(float(value) for value in args.thresholds.split(","))
+    except ValueError:
+        parser.error(f"Thresholds must be numbers: {args.thresholds}")
+    thresholds = list(itertools.product(values, values)) if args.pairs else [(value, value) for value in values]
+
+    model = _load_model(args)
+    records = list(itertools.islice(read_records(args.input, args.format), args.max_rows))
+    parts, skipped = split_records(records, {
+        "content_field": args.content_field,
+        "label_field": args.label_field,
+        "label_ids": label_ids_for(model.label_map),
+        "validation_fraction": args.eval_fraction
+    })
+    (fit_contents, fit_labels), (eval_contents, eval_labels) = parts["train"], parts["validation"]
+    if skipped:
+        print(f"Skipped {skipped} rows without content or a known label")
+    if not fit_contents or not eval_contents:
+        sys.exit("Need labelled rows on both sides of the split; check --eval-fraction and the input fields")
+
+    first_stage = fit_first_stage(model, fit_contents, fit_labels, args.C)
+    report = evaluate(model, first_stage, eval_contents, eval_labels, thresholds)
+    chosen = choose(report, args.max_accuracy_loss)
+    _print_report(report, chosen)
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(dict(report, chosen=chosen), f, indent=2)
+
+    if args.write:
+        if chosen is None:
+            sys.exit(f"No threshold keeps the accuracy cost within {args.max_accuracy_loss}; nothing written")
+        first_stage.safe_threshold = chosen["safe_threshold"]
+        first_stage.alert_threshold = chosen["alert_threshold"]
+        path = cascade_path_for(args.model)
+        first_stage.save(path)
+        print(f"Wrote {path} (safe {chosen['safe_threshold']}, alert {chosen['alert_threshold']}, "
+              f"{chosen['exit_rate']:.1%} exits); enable it with CASCADE_INFERENCE=on")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Export the trained classifiers to ONNX for the onnxruntime inference backend.
+
+Each graph is checked against the scikit-learn model on sample inputs and is
+only written if labels agree everywhere and probabilities stay within
+--atol. Single-item and batched latency of both backends is printed so the
+switch to INFERENCE_BACKEND=onnx can be judged on this machine.
+
+Example:
+    python export_onnx.py --messages messages.txt --urls urls.txt
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from models.message_classifier import MessageClassifier
+from models.url_classifier import URLClassifier
+from models.onnx_backend import (
+    OnnxClassifier,
+    export_message_model,
+    export_url_model,
+    message_onnx_inputs,
+    onnx_path_for,
+    write_onnx_model
+)
+
+# Items timed one at a time for the single-request latency
+SINGLE_LATENCY_ITEMS = 200
+
+def read_lines(path: str) -> list:
+    """Read the non-empty lines of a sample file."""
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+def _time_per_item(score, items: list) -> float:
+    """Mean milliseconds per item when score is called on each item alone."""
+    items = items[:SINGLE_LATENCY_ITEMS]
+    started = time.perf_counter()
+    for item in items:
+        score(item)
+    return 1000 * (time.perf_counter() - started) / len(items)
+
+def _time_batch(score, batch) -> float:
+    """Milliseconds per item when score is called once on the whole batch."""
+    started = time.perf_counter()
+    score(batch)
+    return 1000 * (time.perf_counter() - started) / len(batch)
+
+def _report(name: str, parity: dict, sklearn_single: float, onnx_single: float,
+            sklearn_batch: float, onnx_batch: float):
+    print(f"{name}: parity on {parity['rows']} samples: "
+          f"labels {parity['label_agreement']:.2%}, max |dp| {parity['max_abs_diff']:.2e} "
+          f"-> {'ok' if parity['passed'] else 'FAILED'}")
+    print(f"  single: sklearn {sklearn_single:.3f} ms, onnx {onnx_single:.3f} ms")
+    print(f"  batch:  sklearn {sklearn_batch:.4f} ms/item, onnx {onnx_batch:.4f} ms/item")
+
+def export_messages(model: MessageClassifier, messages: list, args) -> bool:
+    serialized = export_message_model(model)
+    onnx_model = OnnxClassifier(serialized, args.threads, args.batch_threads)
+
+    vectorizer = model.model.named_steps['vectorizer']
+    processed = [model.preprocess(message) for message in messages]
+    inputs = message_onnx_inputs(vectorizer, processed)
+    expected_labels, expected_proba = model._predict_vectors(vectorizer.transform(processed))
+    parity = onnx_model.check_parity(inputs, expected_labels, expected_proba, args.atol)
+
+    _report(
+        "Message model", parity,
+        _time_per_item(lambda message: model.model.predict_proba([message]), processed),
+        _time_per_item(lambda message: onnx_model.predict_with_proba(message_onnx_inputs(vectorizer, [message])), processed),
+        _time_batch(model.model.predict_proba, processed),
+        _time_batch(lambda batch: onnx_model.predict_with_proba(message_onnx_inputs(vectorizer, batch)), processed)
+    )
+    return _write_if_ok(serialized, onnx_path_for(model.model_path), parity, args.force)
+
+def export_urls(model: URLClassifier, urls: list, args) -> bool:
+    serialized = export_url_model(model)
+    onnx_model = OnnxClassifier(serialized, args.threads, args.batch_threads)
+
+    features = model.extract_features_batch(urls) if urls else _synthetic_url_features(model)
+    scaled = model.scaler.transform(features)
+    parity = onnx_model.check_parity(
+        features, model.model.predict(scaled), model.model.predict_proba(scaled), args.atol
+    )
+
+    rows = [features[i:i + 1] for i in range(len(features))]
+    _report(
+        "URL model", parity,
+        _time_per_item(lambda row: model.model.predict_proba(model.scaler.transform(row)), rows),
+        _time_per_item(lambda row: onnx_model.predict_with_proba(row), rows),
+        _time_batch(lambda batch: model.model.predict_proba(model.scaler.transform(batch)), features),
+        _time_batch(lambda batch: onnx_model.predict_with_proba(batch), features)
+    )
+    return _write_if_ok(serialized, onnx_path_for(model.model_path), parity, args.force)
+
+def _synthetic_url_features(model: URLClassifier, rows: int = 1000) -> np.ndarray:
+    """Random feature rows spread like the training data, for when no URLs are given."""
+    rng = np.random.default_rng(0)
+    scaled = rng.normal(size=(rows, model.model.n_features_in_))
+    return np.abs(model.scaler.inverse_transform(scaled)).round()
+
+def _write_if_ok(serialized: bytes, path: str, parity: dict, force: bool) -> bool:
+    if not parity["passed"] and not force:
+        print("  not written: outputs differ from sklearn (use --force to write anyway)")
+        return False
+    write_onnx_model(serialized, path)
+    print(f"  wrote {path}")
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the classifiers to ONNX and check parity with sklearn.")
+    parser.add_argument("--messages", help="Text file with one sample message per line")
+    parser.add_argument("--urls", help="Text file with one sample URL per line (default: synthetic features)")
+    parser.add_argument("--message-model", default=os.getenv("MESSAGE_MODEL_PATH", "models/message_model.pkl"))
+    parser.add_argument("--url-model", default=os.getenv("URL_MODEL_PATH", "models/url_model.pkl"))
+    parser.add_argument("--skip-messages", action="store_true", help="Do not export the message model")
+    parser.add_argument("--skip-urls", action="store_true", help="Do not export the URL model")
+    parser.add_argument("--atol", type=float, default=1e-4, help="Allowed probability difference")
+    parser.add_argument("--threads", type=int, default=1, help="Intra-op threads for single items")
+    parser.add_argument("--batch-threads", type=int, default=os.cpu_count() or 1, help="Intra-op threads for batches")
+    parser.add_argument("--force", action="store_true", help="Write graphs even if the parity check fails")
+    args = parser.parse_args()
+
+    ok = True
+    if not args.skip_messages:
+        if not args.messages:
+            parser.error("--messages is required to check the message model (or pass --skip-messages)")
+        message_model = MessageClassifier(args.message_model)
+        message_model.load_model()
+        try:
+            ok = export_messages(message_model, read_lines(args.messages), args) and ok
+        except ValueError as e:
+            print(f"Message model: {e}")
+            ok = False
+
+    if not args.skip_urls:
+        url_model = URLClassifier(args.url_model)
+        url_model.load_model()
+        ok = export_urls(url_model, read_lines(args.urls) if args.urls else [], args) and ok
+
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,7 @@ from psycopg2.extras import RealDictCursor
 sys.path.append(os.path.join(os.path.dirname(__file__)))
 
 from utils.database import init_db
+from utils.migrations import run_migrations
 
 def create_model_directories():
     """Create directories for model files."""
@@ -50,7 +51,7 @@ def create_sample_models():
 def setup_database():
     """Set up the PostgreSQL database."""
     print("Initializing database...")
-    success = init_db()
+    success = init_db() and run_migrations() is not None
     if success:
         print("Database initialized successfully!")
     else:
@@ -1,16 +1,24 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
 import sys
 import os
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
 
 # Add the current directory to the path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from routes import auth_routes, scan_routes, risk_routes
+from utils.startup_profile import startup_profile
+
+# Time every module imported while the app is built, reported at startup and by /ready
+with startup_profile.import_timer(), startup_profile.phase("imports"):
+    from fastapi import FastAPI
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import JSONResponse
+    from dotenv import load_dotenv
+
+    # Load environment variables from .env file
+    load_dotenv()
+
+    from routes import auth_routes
+    from routes import scan_routes
+    from routes import risk_routes
 
 app = FastAPI(
     title="AI-Powered Personal Digital Safety Assistant",
@@ -43,17 +51,58 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    """Liveness, plus the database pool's utilization and the scan write queue."""
+    from utils.async_database import async_pool_stats
+    from utils.scan_writer import scan_writer_stats
+    return {"status": "healthy", "database_pool": async_pool_stats(), "scan_writer": scan_writer_stats()}
+
+@app.get("/ready")
+async def readiness_check():
+    """Ready only once models are loaded and warmed up; 503 until then."""
+    report = startup_profile.report()
+    if not startup_profile.ready:
+        return JSONResponse(status_code=503, content={"status": "starting", "startup": report})
+    return {"status": "ready", "startup": report}
 
 # Initialize database
 @app.on_event("startup")
 async def startup_event():
-    from utils.database import init_db
+    from utils.database import init_db, close_pool
+    from utils.async_database import get_async_pool
+    from utils.scan_writer import start_scan_writer
+    from utils.migrations import DB_MIGRATE_ON_STARTUP, start_background_migrations
     success = init_db()
     if success:
         print("Database initialized successfully")
+        # Index builds can take hours on a large scan_history, so they never
+        # hold up readiness; the first worker to get the lock runs them
+        if DB_MIGRATE_ON_STARTUP:
+            start_background_migrations()
     else:
         print("Failed to initialize database")
+    # Requests use the async pool; the blocking one was only needed for init_db
+    close_pool()
+    await get_async_pool()
+    await start_scan_writer()
+    
+    # Load the models and run dummy predictions before reporting ready
+    with startup_profile.phase("warm_up"):
+        scan_routes.warm_up()
+    
+    # Pick up newly activated model versions without a restart
+    scan_routes.start_model_polling()
+    
+    startup_profile.mark_ready()
+    startup_profile.print_report()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    from utils.async_database import close_async_pool
+    from utils.scan_writer import stop_scan_writer
+    # Write queued scan results while the pool is still open
+    await stop_scan_writer()
+    await close_async_pool()
+    scan_routes.explanation_service.close()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Apply or inspect database schema migrations.
+
+Migrations are listed in utils/migrations.py and recorded in the
+schema_migrations table once applied. Indexes on scan_history are built
+with CREATE INDEX CONCURRENTLY, so scans keep being written while they
+build. Run this as a deploy step; workers only migrate at startup when
+DB_MIGRATE_ON_STARTUP=true.
+
+Example:
+    python migrate.py status
+    python migrate.py up --target 2
+"""
+
+import argparse
+import os
+import sys
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.database import init_db
+from utils.migrations import migration_status, run_migrations
+
+def print_status() -> bool:
+    status = migration_status()
+    if status is None:
+        return False
+    print(f"Schema version {status['version']}")
+    for row in status["applied"]:
+        print(f"  {row['version']:>4}  applied {row['applied_at']:%Y-%m-%d %H:%M}  {row['description']}")
+    for migration in status["pending"]:
+        print(f"  {migration.version:>4}  pending                 {migration.description}")
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply or inspect database schema migrations.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("status", help="Show the schema version and pending migrations")
+    up = subparsers.add_parser("up", help="Create missing tables and apply pending migrations")
+    up.add_argument("--target", type=int, default=None, help="Stop after this version (default: all)")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        ok = print_status()
+    else:
+        ok = init_db() and run_migrations(target=args.target) is not None
+        if ok:
+            print_status()
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
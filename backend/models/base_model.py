@@ -1,7 +1,11 @@
 from abc import ABC, abstractmethod
 from typing import Dict, Any, List
+import hashlib
 import numpy as np
 
+# Version reported for a freshly constructed model that has not been loaded or trained
+DEFAULT_MODEL_VERSION = "default"
+
 class BaseModel(ABC):
     """Abstract base class for all ML models."""
     
@@ -31,6 +35,11 @@ class BaseModel(ABC):
         """Provide explanation for the prediction."""
         pass
     
+    @staticmethod
+    def compute_model_version(serialized_model: bytes) -> str:
+        """Derive a short, stable version identifier from pickled model bytes."""
+        return hashlib.sha256(serialized_model).hexdigest()[:12]
+    
     def get_confidence(self, prediction_proba: np.ndarray) -> float:
         """Extract confidence score from prediction probabilities."""
         if len(prediction_proba.shape) == 1:
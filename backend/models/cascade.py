@@ -0,0 +1,206 @@
+import os
+import pickle
+import threading
+import time
+import numpy as np
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+# "on" to settle confident inputs with the first stage written by evaluate_cascade.py
+CASCADE_INFERENCE = os.getenv("CASCADE_INFERENCE", "off")
+
+# Stage names reported in predictions and statistics
+FIRST_STAGE = "first_stage"
+FULL_MODEL = "full_model"
+
+def cascade_path_for(model_path: str) -> str:
+    """Default location of the first stage fitted for a pickled model."""
+    return os.path.splitext(model_path)[0] + ".cascade.pkl"
+
+class CascadeStats:
+    """Thread-safe counts of rows settled per stage and the time each stage took."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rows = 0
+        self.escalated = 0
+        self.first_stage_seconds = 0.0
+        self.full_model_seconds = 0.0
+
+    def record(self, rows: int, escalated: int, first_stage_seconds: float, full_model_seconds: float):
+        with self._lock:
+            self.rows += rows
+            self.escalated += escalated
+            self.first_stage_seconds += first_stage_seconds
+            self.full_model_seconds += full_model_seconds
+
+    def report(self) -> Dict[str, Any]:
+        """Exit rate of each stage and its mean latency per row it handled."""
+        with self._lock:
+            settled = self.rows - self.escalated
+            return {
+                "rows": self.rows,
+                FIRST_STAGE: {
+                    "exits": settled,
+                    "exit_rate": settled / self.rows if self.rows else 0.0,
+                    "mean_ms": 1000 * self.first_stage_seconds / self.rows if self.rows else 0.0
+                },
+                FULL_MODEL: {
+                    "exits": self.escalated,
+                    "exit_rate": self.escalated / self.rows if self.rows else 0.0,
+                    "mean_ms": 1000 * self.full_model_seconds / self.escalated if self.escalated else 0.0
+                }
+            }
+
+class FirstStage:
+    """Linear filter over the features the full model already consumes.
+
+    A row is settled as safe when the first stage's probability of the
+    safe class reaches safe_threshold, and as the alert class (malicious or
+    scam) when that probability reaches alert_threshold. Everything else,
+    including every "suspicious" row, goes to the full model. Weights act on
+    the raw feature rows (any scaling is folded in) and are stored as an
+    (n_features, n_classes) array, so scoring is one matrix product with
+    contiguous columns and a softmax.
+    """
+
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, classes: Sequence[Any], safe_class: Any,
+                 alert_class: Any, safe_threshold: float, alert_threshold: float, model_version: str):
+        self.weights = np.ascontiguousarray(weights, dtype=np.float64)
+        self.bias = np.asarray(bias, dtype=np.float64)
+        self.classes = np.asarray(classes)
+        self.safe_class = safe_class
+        self.alert_class = alert_class
+        self.safe_threshold = safe_threshold
+        self.alert_threshold = alert_threshold
+        self.model_version = model_version
+        self.stats = CascadeStats()
+
+    @classmethod
+    def fit(cls, X: Any, y: Sequence[Any], classes: Sequence[Any], safe_class: Any, alert_class: Any,
+            model_version: str, mean: np.ndarray = None, scale: np.ndarray = None, C: float = 1.0) -> "FirstStage":
+        """Fit a logistic regression first stage on feature rows X.
+
+        classes are the full model's classes, so probability columns line up
+        with the full model's; classes missing from y get probability 0 and
+        rows labelled with a class the model does not know are ignored. If
+        mean and scale are given the regression is fitted on (X - mean) / scale
+        and the standardization is folded into the weights.
+        """
+        from sklearn.linear_model import LogisticRegression
+
+        classes = list(classes)
+        known = np.isin(np.asarray(y), classes)
+        X, y = X[known], np.asarray(y)[known]
+        if mean is not None:
+            X = (np.asarray(X, dtype=np.float64) - mean) / scale
+        regression = LogisticRegression(C=C, max_iter=1000).fit(X, y)
+        fitted_weights, fitted_bias = np.atleast_2d(regression.coef_), np.atleast_1d(regression.intercept_)
+        if fitted_weights.shape[0] == 1:
+            # Binary regressions store one logit; split it so the softmax equals the sigmoid
+            fitted_weights = np.vstack([-fitted_weights[0] / 2, fitted_weights[0] / 2])
+            fitted_bias = np.array([-fitted_bias[0] / 2, fitted_bias[0] / 2])
+        if mean is not None:
+            fitted_bias = fitted_bias - fitted_weights @ (mean / scale)
+            fitted_weights = fitted_weights / scale
+
+        weights = np.zeros((len(classes), fitted_weights.shape[1]))
+        bias = np.full(len(classes), -np.inf)
+        for row, label in enumerate(regression.classes_):
+            weights[classes.index(label)] = fitted_weights[row]
+            bias[classes.index(label)] = fitted_bias[row]
+        return cls(weights.T, bias, classes, safe_class, alert_class, 1.0, 1.0, model_version)
+
+    def probabilities(self, X: Any) -> np.ndarray:
+        """Class probabilities for feature rows (dense or sparse)."""
+        scores = np.asarray(X @ self.weights) + self.bias
+        scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+        return scores / scores.sum(axis=1, keepdims=True)
+
+    def settle(self, X: Any, safe_threshold: float = None, alert_threshold: float = None):
+        """Return (settled mask, labels, probabilities) for feature rows."""
+        safe_threshold = self.safe_threshold if safe_threshold is None else safe_threshold
+        alert_threshold = self.alert_threshold if alert_threshold is None else alert_threshold
+        probabilities = self.probabilities(X)
+        labels = self.classes.take(np.argmax(probabilities, axis=1))
+        settled = np.zeros(len(probabilities), dtype=bool)
+        for label, threshold in ((self.alert_class, alert_threshold), (self.safe_class, safe_threshold)):
+            matches = np.flatnonzero(self.classes == label)
+            if len(matches):
+                confident = probabilities[:, matches[0]] >= threshold
+                labels[confident] = label
+                settled |= confident
+        return settled, labels, probabilities
+
+    def save(self, path: str):
+        """Write the stage next to its model, replacing any older one atomically."""
+        state = {key: value for key, value in self.__dict__.items() if key != "stats"}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "FirstStage":
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+        stage = cls.__new__(cls)
+        stage.__dict__.update(state)
+        stage.stats = CascadeStats()
+        return stage
+
+def load_first_stage(path: str, model_version: str) -> Optional[FirstStage]:
+    """Open the first stage at path if the cascade is enabled and it matches model_version.
+
+    CASCADE_SAFE_THRESHOLD and CASCADE_ALERT_THRESHOLD override the
+    thresholds stored with the stage.
+    """
+    if CASCADE_INFERENCE != "on" or not os.path.exists(path):
+        return None
+    try:
+        stage = FirstStage.load(path)
+    except Exception as e:
+        print(f"Could not load cascade first stage {path}: {e}")
+        return None
+    if stage.model_version != model_version:
+        print(f"Cascade first stage {path} was fitted for another model version; not using it")
+        return None
+    stage.safe_threshold = float(os.getenv("CASCADE_SAFE_THRESHOLD") or stage.safe_threshold)
+    stage.alert_threshold = float(os.getenv("CASCADE_ALERT_THRESHOLD") or stage.alert_threshold)
+    return stage
+
+def run_cascade(first_stage: FirstStage, X: Any,
+                full_predict: Callable[[np.ndarray], Tuple[np.ndarray, np.ndarray]]):
+    """Settle what the first stage can and send only the other rows to the full model.
+
+    full_predict receives the indices of the escalated rows and returns
+    their (labels, probabilities). Returns (labels, probabilities, stages).
+    """
+    started = time.perf_counter()
+    settled, labels, probabilities = first_stage.settle(X)
+    first_stage_seconds = time.perf_counter() - started
+
+    labels = labels.astype(object)
+    stages = [FIRST_STAGE if row_settled else FULL_MODEL for row_settled in settled]
+    escalated = np.flatnonzero(~settled)
+    full_model_seconds = 0.0
+    if len(escalated):
+        started = time.perf_counter()
+        full_labels, full_probabilities = full_predict(escalated)
+        full_model_seconds = time.perf_counter() - started
+        for row, label in zip(escalated, full_labels):
+            labels[row] = label
+        probabilities[escalated] = full_probabilities
+
+    first_stage.stats.record(len(settled), len(escalated), first_stage_seconds, full_model_seconds)
+    return labels, probabilities, stages
+
+def first_stage_explanation(prediction: Dict[str, Any]) -> Dict[str, Any]:
+    """Short explanation for a verdict the first stage settled on its own."""
+    return {
+        "text_explanation": [
+            f"Classified as {prediction['prediction']} with {prediction['confidence']:.0%} confidence "
+            "by the fast first-stage filter; the full model was not needed"
+        ],
+        "feature_importance": {},
+        "cascade": {"stage": FIRST_STAGE}
+    }
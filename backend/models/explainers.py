@@ -0,0 +1,144 @@
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence
+
+class LinearContributionExplainer:
+    """Exact per-feature attributions for classifiers that score classes linearly.
+
+    MultinomialNB and LogisticRegression both compute per-class scores of the
+    form bias[c] + sum_j x_j * weights[c, j], followed by a softmax. Each
+    feature's contribution is therefore exactly x_j * weights[:, j], so an
+    explanation only needs the columns of the input's nonzero features.
+    Weights are centred across classes, which leaves the softmax unchanged
+    but makes a contribution read as "pushes towards / away from" a class.
+    """
+
+    method = "linear_log_probability"
+
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, classes: Sequence[Any],
+                 feature_names: Any = None, class_names: Dict[Any, str] = None):
+        self.weights = np.asarray(weights - weights.mean(axis=0), dtype=np.float64)
+        self.bias = np.asarray(bias - bias.mean(), dtype=np.float64)
+        self.classes = list(classes)
+        self.feature_names = feature_names
+        class_names = class_names or {}
+        self.class_labels = [class_names.get(c, str(c)) for c in self.classes]
+
+    @classmethod
+    def from_classifier(cls, classifier: Any, feature_names: Any = None,
+                        class_names: Dict[Any, str] = None) -> Optional["LinearContributionExplainer"]:
+        """Build an explainer for a fitted MultinomialNB or linear model, or None if unsupported."""
+        if hasattr(classifier, 'feature_log_prob_') and hasattr(classifier, 'class_log_prior_'):
+            # Joint log likelihood: log P(c) + sum_j x_j log P(w_j | c)
+            weights, bias = classifier.feature_log_prob_, classifier.class_log_prior_
+        elif hasattr(classifier, 'coef_') and hasattr(classifier, 'intercept_') and hasattr(classifier, 'predict_proba'):
+            weights, bias = np.atleast_2d(classifier.coef_), np.atleast_1d(classifier.intercept_)
+            if weights.shape[0] == 1 and len(classifier.classes_) == 2:
+                # Binary models store one logit; split it so the softmax equals the sigmoid
+                weights = np.vstack([-weights[0] / 2, weights[0] / 2])
+                bias = np.array([-bias[0] / 2, bias[0] / 2])
+        else:
+            return None
+        return cls(weights, bias, classifier.classes_, feature_names, class_names)
+
+    def explain(self, vector: Any) -> Dict[str, Any]:
+        """Attribute the scores of a single transformed row (sparse or dense).
+
+        base_values plus the sum of every feature's contributions equals the
+        model's per-class log-probability scores up to a per-row constant.
+        """
+        indices, values = self._nonzero(vector)
+        contributions = self.weights[:, indices].T * values[:, None]
+        scores = self.bias + contributions.sum(axis=0)
+
+        # Strongest features first, measured by their effect on the predicted class
+        predicted = int(np.argmax(scores))
+        order = np.argsort(-np.abs(contributions[:, predicted]), kind='stable')
+        return {
+            "method": self.method,
+            "classes": self.class_labels,
+            "base_values": self.bias.tolist(),
+            "features": [
+                {
+                    "feature": self._feature_name(indices[i]),
+                    "index": int(indices[i]),
+                    "value": float(values[i]),
+                    "contributions": contributions[i].tolist()
+                }
+                for i in order
+            ]
+        }
+
+    def probabilities(self, explanation: Dict[str, Any]) -> np.ndarray:
+        """Recover class probabilities from an explanation (softmax of base + contributions)."""
+        scores = np.array(explanation["base_values"])
+        for feature in explanation["features"]:
+            scores = scores + np.array(feature["contributions"])
+        scores = np.exp(scores - scores.max())
+        return scores / scores.sum()
+
+    @staticmethod
+    def _nonzero(vector: Any):
+        if hasattr(vector, 'tocsr'):
+            row = vector.tocsr()[0]
+            row.sum_duplicates()
+            return row.indices, row.data.astype(np.float64)
+        row = np.asarray(vector, dtype=np.float64).reshape(-1)
+        indices = np.flatnonzero(row)
+        return indices, row[indices]
+
+    def _feature_name(self, index: int) -> str:
+        if self.feature_names is None:
+            return f"feature_{int(index)}"
+        return str(self.feature_names[index])
+
+class TreePathExplainer:
+    """Exact decision-path attributions for a compiled random forest.
+
+    Walking a tree from the root to the leaf, each split changes the node's
+    class distribution; that change is credited to the split's feature.
+    Averaged over trees, base_values plus the contributions add up exactly
+    to the forest's predicted probabilities.
+    """
+
+    method = "tree_path"
+
+    def __init__(self, engine: Any, feature_names: Sequence[str], class_names: Dict[Any, str] = None):
+        self.engine = engine
+        self.feature_names = list(feature_names)
+        class_names = class_names or {}
+        self.class_labels = [class_names.get(c, str(c)) for c in engine.classes.tolist()]
+
+    def explain(self, features: Any) -> Dict[str, Any]:
+        """Attribute the probabilities of one unscaled feature row."""
+        bias, contributions = self.engine.path_contributions(np.asarray(features).reshape(1, -1))
+        contributions = contributions[0]
+        probabilities = bias + contributions.sum(axis=0)
+
+        predicted = int(np.argmax(probabilities))
+        order = np.argsort(-np.abs(contributions[:, predicted]), kind='stable')
+        return {
+            "method": self.method,
+            "classes": self.class_labels,
+            "base_values": bias.tolist(),
+            "features": [
+                {
+                    "feature": self.feature_names[i],
+                    "index": int(i),
+                    "contributions": contributions[i].tolist()
+                }
+                for i in order if np.any(contributions[i])
+            ]
+        }
+
+    @staticmethod
+    def probabilities(explanation: Dict[str, Any]) -> np.ndarray:
+        """Recover class probabilities from an explanation (base + contributions)."""
+        probabilities = np.array(explanation["base_values"])
+        for feature in explanation["features"]:
+            probabilities = probabilities + np.array(feature["contributions"])
+        return probabilities
+
+def top_feature_indices(explanation: Dict[str, Any], class_index: int, k: int) -> List[int]:
+    """Indices of the k features with the largest absolute contribution to a class."""
+    features = sorted(explanation["features"], key=lambda f: -abs(f["contributions"][class_index]))
+    return [f["index"] for f in features[:k]]
@@ -0,0 +1,169 @@
+import numpy as np
+from typing import Any, Optional, Tuple
+
+# Marker sklearn uses for "no child" in tree_.children_left / children_right
+TREE_LEAF = -1
+
+# Number of synthetic rows used to check a compiled forest against sklearn
+PARITY_SAMPLE_SIZE = 256
+
+class FlatForest:
+    """Random forest flattened into contiguous NumPy node arrays for fast inference.
+
+    Every tree of a fitted RandomForestClassifier is concatenated into one set
+    of node arrays. Leaves point at themselves, so a batch of rows can walk all
+    trees at once for max_depth steps without branching per node. Optionally
+    folds in a fitted StandardScaler so raw feature rows can be passed directly.
+    """
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray,
+                 right: np.ndarray, leaf_proba: np.ndarray, roots: np.ndarray,
+                 max_depth: int, classes: np.ndarray, scaler: Any = None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.leaf_proba = leaf_proba
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes = classes
+        self.mean = getattr(scaler, 'mean_', None) if scaler is not None else None
+        self.scale = getattr(scaler, 'scale_', None) if scaler is not None else None
+
+    @classmethod
+    def from_sklearn(cls, forest: Any, scaler: Any = None) -> "FlatForest":
+        """Compile a fitted single-output RandomForestClassifier."""
+        if getattr(forest, 'n_outputs_', 1) != 1:
+            raise ValueError("Only single-output forests can be compiled")
+
+        features, thresholds, lefts, rights, probas, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(n_nodes, dtype=np.int64)
+            is_leaf = tree.children_left == TREE_LEAF
+
+            # Leaves loop back to themselves and always take the "left" branch
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+
+            # Same normalization as DecisionTreeClassifier.predict_proba
+            value = tree.value[:, 0, :].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            probas.append(value / normalizer)
+
+            roots.append(offset)
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp),
+            right=np.ascontiguousarray(np.concatenate(rights), dtype=np.intp),
+            leaf_proba=np.ascontiguousarray(np.concatenate(probas)),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            classes=np.asarray(forest.classes_),
+            scaler=scaler
+        )
+
+    def predict_with_proba(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (labels, probabilities) for raw feature rows in a single pass.
+
+        Accepts one row of shape (n_features,) or a batch (n_rows, n_features).
+        """
+        X = self._prepare_rows(X)
+        n_rows = X.shape[0]
+        rows = np.arange(n_rows)[:, None]
+        nodes = np.broadcast_to(self.roots, (n_rows, len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        probabilities = self.leaf_proba[nodes].mean(axis=1)
+        labels = self.classes.take(np.argmax(probabilities, axis=1))
+        return labels, probabilities
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Class probabilities for raw feature rows, as RandomForestClassifier.predict_proba."""
+        return self.predict_with_proba(X)[1]
+
+    def path_contributions(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (bias, contributions) decomposing the forest's probabilities.
+
+        bias has shape (n_classes,) and contributions (n_rows, n_features,
+        n_classes); bias + contributions.sum(axis=1) equals the probabilities
+        from predict_with_proba. Every split on a row's path credits the
+        change in class distribution between parent and child to the split
+        feature (leaf_proba holds the distribution of every node, not just
+        leaves).
+        """
+        X = self._prepare_rows(X)
+        n_rows, n_features = X.shape
+        n_trees = len(self.roots)
+        rows = np.arange(n_rows)[:, None]
+        nodes = np.broadcast_to(self.roots, (n_rows, n_trees)).copy()
+        contributions = np.zeros((n_rows, n_features, self.leaf_proba.shape[1]))
+        for _ in range(self.max_depth):
+            split_feature = self.feature[nodes]
+            go_left = X[rows, split_feature] <= self.threshold[nodes]
+            children = np.where(go_left, self.left[nodes], self.right[nodes])
+            # Leaves are their own children, so they add nothing
+            np.add.at(contributions, (rows, split_feature), self.leaf_proba[children] - self.leaf_proba[nodes])
+            nodes = children
+
+        bias = self.leaf_proba[self.roots].mean(axis=0)
+        return bias, contributions / n_trees
+
+    def _prepare_rows(self, X: np.ndarray) -> np.ndarray:
+        """Scale raw rows and round them the way sklearn trees see their input."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+
+        if self.mean is not None:
+            X = X - self.mean
+        if self.scale is not None:
+            X = X / self.scale
+        # sklearn trees compare float32 inputs against float64 thresholds
+        return X.astype(np.float32).astype(np.float64)
+
+    def check_parity(self, forest: Any, scaler: Any = None, X: Optional[np.ndarray] = None,
+                     atol: float = 1e-9) -> bool:
+        """Check that this engine reproduces sklearn's labels and probabilities.
+
+        Uses X if given, otherwise random rows drawn around the forest's split
+        thresholds so that every feature crosses decision boundaries.
+        """
+        if X is None:
+            X = self._parity_sample(forest.n_features_in_)
+            if self.scale is not None:
+                X = X * self.scale
+            if self.mean is not None:
+                X = X + self.mean
+
+        labels, probabilities = self.predict_with_proba(X)
+        X_model = scaler.transform(X) if scaler is not None else X
+        expected_proba = forest.predict_proba(X_model)
+        expected_labels = forest.predict(X_model)
+        return bool(np.array_equal(labels, expected_labels)
+                    and np.allclose(probabilities, expected_proba, rtol=0.0, atol=atol))
+
+    def _parity_sample(self, n_features: int) -> np.ndarray:
+        """Random rows in scaled space whose values straddle the split thresholds."""
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(PARITY_SAMPLE_SIZE, n_features))
+
+        split_nodes = np.flatnonzero(np.isfinite(self.threshold))
+        if len(split_nodes):
+            picks = rng.choice(split_nodes, size=PARITY_SAMPLE_SIZE * n_features)
+            picks = picks.reshape(PARITY_SAMPLE_SIZE, n_features)
+            use_threshold = self.feature[picks] == np.arange(n_features)
+            X = np.where(use_threshold, self.threshold[picks] + rng.normal(scale=1e-3, size=X.shape), X)
+        return X
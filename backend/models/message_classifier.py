@@ -1,18 +1,57 @@
+import os
 import pickle
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer, TfidfTransformer
 from sklearn.naive_bayes import MultinomialNB
-from sklearn.linear_model import LogisticRegression
 from sklearn.pipeline import Pipeline
-import shap
-from typing import Dict, Any
-from .base_model import BaseModel
+from sklearn.utils import murmurhash3_32
+from typing import Dict, Any, List, Optional
+from .base_model import BaseModel, DEFAULT_MODEL_VERSION
+from .explainers import LinearContributionExplainer
+from .onnx_backend import load_onnx_classifier, message_onnx_inputs, onnx_path_for
+from .cascade import FIRST_STAGE, cascade_path_for, first_stage_explanation, load_first_stage, run_cascade
+from utils.keyword_matcher import get_default_matcher, get_keyword_config
+
+FEATURE_MODES = ("tfidf", "hashing")
+
+# Hash space used by the hashing feature mode. The fitted model keeps about
+# 56 bytes per bucket (naive Bayes counts and log probabilities for three
+# classes plus the IDF weight), in memory in every worker and in the pickle
+HASHING_N_FEATURES = int(os.getenv("MESSAGE_HASHING_FEATURES", str(2 ** 16)))
+
+# Number of highest-weighted hash buckets whose tokens are remembered for explanations
+REVERSE_MAP_SIZE = 2000
+
+def _hash_bucket(token: str, n_features: int) -> int:
+    """Column HashingVectorizer assigns to token (mirrors sklearn's index rule)."""
+    h = murmurhash3_32(token, seed=0)
+    if h == -2147483648:
+        return (2147483647 - (n_features - 1)) % n_features
+    return abs(h) % n_features
+
+class BucketNames:
+    """Feature-name lookup for hashed features, naming only the remembered buckets."""
+    
+    def __init__(self, bucket_names: Dict[int, str]):
+        self.bucket_names = bucket_names
+    
+    def __getitem__(self, index) -> str:
+        return self.bucket_names.get(int(index), f"bucket_{int(index)}")
 
 class MessageClassifier(BaseModel):
-    """Message classification model for detecting spam/scam messages."""
+    """Message classification model for detecting spam/scam messages.
+    
+    Two feature modes are supported: "tfidf" keeps a fitted vocabulary, while
+    "hashing" uses a stateless HashingVectorizer with an optional IDF vector
+    and only a small bucket -> token map for explanations.
+    """
     
-    def __init__(self, model_path: str = "models/message_model.pkl"):
+    def __init__(self, model_path: str = "models/message_model.pkl", feature_mode: str = None, use_idf: bool = True):
         self.model_path = model_path
+        self.feature_mode = feature_mode or os.getenv("MESSAGE_FEATURE_MODE", "tfidf")
+        if self.feature_mode not in FEATURE_MODES:
+            raise ValueError(f"Unknown feature mode: {self.feature_mode}")
+        self.use_idf = use_idf
         self.vectorizer = TfidfVectorizer(
             max_features=5000,
             stop_words='english',
@@ -20,24 +59,110 @@ class MessageClassifier(BaseModel):
             ngram_range=(1, 2)
         )
         self.label_map = {0: "safe", 1: "suspicious", 2: "scam"}
-        self.model = Pipeline([
-            ('vectorizer', self.vectorizer),
+        self.model = self._build_pipeline(self.feature_mode)
+        # Tokens for the top-weighted hash buckets (hashing mode only)
+        self.bucket_names = None
+        # Exact contribution explainer for NB/linear models, generic SHAP otherwise
+        self.explainer = None
+        self.model_version = DEFAULT_MODEL_VERSION
+        # Last feedback row folded in by partial_fit, stored with the model
+        self.feedback_watermark = 0
+        # onnxruntime session for predictions when INFERENCE_BACKEND=onnx
+        self.onnx_model = None
+        # Linear filter that settles confident messages before the full model when CASCADE_INFERENCE=on
+        self.first_stage = None
+        # Vocabulary names and per-class weight rankings, computed once per loaded model
+        self.feature_names = None
+        self.weight_rankings = None
+        self.weights_per_class = False
+        # Configurable scam phrase rules, matched in one pass by the shared automaton
+        self.keyword_matcher = get_default_matcher()
+        self.message_rules = get_keyword_config().get("message_patterns", [])
+    
+    def _build_pipeline(self, feature_mode: str) -> Pipeline:
+        """Create an untrained pipeline for the given feature mode."""
+        if feature_mode == "hashing":
+            # Non-negative hashed counts so MultinomialNB can consume them
+            hashing = HashingVectorizer(
+                n_features=HASHING_N_FEATURES,
+                stop_words='english',
+                lowercase=True,
+                ngram_range=(1, 2),
+                alternate_sign=False,
+                norm=None if self.use_idf else 'l2'
+            )
+            vectorizer = Pipeline([('hashing', hashing), ('idf', TfidfTransformer())]) if self.use_idf else hashing
+        else:
+            vectorizer = self.vectorizer
+        
+        return Pipeline([
+            ('vectorizer', vectorizer),
             ('classifier', MultinomialNB())
         ])
-        # Initialize SHAP explainer
-        self.explainer = None
     
-    def load_model(self):
-        """Load the trained model from disk."""
+    def load_model(self, feature_mode: str = None):
+        """Load the trained model from disk.
+        
+        If feature_mode is given, the stored model must use that mode;
+        otherwise the mode is taken from the stored model.
+        """
         try:
             with open(self.model_path, 'rb') as f:
-                self.model = pickle.load(f)
-        except (FileNotFoundError, pickle.UnpicklingError):
+                raw = f.read()
+            data = pickle.loads(raw)
+            if isinstance(data, dict) and 'model' in data:
+                stored_mode = data.get('feature_mode', 'tfidf')
+                model, bucket_names = data['model'], data.get('bucket_names')
+                feedback_watermark = data.get('feedback_watermark', 0)
+            else:
+                stored_mode, model, bucket_names, feedback_watermark = 'tfidf', data, None, 0
+            
+            if feature_mode and stored_mode != feature_mode:
+                raise pickle.UnpicklingError(f"Stored model uses '{stored_mode}' features, not '{feature_mode}'")
+            
+            self.model = model
+            self.feature_mode = stored_mode
+            self.bucket_names = bucket_names
+            self.feedback_watermark = feedback_watermark
+            self.model_version = self.compute_model_version(raw)
+        except (FileNotFoundError, pickle.UnpicklingError) as e:
             # Initialize a default model if file doesn't exist or is invalid
-            self.model = Pipeline([
-                ('vectorizer', self.vectorizer),
-                ('classifier', MultinomialNB())
-            ])
+            if feature_mode:
+                print(f"Could not load message model: {e}")
+                self.feature_mode = feature_mode
+            self.model = self._build_pipeline(self.feature_mode)
+            self.bucket_names = None
+            self.feedback_watermark = 0
+            self.model_version = DEFAULT_MODEL_VERSION
+        self._prepare_explanation_data()
+        self._initialize_shap_explainer()
+        self.onnx_model = load_onnx_classifier(onnx_path_for(self.model_path), self.model_version)
+        self.first_stage = load_first_stage(cascade_path_for(self.model_path), self.model_version)
+    
+    def _prepare_explanation_data(self):
+        """Cache feature names and top/bottom weighted features for the current model."""
+        self.feature_names = None
+        self.weight_rankings = None
+        self.weights_per_class = False
+        try:
+            vectorizer = self.model.named_steps['vectorizer']
+            classifier = self.model.named_steps['classifier']
+        except (AttributeError, KeyError):
+            return
+        
+        if hasattr(vectorizer, 'vocabulary_'):
+            self.feature_names = vectorizer.get_feature_names_out()
+        elif self.bucket_names is not None:
+            self.feature_names = BucketNames(self.bucket_names)
+        
+        if hasattr(classifier, 'coef_'):
+            coef = classifier.coef_
+            self.weights_per_class = len(coef.shape) > 1
+            rows = coef if self.weights_per_class else coef.reshape(1, -1)
+            self.weight_rankings = []
+            for class_coef in rows:
+                order = np.argsort(class_coef)
+                self.weight_rankings.append((class_coef, order[-10:], order[:10]))
     
     def preprocess(self, message: str) -> str:
         """Preprocess the message text."""
@@ -45,23 +170,139 @@ class MessageClassifier(BaseModel):
         message = message.lower().strip()
         return message
     
-    def train(self, messages: list, labels: list):
-        """Train the model with provided data."""
+    def train(self, messages: list, labels: list, feature_mode: str = None):
+        """Train the model with provided data.
+        
+        feature_mode ("tfidf" or "hashing") overrides the classifier's mode.
+        """
+        if feature_mode and feature_mode != self.feature_mode:
+            if feature_mode not in FEATURE_MODES:
+                raise ValueError(f"Unknown feature mode: {feature_mode}")
+            self.feature_mode = feature_mode
+            self.model = self._build_pipeline(feature_mode)
+        
         processed_messages = [self.preprocess(msg) for msg in messages]
         self.model.fit(processed_messages, labels)
+        self.bucket_names = None
+        if self.feature_mode == "hashing":
+            self.bucket_names = self._build_bucket_names(processed_messages)
+        # A freshly trained model has not seen any feedback yet
+        self.feedback_watermark = 0
         
-        # Initialize SHAP explainer after training
-        # For demonstration, we'll create a simple explainer
-        # In production, you would use a proper background dataset
+        self.save_model()
+        
+        # Initialize the explainer after training; the background data is only
+        # needed by the generic SHAP fallback
         self._initialize_shap_explainer(processed_messages[:100] if len(processed_messages) > 100 else processed_messages)
+    
+    def partial_fit(self, messages: list, labels: list) -> int:
+        """Update the fitted classifier's counts with new labelled messages.
+        
+        The vectorizer is not refit: TF-IDF models keep their vocabulary and
+        IDF weights, hashing models their hash space, so the cost depends only
+        on the new messages. Labels the model was not trained with are
+        skipped. Returns the number of messages used; call save_model to
+        publish the result.
+        """
+        classifier = self.model.named_steps['classifier']
+        if not hasattr(classifier, 'partial_fit') or not hasattr(classifier, 'classes_'):
+            raise ValueError("partial_fit needs a trained classifier that supports it")
         
-        # Save the trained model
-        with open(self.model_path, 'wb') as f:
-            pickle.dump(self.model, f)
+        known = set(classifier.classes_.tolist())
+        pairs = [(self.preprocess(msg), label) for msg, label in zip(messages, labels) if label in known]
+        if not pairs:
+            return 0
+        
+        processed_messages, kept_labels = zip(*pairs)
+        message_vectors = self.model.named_steps['vectorizer'].transform(list(processed_messages))
+        classifier.partial_fit(message_vectors, list(kept_labels))
+        
+        self._prepare_explanation_data()
+        self._initialize_shap_explainer()
+        return len(pairs)
     
-    def _initialize_shap_explainer(self, background_data: list):
-        """Initialize SHAP explainer with background data."""
+    def save_model(self):
+        """Atomically publish the current model to model_path and refresh its version.
+        
+        Plain TF-IDF models are stored as the bare pipeline; hashing models
+        and models updated from feedback are stored as a dict with their
+        extra state.
+        """
+        if self.feature_mode == "hashing" or self.feedback_watermark:
+            raw = pickle.dumps({
+                'model': self.model,
+                'feature_mode': self.feature_mode,
+                'bucket_names': self.bucket_names,
+                'feedback_watermark': self.feedback_watermark
+            })
+        else:
+            raw = pickle.dumps(self.model)
+        
+        # Write next to the target and rename so readers never see a partial file
+        tmp_path = f"{self.model_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.model_path)
+        
+        self.model_version = self.compute_model_version(raw)
+        self._prepare_explanation_data()
+        # Any exported graph and first stage belong to the previous model; refit them to use them again
+        self.onnx_model = None
+        self.first_stage = None
+    
+    def _build_bucket_names(self, processed_messages: list) -> Dict[int, str]:
+        """Map the most heavily weighted hash buckets back to a token seen in training.
+        
+        Only REVERSE_MAP_SIZE buckets are kept, so the map stays small no
+        matter how large the training vocabulary is.
+        """
+        vectorizer = self.model.named_steps['vectorizer']
+        hashing = vectorizer.named_steps['hashing'] if isinstance(vectorizer, Pipeline) else vectorizer
+        classifier = self.model.named_steps['classifier']
+        
+        # How strongly each bucket separates the classes
+        if hasattr(classifier, 'coef_'):
+            weights = np.abs(np.atleast_2d(classifier.coef_)).max(axis=0)
+        elif hasattr(classifier, 'feature_log_prob_'):
+            weights = np.ptp(classifier.feature_log_prob_, axis=0)
+        else:
+            return {}
+        
+        wanted = set(np.argsort(weights)[-REVERSE_MAP_SIZE:].tolist())
+        analyzer = hashing.build_analyzer()
+        n_features = hashing.n_features
+        bucket_names = {}
+        for message in processed_messages:
+            for token in analyzer(message):
+                bucket = _hash_bucket(token, n_features)
+                if bucket in wanted and bucket not in bucket_names:
+                    bucket_names[bucket] = token
+            if len(bucket_names) == len(wanted):
+                break
+        return bucket_names
+    
+    def _initialize_shap_explainer(self, background_data: list = None):
+        """Initialize the explainer, preferring exact contributions over sampled SHAP.
+        
+        The generic SHAP explainer is only built for classifiers without a
+        linear score and needs background data; it is not restored on load.
+        """
+        self.explainer = None
         try:
+            self.explainer = LinearContributionExplainer.from_classifier(
+                self.model.named_steps['classifier'], self.feature_names, self.label_map
+            )
+        except Exception as e:
+            print(f"Could not initialize exact explainer: {e}")
+        if self.explainer is not None or not background_data:
+            return
+        
+        try:
+            # shap (and numba with it) is only imported for this fallback
+            import shap
+
             # Create a simple background dataset for SHAP
             if hasattr(self.model.named_steps['classifier'], 'predict_proba'):
                 self.explainer = shap.Explainer(
@@ -74,85 +315,199 @@ class MessageClassifier(BaseModel):
     
     def predict(self, message: str) -> Dict[str, Any]:
         """Predict if a message is safe, suspicious, or scam."""
-        processed_message = self.preprocess(message)
-        
-        # Get prediction
-        prediction = self.model.predict([processed_message])[0]
+        return self.predict_batch([message])[0]
+    
+    def predict_batch(self, messages: List[str]) -> List[Dict[str, Any]]:
+        """Predict many messages from a single sparse TF-IDF transform."""
+        if not messages:
+            return []
         
-        # Get prediction probabilities
-        if hasattr(self.model, "predict_proba"):
-            probabilities = self.model.predict_proba([processed_message])[0]
-            confidence = float(np.max(probabilities))
+        processed_messages = [self.preprocess(msg) for msg in messages]
+        stages = None
+        if self.first_stage is not None:
+            message_vectors = self.model.named_steps['vectorizer'].transform(processed_messages)
+            predictions, probabilities, stages = run_cascade(
+                self.first_stage, message_vectors,
+                lambda rows: self._predict_full(processed_messages, message_vectors, rows)
+            )
+        elif self.onnx_model is not None:
+            # The exported graph vectorizes the text itself
+            inputs = message_onnx_inputs(self.model.named_steps['vectorizer'], processed_messages)
+            predictions, probabilities = self.onnx_model.predict_with_proba(inputs)
         else:
-            probabilities = [0.0] * len(self.label_map)
-            confidence = 1.0
+            message_vectors = self.model.named_steps['vectorizer'].transform(processed_messages)
+            predictions, probabilities = self._predict_vectors(message_vectors)
+        return [
+            self._format_prediction(prediction, row, stages[i] if stages is not None else None)
+            for i, (prediction, row) in enumerate(zip(predictions, probabilities))
+        ]
+    
+    def _predict_full(self, processed_messages: List[str], message_vectors: Any, rows: np.ndarray = None):
+        """Full-model (labels, probabilities) for the given rows (default: all), through ONNX when loaded."""
+        if self.onnx_model is not None:
+            if rows is not None:
+                processed_messages = [processed_messages[i] for i in rows]
+            inputs = message_onnx_inputs(self.model.named_steps['vectorizer'], processed_messages)
+            return self.onnx_model.predict_with_proba(inputs)
+        return self._predict_vectors(message_vectors if rows is None else message_vectors[rows])
+    
+    def _predict_vectors(self, message_vectors: Any):
+        """Return (labels, probabilities) for transformed messages, labels taken from the probabilities."""
+        classifier = self.model.named_steps['classifier']
+        if hasattr(classifier, "predict_proba"):
+            probabilities = classifier.predict_proba(message_vectors)
+            predictions = classifier.classes_.take(np.argmax(probabilities, axis=1))
+        else:
+            predictions = classifier.predict(message_vectors)
+            probabilities = np.zeros((message_vectors.shape[0], len(self.label_map)))
+        return predictions, probabilities
+    
+    def _format_prediction(self, prediction: Any, probabilities: np.ndarray, stage: str = None) -> Dict[str, Any]:
+        """Build the prediction dict returned by predict and predict_batch.
         
-        return {
+        With a cascade, stage records which stage settled the message.
+        """
+        result = {
             "prediction": self.label_map.get(prediction, "unknown"),
-            "confidence": confidence,
+            "confidence": float(np.max(probabilities)) if probabilities.any() else 1.0,
             "probabilities": {
                 self.label_map[i]: float(prob) for i, prob in enumerate(probabilities)
             }
         }
+        if stage is not None:
+            result["stage"] = stage
+        return result
     
-    def explain_prediction(self, message: str) -> Dict[str, Any]:
+    def analyze(self, message: str, include_shap: bool = True):
+        """Predict and explain a message from a single TF-IDF transform.
+        
+        Returns (prediction, explanation) in the same formats as predict and
+        explain_prediction. With include_shap=False the SHAP values are left
+        out so they can be computed separately with explain_shap.
+        """
+        return self.analyze_batch([message], include_shap=include_shap)[0]
+    
+    def analyze_batch(self, messages: List[str], include_shap: bool = True) -> List[tuple]:
+        """Predict and explain many messages from a single TF-IDF transform.
+        
+        Returns one (prediction, explanation) pair per message, as analyze
+        does; the explanations reuse the rows of the batch's sparse matrix.
+        Predictions come from the ONNX graph when one is loaded.
+        """
+        if not messages:
+            return []
+        
+        processed_messages = [self.preprocess(msg) for msg in messages]
+        message_vectors = self.model.named_steps['vectorizer'].transform(processed_messages)
+        stages = None
+        if self.first_stage is not None:
+            predictions, probabilities, stages = run_cascade(
+                self.first_stage, message_vectors, lambda rows: self._predict_full(processed_messages, message_vectors, rows)
+            )
+        else:
+            predictions, probabilities = self._predict_full(processed_messages, message_vectors)
+        
+        analyses = []
+        for i, message in enumerate(messages):
+            stage = stages[i] if stages is not None else None
+            prediction = self._format_prediction(predictions[i], probabilities[i], stage)
+            if stage == FIRST_STAGE:
+                explanation = first_stage_explanation(prediction)
+            else:
+                explanation = self._explain_vector(message, processed_messages[i], message_vectors[i],
+                                                   predictions[i], include_shap)
+            analyses.append((prediction, explanation))
+        return analyses
+    
+    def explain_prediction(self, message: str, include_shap: bool = True) -> Dict[str, Any]:
         """Provide detailed explanation for the prediction using SHAP and feature importance."""
         try:
             processed_message = self.preprocess(message)
+            message_vector = self.model.named_steps['vectorizer'].transform([processed_message])
+        except Exception as e:
+            return {
+                "error": f"Could not generate explanation: {str(e)}"
+            }
+        return self._explain_vector(message, processed_message, message_vector, include_shap=include_shap)
+    
+    def explain_shap(self, message: str) -> Optional[Dict[str, Any]]:
+        """Compute only the SHAP explanation for a message, or None if unavailable."""
+        if not self.explainer:
+            return None
+        processed_message = self.preprocess(message)
+        message_vector = self.model.named_steps['vectorizer'].transform([processed_message])
+        return self._shap_for_vector(message_vector)
+    
+    def _shap_for_vector(self, message_vector: Any) -> Optional[Dict[str, Any]]:
+        """Run the explainer on a transformed message."""
+        if not self.explainer:
+            return None
+        try:
+            if isinstance(self.explainer, LinearContributionExplainer):
+                # Closed form over the message's nonzero features only
+                return self.explainer.explain(message_vector)
             
+            # Get SHAP values (simplified approach)
+            shap_values = self.explainer(message_vector)
+            return {
+                "shap_values": shap_values.values.tolist() if hasattr(shap_values, 'values') else [],
+                "base_values": shap_values.base_values.tolist() if hasattr(shap_values, 'base_values') else []
+            }
+        except Exception as e:
+            print(f"SHAP explanation failed: {e}")
+            return None
+    
+    def _explain_vector(self, message: str, processed_message: str, message_vector: Any,
+                        prediction: Any = None, include_shap: bool = True) -> Dict[str, Any]:
+        """Build the explanation from an already transformed message.
+        
+        The predicted class is computed from message_vector only if the
+        classifier exposes weights and the caller did not pass it.
+        """
+        try:
             # Get SHAP explanation if available
-            shap_explanation = None
-            if self.explainer:
-                try:
-                    # Transform the message
-                    message_vector = self.model.named_steps['vectorizer'].transform([processed_message])
-                    
-                    # Get SHAP values (simplified approach)
-                    shap_values = self.explainer(message_vector)
-                    shap_explanation = {
-                        "shap_values": shap_values.values.tolist() if hasattr(shap_values, 'values') else [],
-                        "base_values": shap_values.base_values.tolist() if hasattr(shap_values, 'base_values') else []
-                    }
-                except Exception as e:
-                    print(f"SHAP explanation failed: {e}")
+            shap_explanation = self._shap_for_vector(message_vector) if include_shap else None
             
             # Get feature names and weights if using a linear model
             feature_explanation = {}
             if hasattr(self.model.named_steps['classifier'], 'coef_'):
-                feature_names = self.model.named_steps['vectorizer'].get_feature_names_out()
-                coef = self.model.named_steps['classifier'].coef_
+                if self.weight_rankings is None or self.feature_names is None:
+                    self._prepare_explanation_data()
+                feature_names = self.feature_names
                 
                 # For multiclass, we'll focus on the predicted class
-                prediction = self.model.predict([processed_message])[0]
+                if prediction is None:
+                    prediction = self.model.named_steps['classifier'].predict(message_vector)[0]
                 
                 # Get top features for the predicted class
-                if len(coef.shape) > 1 and prediction < len(coef):
-                    class_coef = coef[prediction]
-                elif len(coef.shape) == 1:
-                    class_coef = coef
+                if not self.weights_per_class:
+                    ranking = self.weight_rankings[0]
+                elif prediction < len(self.weight_rankings):
+                    ranking = self.weight_rankings[prediction]
                 else:
-                    class_coef = np.zeros(len(feature_names))
+                    ranking = None
                 
                 # Get top positive and negative features
-                top_positive_idx = np.argsort(class_coef)[-10:]
-                top_negative_idx = np.argsort(class_coef)[:10]
-                
-                feature_explanation = {
-                    "important_words": [
-                        {
-                            "word": feature_names[i],
-                            "weight": float(class_coef[i]),
-                            "importance": abs(float(class_coef[i]))
-                        } for i in top_positive_idx if class_coef[i] > 0
-                    ],
-                    "concerning_patterns": [
-                        {
-                            "pattern": feature_names[i],
-                            "weight": float(class_coef[i]),
-                            "importance": abs(float(class_coef[i]))
-                        } for i in top_negative_idx if class_coef[i] < 0
-                    ]
-                }
+                if ranking is not None:
+                    class_coef, top_positive_idx, top_negative_idx = ranking
+                    feature_explanation = {
+                        "important_words": [
+                            {
+                                "word": feature_names[i],
+                                "weight": float(class_coef[i]),
+                                "importance": abs(float(class_coef[i]))
+                            } for i in top_positive_idx if class_coef[i] > 0
+                        ],
+                        "concerning_patterns": [
+                            {
+                                "pattern": feature_names[i],
+                                "weight": float(class_coef[i]),
+                                "importance": abs(float(class_coef[i]))
+                            } for i in top_negative_idx if class_coef[i] < 0
+                        ]
+                    }
+                else:
+                    feature_explanation = {"important_words": [], "concerning_patterns": []}
             
             # Text-based explanation
             text_explanation = self._generate_text_explanation(message, processed_message)
@@ -176,33 +531,26 @@ class MessageClassifier(BaseModel):
         """Generate human-readable explanations for the prediction."""
         explanations = []
         
-        # Check for common scam patterns
-        message_lower = original_message.lower()
-        
-        if "urgent" in message_lower or "immediate" in message_lower:
-            explanations.append("Contains urgent language, often used to pressure victims")
-        
-        if "click here" in message_lower or "verify account" in message_lower:
-            explanations.append("Contains suspicious action prompts")
-        
-        if "password" in message_lower or "credential" in message_lower:
-            explanations.append("Asks for sensitive information")
-        
-        if "@" in original_message and "." in original_message:
-            explanations.append("Contains email-like patterns that may be spoofed")
-        
-        if len(original_message) > 200:
-            explanations.append("Unusually long message, may contain obfuscated content")
-        
-        # Check for suspicious characters or patterns
-        if "!!!" in original_message or "???" in original_message:
-            explanations.append("Contains excessive punctuation for emphasis")
-        
-        if "$" in original_message or "€" in original_message or "£" in original_message:
-            explanations.append("Mentions currency, common in financial scams")
+        # Check for common scam patterns in a single pass over the message
+        matches = self.keyword_matcher.match(original_message)
+        for rule in self.message_rules:
+            if self._rule_applies(rule, original_message, matches):
+                explanations.append(rule["explanation"])
         
         # If no specific patterns found, provide general explanation
         if not explanations:
             explanations.append("Based on learned patterns from training data")
         
-        return explanations
\ No newline at end of file
+        return explanations
+    
+    @staticmethod
+    def _rule_applies(rule: Dict[str, Any], message: str, matches: Dict[str, set]) -> bool:
+        """Check a configured message rule against precomputed keyword matches."""
+        name = rule["name"]
+        if rule.get("any") and not matches[f"message:{name}:any"]:
+            return False
+        if rule.get("all") and len(matches[f"message:{name}:all"]) < len(set(p.lower() for p in rule["all"])):
+            return False
+        if len(message) < rule.get("min_length", 0):
+            return False
+        return True
\ No newline at end of file
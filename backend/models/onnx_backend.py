@@ -0,0 +1,151 @@
+import os
+import numpy as np
+from typing import Any, Dict, Optional, Sequence, Tuple, Union
+
+# "sklearn" (default) or "onnx"; ONNX graphs are used only if exported for the loaded model
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "sklearn")
+
+# onnxruntime threads per call: single requests gain nothing from more than one,
+# large batches are split across cores
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "1"))
+ONNX_BATCH_INTRA_OP_THREADS = int(os.getenv("ONNX_BATCH_INTRA_OP_THREADS", str(os.cpu_count() or 1)))
+
+# Rows from which a call is routed to the multi-threaded session
+ONNX_BATCH_MIN_ROWS = int(os.getenv("ONNX_BATCH_MIN_ROWS", "64"))
+
+# Opset supported by the onnx/onnxruntime versions pinned in requirements.txt
+TARGET_OPSET = 17
+
+# Metadata key tying an exported graph to the pickled model it was converted from
+MODEL_VERSION_KEY = "model_version"
+
+def onnx_path_for(model_path: str) -> str:
+    """Default location of the ONNX graph exported from a pickled model."""
+    return os.path.splitext(model_path)[0] + ".onnx"
+
+def message_onnx_inputs(vectorizer: Any, processed_messages: Sequence[str]) -> np.ndarray:
+    """Tokenize and drop stop words in Python, the way the fitted vectorizer does.
+
+    The ONNX text operators build n-grams before removing stop words, while
+    scikit-learn removes them first. Feeding the graph pre-filtered tokens
+    keeps the two identical.
+    """
+    tokenize = vectorizer.build_tokenizer()
+    stop_words = vectorizer.get_stop_words() or ()
+    return np.array(
+        [[" ".join(token for token in tokenize(message) if token not in stop_words)] for message in processed_messages],
+        dtype=object
+    ).reshape(-1, 1)
+
+def export_message_model(message_model: Any) -> bytes:
+    """Convert a trained MessageClassifier pipeline into a serialized ONNX graph."""
+    from skl2onnx import to_onnx
+    from skl2onnx.common.data_types import StringTensorType
+
+    if message_model.feature_mode != "tfidf":
+        raise ValueError(f"The '{message_model.feature_mode}' feature mode cannot be exported to ONNX")
+
+    vectorizer = message_model.model.named_steps['vectorizer']
+    classifier = message_model.model.named_steps['classifier']
+    onnx_model = to_onnx(
+        message_model.model,
+        initial_types=[('input', StringTensorType([None, 1]))],
+        # Text is already lowercased, so the "C" locale avoids depending on installed locales
+        options={id(classifier): {'zipmap': False}, id(vectorizer): {'locale': 'C'}},
+        target_opset=TARGET_OPSET
+    )
+    return _with_version(onnx_model, message_model.model_version)
+
+def export_url_model(url_model: Any) -> bytes:
+    """Convert a trained URLClassifier scaler and forest into a serialized ONNX graph."""
+    from sklearn.pipeline import Pipeline
+    from skl2onnx import to_onnx
+    from skl2onnx.common.data_types import DoubleTensorType
+
+    # Double input keeps the scaler in float64 like sklearn, so rows near split
+    # thresholds land on the same side; the trees then cast to float32 as sklearn does
+    pipeline = Pipeline([('scaler', url_model.scaler), ('classifier', url_model.model)])
+    onnx_model = to_onnx(
+        pipeline,
+        initial_types=[('input', DoubleTensorType([None, url_model.model.n_features_in_]))],
+        options={id(url_model.model): {'zipmap': False}},
+        target_opset=TARGET_OPSET
+    )
+    return _with_version(onnx_model, url_model.model_version)
+
+def _with_version(onnx_model: Any, model_version: str) -> bytes:
+    entry = onnx_model.metadata_props.add()
+    entry.key = MODEL_VERSION_KEY
+    entry.value = model_version
+    return onnx_model.SerializeToString()
+
+def write_onnx_model(serialized: bytes, path: str):
+    """Write an exported graph, replacing any existing file atomically."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(serialized)
+    os.replace(tmp_path, path)
+
+class OnnxClassifier:
+    """onnxruntime sessions for an exported classifier graph.
+
+    Two sessions share the graph: one with ONNX_INTRA_OP_THREADS for
+    single requests and one with ONNX_BATCH_INTRA_OP_THREADS for calls of
+    at least ONNX_BATCH_MIN_ROWS rows.
+    """
+
+    def __init__(self, model: Union[str, bytes], intra_op_threads: int = ONNX_INTRA_OP_THREADS,
+                 batch_intra_op_threads: int = ONNX_BATCH_INTRA_OP_THREADS,
+                 batch_min_rows: int = ONNX_BATCH_MIN_ROWS):
+        self.session = self._create_session(model, intra_op_threads)
+        if batch_intra_op_threads != intra_op_threads:
+            self.batch_session = self._create_session(model, batch_intra_op_threads)
+        else:
+            self.batch_session = self.session
+        self.batch_min_rows = batch_min_rows
+        self.input_name = self.session.get_inputs()[0].name
+        self.model_version = self.session.get_modelmeta().custom_metadata_map.get(MODEL_VERSION_KEY)
+
+    @staticmethod
+    def _create_session(model: Union[str, bytes], intra_op_threads: int):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        return ort.InferenceSession(model, options, providers=["CPUExecutionProvider"])
+
+    def predict_with_proba(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (labels, probabilities) for a batch of graph inputs."""
+        session = self.batch_session if len(X) >= self.batch_min_rows else self.session
+        labels, probabilities = session.run(None, {self.input_name: X})
+        return labels, probabilities.astype(np.float64)
+
+    def check_parity(self, X: np.ndarray, expected_labels: np.ndarray, expected_proba: np.ndarray,
+                     atol: float = 1e-4) -> Dict[str, Any]:
+        """Compare this graph's outputs on X with reference scikit-learn outputs."""
+        labels, probabilities = self.predict_with_proba(X)
+        max_abs_diff = float(np.abs(probabilities - expected_proba).max()) if len(X) else 0.0
+        label_agreement = float(np.mean(labels == expected_labels)) if len(X) else 1.0
+        return {
+            "rows": len(X),
+            "label_agreement": label_agreement,
+            "max_abs_diff": max_abs_diff,
+            "passed": label_agreement == 1.0 and max_abs_diff <= atol
+        }
+
+def load_onnx_classifier(path: str, model_version: str) -> Optional[OnnxClassifier]:
+    """Open the graph at path if the ONNX backend is enabled and it matches model_version."""
+    if INFERENCE_BACKEND != "onnx" or not os.path.exists(path):
+        return None
+    try:
+        classifier = OnnxClassifier(path)
+    except Exception as e:
+        print(f"Could not load ONNX model {path}: {e}")
+        return None
+    if classifier.model_version != model_version:
+        print(f"ONNX model {path} was exported from another model version; using sklearn for inference")
+        return None
+    return classifier
@@ -0,0 +1,180 @@
+import os
+import re
+from functools import lru_cache
+from ipaddress import AddressValueError, IPv6Address
+from typing import Dict, List, NamedTuple, Optional
+from urllib.parse import scheme_chars
+
+# Bundled ICANN public suffix snapshot, so extraction never touches the network
+DEFAULT_SUFFIX_LIST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "public_suffix_list.dat")
+
+# Number of distinct hosts whose split is memoized per extractor
+DEFAULT_SPLIT_CACHE_SIZE = 65536
+
+IPV4_PATTERN = re.compile(
+    r"^(?:(?:[0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])\.)"
+    r"{3}(?:[0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])$",
+    re.ASCII,
+)
+
+SCHEME_CHARS = set(scheme_chars)
+
+# Key marking a trie node as the end of a suffix rule; labels are always strings
+_END = None
+
+class DomainParts(NamedTuple):
+    """Host split into subdomain, registrable label and public suffix."""
+    subdomain: str
+    domain: str
+    suffix: str
+
+    @property
+    def registered_domain(self) -> str:
+        """Registrable domain (domain + suffix), or '' if there is no suffix."""
+        if self.domain and self.suffix:
+            return f"{self.domain}.{self.suffix}"
+        return ""
+
+class PublicSuffixExtractor:
+    """Offline replacement for tldextract.extract backed by a bundled suffix list.
+
+    The list is parsed into a reversed-label trie of nested dicts when the
+    extractor is constructed, and host splits are memoized in an LRU cache.
+    Results match tldextract's default behaviour (ICANN suffixes only).
+    """
+
+    def __init__(self, suffix_list_path: str = DEFAULT_SUFFIX_LIST_PATH, cache_size: int = DEFAULT_SPLIT_CACHE_SIZE):
+        self.suffix_list_path = suffix_list_path
+        self.trie = self._build_trie(self._read_rules(suffix_list_path))
+        self._split_host_cached = lru_cache(maxsize=cache_size)(self._split_host)
+
+    def __call__(self, url: str) -> DomainParts:
+        return self.extract(url)
+
+    def extract(self, url: str) -> DomainParts:
+        """Split the host of a URL (or bare host) into its domain parts."""
+        return self._split_host_cached(self.host_from_url(url))
+
+    def cache_info(self):
+        """Return hit/miss statistics for the memoized host splits."""
+        return self._split_host_cached.cache_info()
+
+    @staticmethod
+    def _read_rules(path: str) -> List[str]:
+        """Read suffix rules from a public suffix list file, skipping comments."""
+        rules = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                rule = line.strip()
+                if rule and not rule.startswith("//"):
+                    rules.append(rule)
+        return rules
+
+    @staticmethod
+    def _build_trie(rules: List[str]) -> Dict[str, dict]:
+        """Build a trie keyed by labels from the TLD inwards."""
+        root = {}
+        # Share identical label strings between nodes to keep the trie small
+        labels_seen = {}
+        for rule in rules:
+            node = root
+            for label in reversed(rule.split(".")):
+                label = labels_seen.setdefault(label, label)
+                node = node.setdefault(label, {})
+            node[_END] = True
+        return root
+
+    @staticmethod
+    def host_from_url(url: str) -> str:
+        """Extract the host of a URL leniently, the same way tldextract does."""
+        double_slashes_start = url.find("//")
+        if double_slashes_start == 0:
+            url = url[2:]
+        elif (double_slashes_start >= 2
+              and url[double_slashes_start - 1] == ":"
+              and not set(url[:double_slashes_start - 1]) - SCHEME_CHARS):
+            url = url[double_slashes_start + 2:]
+
+        authority = url.partition("/")[0].partition("?")[0].partition("#")[0]
+        after_userinfo = authority.rpartition("@")[-1]
+
+        if after_userinfo and after_userinfo[0] == "[":
+            maybe_ipv6 = after_userinfo.partition("]")
+            if maybe_ipv6[1] == "]":
+                return f"{maybe_ipv6[0]}]"
+
+        hostname = after_userinfo.partition(":")[0].strip()
+        return hostname.rstrip(".\u3002\uff0e\uff61")
+
+    def _split_host(self, host: str) -> DomainParts:
+        """Split a bare host against the suffix trie."""
+        host = host.replace("\u3002", ".").replace("\uff0e", ".").replace("\uff61", ".")
+
+        if len(host) >= 4 and host[0] == "[" and host[-1] == "]" and self._looks_like_ipv6(host[1:-1]):
+            return DomainParts("", host, "")
+
+        labels = host.split(".")
+        suffix_index = self._suffix_index(labels)
+
+        if suffix_index is None:
+            if len(labels) == 4 and host[:1].isdecimal() and IPV4_PATTERN.fullmatch(host):
+                return DomainParts("", host, "")
+            return DomainParts(".".join(labels[:-1]), labels[-1], "")
+
+        subdomain = ".".join(labels[:suffix_index - 1]) if suffix_index >= 2 else ""
+        domain = labels[suffix_index - 1] if suffix_index > 0 else ""
+        return DomainParts(subdomain, domain, ".".join(labels[suffix_index:]))
+
+    def _suffix_index(self, labels: List[str]) -> Optional[int]:
+        """Index of the first public suffix label in labels, or None if none match."""
+        node = self.trie
+        suffix_index = label_index = len(labels)
+
+        for label in reversed(labels):
+            decoded_label = self._decode_label(label)
+            if decoded_label in node:
+                label_index -= 1
+                node = node[decoded_label]
+                if _END in node:
+                    suffix_index = label_index
+                continue
+
+            # Wildcard rules (*.ck) match any label unless an exception (!www.ck) applies
+            if "*" in node:
+                return label_index if "!" + decoded_label in node else label_index - 1
+            break
+
+        if suffix_index == len(labels):
+            return None
+        return suffix_index
+
+    @staticmethod
+    def _decode_label(label: str) -> str:
+        """Lowercase a label and decode it if it is punycode."""
+        lowered = label.lower()
+        if lowered.startswith("xn--"):
+            try:
+                return lowered.encode("ascii").decode("idna")
+            except (UnicodeError, IndexError):
+                pass
+        return lowered
+
+    @staticmethod
+    def _looks_like_ipv6(maybe_ip: str) -> bool:
+        try:
+            IPv6Address(maybe_ip)
+        except AddressValueError:
+            return False
+        return True
+
+# Shared extractor; URLClassifier builds it at construction so requests never pay for parsing
+_default_extractor = None
+
+def get_default_extractor() -> PublicSuffixExtractor:
+    """Return the process-wide extractor, building it on first call."""
+    global _default_extractor
+    if _default_extractor is None:
+        _default_extractor = PublicSuffixExtractor(
+            os.getenv("PUBLIC_SUFFIX_LIST_PATH", DEFAULT_SUFFIX_LIST_PATH)
+        )
+    return _default_extractor
@@ -0,0 +1,309 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+# Add the backend directory to the path when run as a script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.base_model import BaseModel
+from models.cascade import cascade_path_for
+from models.onnx_backend import onnx_path_for
+
+ARTIFACT_NAME = "model.pkl"
+METADATA_NAME = "metadata.json"
+ACTIVE_NAME = "ACTIVE"
+
+# Files written next to a model file that belong to its version
+SIDECAR_PATHS = (onnx_path_for, cascade_path_for)
+
+class ModelRegistry:
+    """Directory of versioned model artifacts with checksums and metadata.
+
+    Layout: <root>/<name>/<version>/model.pkl and metadata.json, plus
+    <root>/<name>/ACTIVE holding the version workers should serve. Versions
+    are the same content hashes that classifiers report as model_version.
+    The ONNX graph and cascade first stage written next to a model file are
+    copied with it (model.onnx, model.cascade.pkl), so they load from the
+    version directory. Every write goes to a temporary path first and is
+    moved into place, so readers only ever see complete versions.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def publish(self, name: str, model_path: str, metadata: Dict[str, Any] = None, activate: bool = True) -> str:
+        """Copy a trained model file and its sidecars into the registry and return its version.
+
+        Publishing a model that is already registered adds or replaces its
+        sidecars, e.g. after export_onnx.py or evaluate_cascade.py --write.
+        """
+        with open(model_path, 'rb') as f:
+            raw = f.read()
+        version = BaseModel.compute_model_version(raw)
+        version_dir = os.path.join(self.root, name, version)
+
+        if not os.path.isdir(version_dir):
+            record = dict(metadata or {})
+            record.update({
+                "name": name,
+                "version": version,
+                "sha256": hashlib.sha256(raw).hexdigest(),
+                "size_bytes": len(raw),
+                "created_at": datetime.now(timezone.utc).isoformat()
+            })
+
+            tmp_dir = f"{version_dir}.tmp"
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+            with open(os.path.join(tmp_dir, ARTIFACT_NAME), 'wb') as f:
+                f.write(raw)
+            record["sidecars"] = self._copy_sidecars(model_path, tmp_dir)
+            with open(os.path.join(tmp_dir, METADATA_NAME), 'w') as f:
+                json.dump(record, f, indent=2)
+            os.replace(tmp_dir, version_dir)
+        else:
+            self._update_sidecars(name, version, model_path)
+
+        if activate:
+            self.activate(name, version)
+        return version
+
+    def activate(self, name: str, version: str):
+        """Point workers at an existing version (also used to roll back)."""
+        if not self.verify(name, version):
+            raise ValueError(f"Version {version} of '{name}' is missing or fails its checksum")
+        active_path = os.path.join(self.root, name, ACTIVE_NAME)
+        tmp_path = f"{active_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(version)
+        os.replace(tmp_path, active_path)
+
+    def active_version(self, name: str) -> Optional[str]:
+        """Version currently marked active for name, if any."""
+        try:
+            with open(os.path.join(self.root, name, ACTIVE_NAME)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def artifact_path(self, name: str, version: str) -> str:
+        return os.path.join(self.root, name, version, ARTIFACT_NAME)
+
+    @staticmethod
+    def _copy_sidecars(model_path: str, target_dir: str) -> Dict[str, str]:
+        """Copy the sidecars that exist next to model_path; returns their checksums by file name."""
+        checksums = {}
+        for sidecar_path in SIDECAR_PATHS:
+            source = sidecar_path(model_path)
+            if not os.path.exists(source):
+                continue
+            with open(source, 'rb') as f:
+                raw = f.read()
+            target_name = os.path.basename(sidecar_path(ARTIFACT_NAME))
+            tmp_path = os.path.join(target_dir, f"{target_name}.tmp")
+            with open(tmp_path, 'wb') as f:
+                f.write(raw)
+            os.replace(tmp_path, os.path.join(target_dir, target_name))
+            checksums[target_name] = hashlib.sha256(raw).hexdigest()
+        return checksums
+
+    def _update_sidecars(self, name: str, version: str, model_path: str):
+        """Add the current sidecars of model_path to an existing version."""
+        record = self.metadata(name, version)
+        if record is None:
+            return
+        version_dir = os.path.join(self.root, name, version)
+        sidecars = dict(record.get("sidecars") or {})
+        sidecars.update(self._copy_sidecars(model_path, version_dir))
+        if sidecars == record.get("sidecars"):
+            return
+        record["sidecars"] = sidecars
+        metadata_path = os.path.join(version_dir, METADATA_NAME)
+        tmp_path = f"{metadata_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(record, f, indent=2)
+        os.replace(tmp_path, metadata_path)
+
+    def metadata(self, name: str, version: str) -> Optional[Dict[str, Any]]:
+        """Stored metadata of a version, or None if it does not exist."""
+        try:
+            with open(os.path.join(self.root, name, version, METADATA_NAME)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def list_versions(self, name: str) -> List[Dict[str, Any]]:
+        """Metadata of every version of name, oldest first."""
+        model_dir = os.path.join(self.root, name)
+        if not os.path.isdir(model_dir):
+            return []
+        versions = []
+        for entry in os.listdir(model_dir):
+            if entry.endswith(".tmp") or not os.path.isdir(os.path.join(model_dir, entry)):
+                continue
+            metadata = self.metadata(name, entry)
+            if metadata is not None:
+                versions.append(metadata)
+        return sorted(versions, key=lambda metadata: metadata["created_at"])
+
+    def verify(self, name: str, version: str) -> bool:
+        """Check a version's artifact and sidecars against their recorded checksums."""
+        metadata = self.metadata(name, version)
+        if metadata is None:
+            return False
+        expected = dict(metadata.get("sidecars") or {}, **{ARTIFACT_NAME: metadata["sha256"]})
+        try:
+            for file_name, sha256 in expected.items():
+                with open(os.path.join(self.root, name, version, file_name), 'rb') as f:
+                    if hashlib.sha256(f.read()).hexdigest() != sha256:
+                        return False
+        except FileNotFoundError:
+            return False
+        return True
+
+class HotSwapModel:
+    """The model a worker serves for one registry name, swapped without downtime.
+
+    Requests read .current once and keep using that object, so a swap only
+    rebinds the reference: requests already running finish on the old model
+    and new ones get the new model. New versions are loaded and checked
+    completely before the swap. Without an active registry version the
+    model is loaded from fallback_path.
+    """
+
+    def __init__(self, registry: ModelRegistry, name: str, factory: Callable[[str], Any], fallback_path: str):
+        self.registry = registry
+        self.name = name
+        self.factory = factory
+        self.fallback_path = fallback_path
+        self.current = None
+        self.version = None
+        # Last version that failed to load, so it is not retried on every poll
+        self._rejected = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self) -> bool:
+        """Load and swap in the active version if it changed; returns True on a swap."""
+        with self._lock:
+            version = self.registry.active_version(self.name)
+            if self.current is not None and version in (self.version, self._rejected):
+                return False
+
+            if version is None:
+                if self.current is not None:
+                    return False
+                model = self._load(self.fallback_path)
+            else:
+                if not self.registry.verify(self.name, version):
+                    print(f"Registry version {version} of '{self.name}' fails its checksum; keeping {self.version}")
+                    self._rejected = version
+                    return False
+                model = self._load(self.registry.artifact_path(self.name, version))
+                if model.model_version != version:
+                    print(f"Could not load registry version {version} of '{self.name}'; keeping {self.version}")
+                    self._rejected = version
+                    return False
+
+            self.current = model
+            self.version = version
+            return True
+
+    def get(self) -> Any:
+        """The served model, loaded on first use if warm-up has not run yet."""
+        model = self.current
+        if model is None:
+            self.refresh()
+            model = self.current
+        return model
+
+    def _load(self, path: str) -> Any:
+        model = self.factory(path)
+        model.load_model()
+        return model
+
+    def start_polling(self, interval: float):
+        """Check the registry every interval seconds in a background thread."""
+        if self._thread is not None:
+            return
+
+        def poll():
+            while not self._stop.wait(interval):
+                try:
+                    if self.refresh():
+                        print(f"Swapped in {self.name} model version {self.version}")
+                except Exception as e:
+                    print(f"Model registry poll failed for '{self.name}': {e}")
+
+        self._thread = threading.Thread(target=poll, name=f"registry-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop_polling(self):
+        self._stop.set()
+
+    def status(self) -> Dict[str, Any]:
+        """Served version and its registry metadata."""
+        model_version = getattr(self.current, 'model_version', None)
+        return {
+            "model_version": model_version,
+            "registry_version": self.version,
+            "metadata": self.registry.metadata(self.name, self.version) if self.version else None
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage versioned models in the model registry.")
+    parser.add_argument("--registry", default=os.getenv("MODEL_REGISTRY_DIR", "models/registry"))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    publish = commands.add_parser("publish", help="Add a trained model file and make it active")
+    publish.add_argument("name", help="Registry name, e.g. message or url")
+    publish.add_argument("model_path", help="Trained model file")
+    publish.add_argument("--training-samples", type=int, default=None, help="Size of the training set")
+    publish.add_argument("--metric", action="append", default=[], metavar="NAME=VALUE", help="Evaluation metric; may be repeated")
+    publish.add_argument("--no-activate", action="store_true", help="Publish without activating")
+
+    activate = commands.add_parser("activate", help="Serve an existing version (e.g. to roll back)")
+    activate.add_argument("name")
+    activate.add_argument("version")
+
+    listing = commands.add_parser("list", help="Show the versions of a model")
+    listing.add_argument("name")
+
+    args = parser.parse_args()
+    registry = ModelRegistry(args.registry)
+
+    if args.command == "publish":
+        metrics = {}
+        for item in args.metric:
+            key, _, value = item.partition("=")
+            if not value:
+                parser.error(f"Expected NAME=VALUE, got: {item}")
+            metrics[key] = float(value)
+        version = registry.publish(args.name, args.model_path, {
+            "training_samples": args.training_samples,
+            "metrics": metrics,
+            "source": os.path.abspath(args.model_path)
+        }, activate=not args.no_activate)
+        print(f"Published {args.name} version {version}" + ("" if args.no_activate else " (active)"))
+    elif args.command == "activate":
+        try:
+            registry.activate(args.name, args.version)
+        except ValueError as e:
+            sys.exit(str(e))
+        print(f"Activated {args.name} version {args.version}")
+    else:
+        active = registry.active_version(args.name)
+        for metadata in registry.list_versions(args.name):
+            marker = "*" if metadata["version"] == active else " "
+            print(f"{marker} {metadata['version']}  {metadata['created_at']}  "
+                  f"samples={metadata.get('training_samples')}  metrics={metadata.get('metrics')}")
+
+if __name__ == "__main__":
+    main()
@@ -4,9 +4,37 @@ import re
 from urllib.parse import urlparse
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
-import tldextract
-from typing import Dict, Any, List
-from .base_model import BaseModel
+from typing import Dict, Any, List, Sequence
+from .base_model import BaseModel, DEFAULT_MODEL_VERSION
+from .public_suffix import get_default_extractor
+from .forest_engine import FlatForest
+from .explainers import TreePathExplainer
+from .onnx_backend import load_onnx_classifier, onnx_path_for
+from .cascade import FIRST_STAGE, cascade_path_for, first_stage_explanation, load_first_stage, run_cascade
+from utils.keyword_matcher import get_default_matcher
+
+# Characters counted directly from the raw URL (features 4-11), in feature order
+COUNTED_CHARS = ['.', '/', '-', '_', '?', '=', '&', '%']
+
+IP_PATTERN = re.compile(r'\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b')
+
+# Number of URLs encoded into one character matrix at a time by the batch extractor
+BATCH_CHUNK_SIZE = 4096
+# Longer URLs are extracted one at a time: numpy's fixed-width strings pad
+# every URL of a chunk to its longest one, so one huge URL would cost
+# BATCH_CHUNK_SIZE times its size
+BATCH_MAX_URL_LENGTH = 2048
+
+FEATURE_NAMES = (
+    "URL Length", "Domain Length", "Path Length", "Dots Count", "Slashes Count",
+    "Dashes Count", "Underscores Count", "Question Marks Count", "Equal Signs Count",
+    "Ampersands Count", "Percent Signs Count", "Subdomain Count", "IP Address Present",
+    "Suspicious Keywords Count", "URL Entropy", "Parameter Count", "@ Symbol Present",
+    "Unusual Port Present"
+)
+
+# Number of features reported in an explanation's top_features list
+TOP_FEATURE_COUNT = 10
 
 class URLClassifier(BaseModel):
     """URL classification model for detecting malicious websites."""
@@ -17,20 +45,68 @@ class URLClassifier(BaseModel):
         self.label_map = {0: "safe", 1: "suspicious", 2: "malicious"}
         # Initialize a default model
         self.model = RandomForestClassifier(n_estimators=100, random_state=42)
+        self.model_version = DEFAULT_MODEL_VERSION
+        # Offline public suffix trie, parsed now rather than on the first request
+        self.suffix_extractor = get_default_extractor()
+        # Shared keyword automaton; url_feature_keywords feeds feature 14, so retrain after editing it
+        self.keyword_matcher = get_default_matcher()
+        # Flattened forest used for inference once a fitted model is available
+        self.engine = None
+        # onnxruntime session, used instead of the engine when INFERENCE_BACKEND=onnx
+        self.onnx_model = None
+        # Linear filter that settles confident URLs before the forest when CASCADE_INFERENCE=on
+        self.first_stage = None
+        # Exact per-URL attributions along the compiled forest's decision paths
+        self.explainer = None
+        # Feature indices ordered by importance, computed once per loaded model
+        self.importance_ranking = None
     
     def load_model(self):
         """Load the trained model from disk."""
         try:
             with open(self.model_path, 'rb') as f:
-                data = pickle.load(f)
-                if isinstance(data, dict) and 'model' in data and 'scaler' in data:
-                    self.model = data['model']
-                    self.scaler = data['scaler']
-                else:
-                    self.model = data
+                raw = f.read()
+            data = pickle.loads(raw)
+            if isinstance(data, dict) and 'model' in data and 'scaler' in data:
+                self.model = data['model']
+                self.scaler = data['scaler']
+            else:
+                self.model = data
+            self.model_version = self.compute_model_version(raw)
         except (FileNotFoundError, pickle.UnpicklingError):
             # Initialize a default model if file doesn't exist or is invalid
             self.model = RandomForestClassifier(n_estimators=100, random_state=42)
+            self.model_version = DEFAULT_MODEL_VERSION
+        self._compile_engine()
+        self._rank_feature_importances()
+        self.onnx_model = load_onnx_classifier(onnx_path_for(self.model_path), self.model_version)
+        self.first_stage = load_first_stage(cascade_path_for(self.model_path), self.model_version)
+    
+    def _compile_engine(self):
+        """Flatten the fitted forest for fast inference, keeping sklearn as fallback."""
+        self.engine = None
+        self.explainer = None
+        if not isinstance(self.model, RandomForestClassifier) or not hasattr(self.model, 'estimators_'):
+            return
+        
+        try:
+            engine = FlatForest.from_sklearn(self.model, self.scaler)
+            if engine.check_parity(self.model, self.scaler):
+                self.engine = engine
+                self.explainer = TreePathExplainer(engine, FEATURE_NAMES, self.label_map)
+            else:
+                print("Compiled URL forest disagrees with sklearn; using sklearn for inference")
+        except Exception as e:
+            print(f"Could not compile URL forest: {e}")
+    
+    def _rank_feature_importances(self):
+        """Cache the top feature indices by importance for the current model."""
+        self.importance_ranking = None
+        if hasattr(self.model, 'feature_importances_'):
+            importances = self.model.feature_importances_
+            # Stable descending sort keeps ties in feature order, like list.sort(reverse=True)
+            order = np.argsort(-importances, kind='stable')[:TOP_FEATURE_COUNT]
+            self.importance_ranking = [(int(i), float(importances[i])) for i in order]
     
     def extract_features(self, url: str) -> List[float]:
         """Extract features from a URL for classification."""
@@ -43,7 +119,7 @@ class URLClassifier(BaseModel):
         query = parsed.query
         
         # Extract domain parts
-        extracted = tldextract.extract(url)
+        extracted = self.suffix_extractor.extract(url)
         subdomain = extracted.subdomain
         domain_name = extracted.domain
         suffix = extracted.suffix
@@ -85,12 +161,10 @@ class URLClassifier(BaseModel):
         features.append(subdomain.count('.') + 1 if subdomain else 0)
         
         # Feature 13: Presence of IP address
-        ip_pattern = r'\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b'
-        features.append(1 if re.search(ip_pattern, domain) else 0)
+        features.append(1 if IP_PATTERN.search(domain) else 0)
         
         # Feature 14: Presence of suspicious keywords
-        suspicious_keywords = ['secure', 'account', 'update', 'confirm', 'login', 'signin', 'bank', 'paypal', 'amazon']
-        suspicious_count = sum(1 for keyword in suspicious_keywords if keyword in url.lower())
+        suspicious_count = len(self.keyword_matcher.match(url)["url_feature_keywords"])
         features.append(suspicious_count)
         
         # Feature 15: URL entropy (randomness)
@@ -117,15 +191,115 @@ class URLClassifier(BaseModel):
         
         return features
     
+    def extract_features_batch(self, urls: Sequence[str]) -> np.ndarray:
+        """Extract features for many URLs into a single (n_urls, 18) matrix.
+        
+        Produces the same columns as extract_features, in get_feature_names order.
+        Counts, lengths and entropy are computed in bulk over a character matrix;
+        only URL parsing and the IP check still run per URL. URLs longer than
+        BATCH_MAX_URL_LENGTH go through extract_features instead.
+        """
+        n_urls = len(urls)
+        X = np.empty((n_urls, len(FEATURE_NAMES)), dtype=np.float64)
+        
+        short_rows = []
+        for i, url in enumerate(urls):
+            if len(url) > BATCH_MAX_URL_LENGTH:
+                X[i] = self.extract_features(url)
+            else:
+                short_rows.append(i)
+        
+        for start in range(0, len(short_rows), BATCH_CHUNK_SIZE):
+            rows = short_rows[start:start + BATCH_CHUNK_SIZE]
+            out = np.empty((len(rows), len(FEATURE_NAMES)), dtype=np.float64)
+            self._fill_feature_rows([urls[i] for i in rows], out)
+            X[rows] = out
+        
+        return X
+    
+    def _fill_feature_rows(self, urls: List[str], out: np.ndarray):
+        """Write the feature rows for one chunk of URLs into out."""
+        url_arr = np.array(urls, dtype=str)
+        lower_arr = np.char.lower(url_arr)
+        
+        # URL components still need a per-URL parse
+        domains, paths, queries, subdomains = [], [], [], []
+        for url in urls:
+            parsed = urlparse(url)
+            domains.append(parsed.netloc)
+            paths.append(parsed.path)
+            queries.append(parsed.query)
+            subdomains.append(self.suffix_extractor.extract(url).subdomain)
+        domain_arr = np.array(domains, dtype=str)
+        subdomain_arr = np.array(subdomains, dtype=str)
+        
+        # Features 1-3: URL, domain and path lengths. Lengths are taken from
+        # the Python strings, since numpy's fixed-width strings drop trailing NULs
+        url_lengths = self._lengths(urls)
+        out[:, 0] = url_lengths
+        out[:, 1] = self._lengths(domains)
+        out[:, 2] = self._lengths(paths)
+        
+        # Features 4-11: character counts
+        for offset, char in enumerate(COUNTED_CHARS):
+            out[:, 3 + offset] = np.char.count(url_arr, char)
+        
+        # Feature 12: Number of subdomains
+        out[:, 11] = np.where(self._lengths(subdomains) > 0,
+                              np.char.count(subdomain_arr, '.') + 1, 0)
+        
+        # Feature 13: Presence of IP address
+        out[:, 12] = [1 if IP_PATTERN.search(domain) else 0 for domain in domains]
+        
+        # Feature 14: Suspicious keywords count
+        keyword_hits = np.zeros(len(urls), dtype=np.int64)
+        for keyword in self.keyword_matcher.patterns("url_feature_keywords"):
+            keyword_hits += np.char.find(lower_arr, keyword) >= 0
+        out[:, 13] = keyword_hits
+        
+        # Feature 15: URL entropy
+        out[:, 14] = self._batch_entropy(urls, url_lengths)
+        
+        # Feature 16: Number of parameters
+        query_arr = np.array(queries, dtype=str)
+        out[:, 15] = np.where(self._lengths(queries) > 0,
+                              np.char.count(query_arr, '&') + 1, 0)
+        
+        # Feature 17: Presence of @ symbol
+        out[:, 16] = np.char.find(url_arr, '@') >= 0
+        
+        # Feature 18: Presence of port number (unusual ports)
+        has_port = np.char.find(domain_arr, ':') >= 0
+        standard_port = (np.char.find(domain_arr, ':80') >= 0) | (np.char.find(domain_arr, ':443') >= 0)
+        out[:, 17] = has_port & ~standard_port
+    
+    @staticmethod
+    def _lengths(strings: List[str]) -> np.ndarray:
+        """Lengths of the Python strings, as an int64 array."""
+        return np.fromiter(map(len, strings), dtype=np.int64, count=len(strings))
+    
+    @staticmethod
+    def _batch_entropy(urls: List[str], lengths: np.ndarray) -> np.ndarray:
+        """Shannon entropy of every string in urls, computed without a per-URL loop."""
+        n_urls = len(urls)
+        if n_urls == 0 or not lengths.any():
+            return np.zeros(n_urls)
+        
+        # Code points of all URLs end to end, each tagged with its URL's row,
+        # so memory follows the total length rather than n_urls * max_len
+        codes = np.frombuffer("".join(urls).encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+        rows = np.repeat(np.arange(n_urls), lengths)
+        
+        # Count each (row, character) pair once, then sum -p*log2(p) back per row
+        keys = rows * 0x110000 + codes
+        unique_keys, counts = np.unique(keys, return_counts=True)
+        key_rows = unique_keys // 0x110000
+        p = counts / lengths[key_rows]
+        return np.bincount(key_rows, weights=-p * np.log2(p), minlength=n_urls)
+    
     def get_feature_names(self) -> List[str]:
         """Get names of extracted features."""
-        return [
-            "URL Length", "Domain Length", "Path Length", "Dots Count", "Slashes Count",
-            "Dashes Count", "Underscores Count", "Question Marks Count", "Equal Signs Count",
-            "Ampersands Count", "Percent Signs Count", "Subdomain Count", "IP Address Present",
-            "Suspicious Keywords Count", "URL Entropy", "Parameter Count", "@ Symbol Present",
-            "Unusual Port Present"
-        ]
+        return list(FEATURE_NAMES)
     
     def preprocess(self, url: str) -> np.ndarray:
         """Preprocess the URL for model input."""
@@ -136,7 +310,7 @@ class URLClassifier(BaseModel):
     def train(self, urls: list, labels: list):
         """Train the model with provided data."""
         # Extract features for all URLs
-        X = np.array([self.extract_features(url) for url in urls])
+        X = self.extract_features_batch(urls)
         
         # Scale features
         X_scaled = self.scaler.fit_transform(X)
@@ -145,57 +319,144 @@ class URLClassifier(BaseModel):
         self.model.fit(X_scaled, labels)
         
         # Save the trained model and scaler
+        raw = pickle.dumps({'model': self.model, 'scaler': self.scaler})
         with open(self.model_path, 'wb') as f:
-            pickle.dump({'model': self.model, 'scaler': self.scaler}, f)
+            f.write(raw)
+        self.model_version = self.compute_model_version(raw)
+        self._compile_engine()
+        self._rank_feature_importances()
+        # Any exported graph and first stage belong to the previous model; refit them to use them again
+        self.onnx_model = None
+        self.first_stage = None
     
     def predict(self, url: str) -> Dict[str, Any]:
         """Predict if a URL is safe, suspicious, or malicious."""
-        # Extract and scale features
-        features = self.preprocess(url)
+        predictions, probabilities, stages = self._predict_rows(self.preprocess(url))
+        return self._format_prediction(predictions[0], probabilities[0], stages[0] if stages is not None else None)
+    
+    def predict_batch(self, urls: Sequence[str]) -> List[Dict[str, Any]]:
+        """Predict many URLs with one feature extraction and one model call."""
+        if len(urls) == 0:
+            return []
+        
+        predictions, probabilities, stages = self._predict_rows(self.extract_features_batch(urls))
+        return [
+            self._format_prediction(prediction, row, stages[i] if stages is not None else None)
+            for i, (prediction, row) in enumerate(zip(predictions, probabilities))
+        ]
+    
+    def _predict_rows(self, features: np.ndarray):
+        """Return (labels, probabilities, stages), sending only unsettled rows to the full model.
+        
+        stages is None when no first stage is loaded.
+        """
+        if self.first_stage is None:
+            return (*self._predict_features(features), None)
+        features = np.asarray(features, dtype=np.float64)
+        return run_cascade(self.first_stage, features, lambda rows: self._predict_features(features[rows]))
+    
+    def _predict_features(self, features: np.ndarray):
+        """Return (labels, probabilities) for a matrix of unscaled feature rows."""
+        # The exported graph includes the scaler
+        if self.onnx_model is not None:
+            return self.onnx_model.predict_with_proba(np.asarray(features, dtype=np.float64))
+        
+        # Compiled forest scales and scores every row in one pass
+        if self.engine is not None:
+            return self.engine.predict_with_proba(features)
+        
         if hasattr(self, 'scaler'):
             features = self.scaler.transform(features)
         
-        # Get prediction
-        prediction = self.model.predict(features)[0]
-        
-        # Get prediction probabilities
+        predictions = self.model.predict(features)
         if hasattr(self.model, "predict_proba"):
-            probabilities = self.model.predict_proba(features)[0]
-            confidence = float(np.max(probabilities))
+            probabilities = self.model.predict_proba(features)
         else:
-            probabilities = [0.0] * len(self.label_map)
-            confidence = 1.0
+            probabilities = np.zeros((len(features), len(self.label_map)))
+        return predictions, probabilities
+    
+    def _format_prediction(self, prediction: Any, probabilities: np.ndarray, stage: str = None) -> Dict[str, Any]:
+        """Build the prediction dict returned by predict and predict_batch.
         
-        return {
+        With a cascade, stage records which stage settled the URL.
+        """
+        result = {
             "prediction": self.label_map.get(prediction, "unknown"),
-            "confidence": confidence,
+            "confidence": float(np.max(probabilities)) if probabilities.any() else 1.0,
             "probabilities": {
                 self.label_map[i]: float(prob) for i, prob in enumerate(probabilities)
             }
         }
+        if stage is not None:
+            result["stage"] = stage
+        return result
+    
+    def analyze(self, url: str):
+        """Predict and explain a URL from a single feature extraction.
+        
+        Returns (prediction, explanation) in the same formats as predict and
+        explain_prediction.
+        """
+        features = self.extract_features(url)
+        predictions, probabilities, stages = self._predict_rows(np.array(features).reshape(1, -1))
+        if stages is None:
+            return self._format_prediction(predictions[0], probabilities[0]), self._explain_features(url, features)
+        prediction = self._format_prediction(predictions[0], probabilities[0], stages[0])
+        if stages[0] == FIRST_STAGE:
+            # Settled by the first stage: skip the path attributions too
+            return prediction, first_stage_explanation(prediction)
+        return prediction, self._explain_features(url, features)
+    
+    def analyze_batch(self, urls: Sequence[str]) -> List[tuple]:
+        """Predict and explain many URLs from one feature extraction.
+        
+        Returns one (prediction, explanation) pair per URL, as analyze does.
+        """
+        if len(urls) == 0:
+            return []
+        
+        features = self.extract_features_batch(urls)
+        predictions, probabilities, stages = self._predict_rows(features)
+        analyses = []
+        for i, url in enumerate(urls):
+            stage = stages[i] if stages is not None else None
+            prediction = self._format_prediction(predictions[i], probabilities[i], stage)
+            if stage == FIRST_STAGE:
+                explanation = first_stage_explanation(prediction)
+            else:
+                explanation = self._explain_features(url, self._row_as_features(features[i]))
+            analyses.append((prediction, explanation))
+        return analyses
+    
+    @staticmethod
+    def _row_as_features(row: np.ndarray) -> List[float]:
+        """A batch feature row in extract_features' form: counts as ints, entropy as a float."""
+        features = [int(value) for value in row]
+        features[14] = float(row[14])
+        return features
     
     def explain_prediction(self, url: str) -> Dict[str, Any]:
         """Provide detailed explanation for the URL prediction with feature importance."""
-        features = self.extract_features(url)
-        feature_names = self.get_feature_names()
+        return self._explain_features(url, self.extract_features(url))
+    
+    def _explain_features(self, url: str, features: List[float]) -> Dict[str, Any]:
+        """Build the URL explanation from already extracted features."""
+        feature_names = FEATURE_NAMES
         
         # Get feature importance if available
+        if self.importance_ranking is None and hasattr(self.model, 'feature_importances_'):
+            self._rank_feature_importances()
+        
         feature_importance = {}
-        if hasattr(self.model, 'feature_importances_'):
-            importances = self.model.feature_importances_
-            # Sort features by importance
-            feature_importance_list = [(feature_names[i], importances[i], features[i]) 
-                                     for i in range(len(feature_names))]
-            feature_importance_list.sort(key=lambda x: x[1], reverse=True)
-            
+        if self.importance_ranking is not None:
             feature_importance = {
                 "top_features": [
                     {
-                        "feature": name,
-                        "importance": float(importance),
-                        "value": float(value)
+                        "feature": feature_names[i],
+                        "importance": importance,
+                        "value": float(features[i])
                     }
-                    for name, importance, value in feature_importance_list[:10]
+                    for i, importance in self.importance_ranking
                 ]
             }
         
@@ -268,14 +529,21 @@ class URLClassifier(BaseModel):
         # Generate human-readable explanation
         text_explanation = self._generate_url_text_explanation(url, features)
         
-        return {
-            "url_analysis": {
-                "features": {name: value for name, value in zip(feature_names, features)},
-                "concerns": concerns,
-                "text_explanation": text_explanation,
-                "feature_importance": feature_importance
-            }
+        url_analysis = {
+            "features": {name: value for name, value in zip(feature_names, features)},
+            "concerns": concerns,
+            "text_explanation": text_explanation,
+            "feature_importance": feature_importance
         }
+        
+        # How each feature moved this URL's probabilities, from its decision paths
+        if self.explainer is not None:
+            try:
+                url_analysis["feature_attribution"] = self.explainer.explain(features)
+            except Exception as e:
+                print(f"Feature attribution failed: {e}")
+        
+        return {"url_analysis": url_analysis}
     
     def _generate_url_text_explanation(self, url: str, features: List[float]) -> List[str]:
         """Generate human-readable explanations for URL analysis."""
@@ -304,7 +572,7 @@ class URLClassifier(BaseModel):
             explanations.append("Unusually long path in URL, may contain obfuscated content")
         
         # Check for common phishing patterns
-        if 'login' in url.lower() or 'secure' in url.lower() or 'account' in url.lower():
+        if self.keyword_matcher.match(url)["url_phishing_terms"]:
             explanations.append("Contains terms commonly used in phishing attempts")
         
         # If no specific patterns found, provide general explanation
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.concurrency import run_in_threadpool
 from typing import List
 from datetime import timedelta
 import sys
@@ -9,7 +10,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from schemas.auth import UserCreate, UserResponse, Token
-from utils.database import get_db_connection
+from utils.async_database import create_user, user_exists
 from services.auth_service import (
     get_password_hash, 
     authenticate_user, 
@@ -22,95 +23,55 @@ router = APIRouter(prefix="/auth", tags=["Authentication"])
 @router.post("/register", response_model=UserResponse)
 async def register_user(user: UserCreate):
     """Register a new user."""
-    conn = get_db_connection()
-    if not conn:
+    # Check if user already exists
+    existing_user = await user_exists(user.username, user.email)
+    if existing_user is None:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Database connection failed"
         )
     
-    try:
-        cursor = conn.cursor()
-        
-        # Check if user already exists
-        cursor.execute(
-            "SELECT id FROM users WHERE username = %s OR email = %s", 
-            (user.username, user.email)
-        )
-        existing_user = cursor.fetchone()
-        
-        if existing_user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Username or email already registered"
-            )
-        
-        # Hash password
-        hashed_password = get_password_hash(user.password)
-        
-        # Insert new user
-        cursor.execute(
-            """
-            INSERT INTO users (username, email, password_hash) 
-            VALUES (%s, %s, %s) 
-            RETURNING id, username, email, created_at
-            """,
-            (user.username, user.email, hashed_password)
-        )
-        
-        new_user = cursor.fetchone()
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        return UserResponse(
-            id=new_user['id'],
-            username=new_user['username'],
-            email=new_user['email'],
-            created_at=new_user['created_at']
+    if existing_user:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username or email already registered"
         )
     
-    except Exception as e:
-        conn.rollback()
-        conn.close()
+    # Hash password off the event loop; bcrypt takes a noticeable fraction of a second
+    hashed_password = await run_in_threadpool(get_password_hash, user.password)
+    
+    # Insert new user
+    new_user = await create_user(user.username, user.email, hashed_password)
+    if new_user is None:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Registration failed: {str(e)}"
+            detail="Registration failed"
         )
+    
+    return UserResponse(
+        id=new_user['id'],
+        username=new_user['username'],
+        email=new_user['email'],
+        created_at=new_user['created_at']
+    )
 
 @router.post("/login", response_model=Token)
 async def login_user(form_data: OAuth2PasswordRequestForm = Depends()):
     """Authenticate user and return access token."""
-    conn = get_db_connection()
-    if not conn:
+    user = await authenticate_user(form_data.username, form_data.password)
+    
+    if not user:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Database connection failed"
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username or password",
+            headers={"WWW-Authenticate": "Bearer"},
         )
     
-    try:
-        user = authenticate_user(form_data.username, form_data.password, conn)
-        conn.close()
-        
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Incorrect username or password",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        
-        # Create access token
-        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            data={"sub": user["username"]}, 
-            expires_delta=access_token_expires
-        )
-        
-        return Token(access_token=access_token, token_type="bearer")
+    # Create access token
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": user["username"]}, 
+        expires_delta=access_token_expires
+    )
     
-    except Exception as e:
-        conn.close()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Login failed: {str(e)}"
-        )
\ No newline at end of file
+    return Token(access_token=access_token, token_type="bearer")
@@ -7,7 +7,6 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from schemas.scan import RiskScore
 from services.risk_service import RiskService
-from utils.database import get_db_connection
 
 router = APIRouter(prefix="/risk", tags=["Risk Scoring"])
 
@@ -51,22 +50,13 @@ async def get_risk_score(token: str = None):
 @router.get("/score/{user_id}", response_model=RiskScore)
 async def get_user_risk_score(user_id: int):
     """Get the risk score for a specific user."""
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Database connection failed"
-        )
-    
     try:
         # Calculate risk score for the user
-        risk_data = risk_service.calculate_risk_score(user_id, conn)
-        conn.close()
+        risk_data = await risk_service.calculate_risk_score(user_id)
         
         return RiskScore(**risk_data)
     
     except Exception as e:
-        conn.close()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to calculate risk score: {str(e)}"
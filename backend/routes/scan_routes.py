@@ -7,20 +7,123 @@ import os
 # Add the parent directory to the path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from schemas.scan import ScanRequest, ScanResult, ScanHistory, FeedbackRequest
-from utils.database import get_db_connection, save_scan_result, get_user_privacy_settings
+from schemas.scan import (
+    ScanRequest,
+    ScanResult,
+    ScanHistory,
+    FeedbackRequest,
+    BatchScanRequest,
+    BatchScanItemResult,
+    BatchScanResponse
+)
+from utils.database import content_hash
+from utils.async_database import (
+    get_user_by_username, get_user_privacy_settings, update_user_privacy_settings,
+    get_recent_verdicts, get_scan_history as get_user_scan_history, save_feedback
+)
+from utils.scan_writer import save_scan_result, save_scan_results, wait_for_scan
 from services.auth_service import decode_access_token
 from models.message_classifier import MessageClassifier
 from models.url_classifier import URLClassifier
 from services.breach_service import BreachService
+from services.reputation_service import load_reputation_index
+from services.explanation_service import ExplanationService
+from services.campaign_service import CampaignIndex
+from utils.cache import VerdictCache, canonicalize_url
+from models.registry import ModelRegistry, HotSwapModel
+from models.cascade import FIRST_STAGE
 
 router = APIRouter(prefix="/scan", tags=["Scanning"])
 
-# Initialize models
-message_model = MessageClassifier()
-url_model = URLClassifier()
+# Models are served from the registry and swapped in place when a new version
+# is activated; without a registry the configured model files are loaded.
+# Nothing is loaded at import time: warm_up() loads them on app startup.
+model_registry = ModelRegistry(os.getenv("MODEL_REGISTRY_DIR", "models/registry"))
+message_models = HotSwapModel(
+    model_registry, "message", MessageClassifier,
+    fallback_path=os.getenv("MESSAGE_MODEL_PATH", "models/message_model.pkl")
+)
+url_models = HotSwapModel(
+    model_registry, "url", URLClassifier,
+    fallback_path=os.getenv("URL_MODEL_PATH", "models/url_model.pkl")
+)
 breach_service = BreachService()
 
+# How often (seconds) workers check the registry for a new active version
+MODEL_REGISTRY_POLL_SECONDS = float(os.getenv("MODEL_REGISTRY_POLL_SECONDS", "30"))
+
+# Inputs scored once per model during warm-up
+WARM_UP_MESSAGE = "Congratulations! You have won a prize, click here to claim it now"
+WARM_UP_URL = "http://secure-login.example.com/verify?account=123"
+
+def warm_up():
+    """Load the served models and run each prediction path once (called on app startup).
+    
+    The first prediction pays for lazily built state (vectorizer and
+    explainer caches, compiled forest, onnxruntime sessions), so doing it
+    here keeps that cost off the first real request.
+    """
+    for name, models, sample in (("message", message_models, WARM_UP_MESSAGE), ("url", url_models, WARM_UP_URL)):
+        model = models.get()
+        try:
+            model.predict_batch([sample, sample])
+            model.analyze_batch([sample, sample])
+            model.analyze(sample)
+        except Exception as e:
+            print(f"Warm-up prediction failed for the {name} model: {e}")
+
+def start_model_polling():
+    """Start watching the registry for new model versions (called on app startup)."""
+    message_models.start_polling(MODEL_REGISTRY_POLL_SECONDS)
+    url_models.start_polling(MODEL_REGISTRY_POLL_SECONDS)
+
+# Memory-mapped known-bad domain index, shared by all workers through the page cache
+reputation_index = load_reputation_index(
+    os.getenv("DOMAIN_REPUTATION_INDEX_PATH", "models/data/bad_domains.idx")
+)
+
+# URL verdicts keyed by canonical URL; cleared whenever a new URL model version is seen
+url_verdict_cache = VerdictCache(
+    max_entries=int(os.getenv("URL_VERDICT_CACHE_MAX_ENTRIES", "10000")),
+    ttl_seconds=float(os.getenv("URL_VERDICT_CACHE_TTL_SECONDS", "3600")),
+    max_bytes=int(os.getenv("URL_VERDICT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+)
+
+# Message verdicts keyed by content hash, so no message text is kept in memory
+message_verdict_cache = VerdictCache(
+    max_entries=int(os.getenv("MESSAGE_VERDICT_CACHE_MAX_ENTRIES", "10000")),
+    ttl_seconds=float(os.getenv("MESSAGE_VERDICT_CACHE_TTL_SECONDS", "3600")),
+    max_bytes=int(os.getenv("MESSAGE_VERDICT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+)
+
+# Freshness window (seconds) for reusing a verdict stored in scan_history for
+# the same content hash and model version when the in-memory tier misses; 0 disables
+VERDICT_REUSE_MAX_AGE_SECONDS = float(os.getenv("VERDICT_REUSE_MAX_AGE_SECONDS", "86400"))
+
+# Near-duplicate message index: copies of a campaign reuse the first copy's
+# verdict and every message scan reports the campaign it belongs to
+campaign_index = CampaignIndex(
+    num_perm=int(os.getenv("CAMPAIGN_MINHASH_PERMUTATIONS", "64")),
+    bands=int(os.getenv("CAMPAIGN_LSH_BANDS", "16")),
+    similarity_threshold=float(os.getenv("CAMPAIGN_SIMILARITY_THRESHOLD", "0.8")),
+    max_entries=int(os.getenv("CAMPAIGN_INDEX_MAX_ENTRIES", "20000")),
+    max_age_seconds=float(os.getenv("CAMPAIGN_INDEX_MAX_AGE_SECONDS", "21600"))
+)
+CAMPAIGN_VERDICT_REUSE = os.getenv("CAMPAIGN_VERDICT_REUSE", "true").lower() == "true"
+
+# SHAP for messages: "async" (computed in the background, fetched from
+# /scan/explanation/{id}), "inline" (part of the scan response) or "off"
+SHAP_EXPLANATIONS = os.getenv("SHAP_EXPLANATIONS", "async")
+
+explanation_service = ExplanationService(
+    max_workers=int(os.getenv("SHAP_EXPLANATION_WORKERS", "2")),
+    max_pending=int(os.getenv("SHAP_EXPLANATION_MAX_PENDING", "1000")),
+    cache=VerdictCache(
+        max_entries=int(os.getenv("SHAP_EXPLANATION_CACHE_MAX_ENTRIES", "10000")),
+        ttl_seconds=float(os.getenv("SHAP_EXPLANATION_CACHE_TTL_SECONDS", "86400"))
+    )
+)
+
 def get_current_user(token: str):
     """Get current user from token."""
     payload = decode_access_token(token)
@@ -31,87 +134,227 @@ def get_current_user(token: str):
         )
     return payload.get("sub")
 
-@router.post("/analyze", response_model=ScanResult)
-async def analyze_content(scan_request: ScanRequest, token: str = None):
-    """Analyze content based on scan type."""
-    user_id = None
+async def _token_user_id(token: str):
+    """ID of the user an access token was issued to, or None."""
+    if not token:
+        return None
+    payload = decode_access_token(token)
+    if not payload or not payload.get("sub"):
+        return None
+    user = await get_user_by_username(payload["sub"])
+    return user["id"] if user else None
+
+SUPPORTED_SCAN_TYPES = ("message", "url", "email", "password")
+
+# Classes a user can name as the correct one in message feedback
+MESSAGE_LABELS = ("safe", "suspicious", "scam")
+
+# Upper bound on items accepted by a single /scan/analyze-batch request
+MAX_BATCH_ITEMS = int(os.getenv("SCAN_BATCH_MAX_ITEMS", "500"))
+
+async def _resolve_scan_user(token: str):
+    """Return (user_id, privacy_mode) for an optional scan token."""
     privacy_mode = False
     
-    # Extract user information if token is provided
-    if token:
-        try:
-            payload = decode_access_token(token)
-            if payload:
-                # In a real implementation, you would get user_id from database
-                # For now, we'll use a placeholder
-                user_id = 1  # Placeholder user ID
-                # Get user privacy settings
-                privacy_settings = get_user_privacy_settings(user_id)
-                if privacy_settings:
-                    privacy_mode = not privacy_settings.get("store_raw_content", False)
-        except:
-            # If token is invalid, continue without user info
-            pass
+    # Scans with a missing or invalid token are not attributed to anyone
+    user_id = await _token_user_id(token)
+    if user_id:
+        privacy_settings = await get_user_privacy_settings(user_id)
+        if privacy_settings:
+            privacy_mode = not privacy_settings.get("store_raw_content", False)
     
-    try:
-        result = None
+    return user_id, privacy_mode
+
+def _model_for(scan_type: str):
+    """The model currently served for a scan type (None for non-ML scans).
+    
+    Requests look the model up once and pass it along, so a hot swap in the
+    middle of a request does not mix two model versions.
+    """
+    if scan_type == "message":
+        return message_models.get()
+    if scan_type == "url":
+        return url_models.get()
+    return None
+
+async def _build_scan_result(scan_type: str, content: str, analysis: tuple = None, model=None) -> dict:
+    """Build the ScanResult payload for one item.
+    
+    A (prediction, explanation) pair already computed by a batched
+    analyze_batch call can be passed in for message and URL scans;
+    otherwise the model is called for this item.
+    model is the classifier for the scan type, looked up if not given.
+    """
+    model = model or _model_for(scan_type)
+    if scan_type == "message":
+        message_model = model
+        # Messages seen before, and near-duplicates of a classified campaign
+        # message, skip the model
+        signature = campaign_index.signature(content)
+        if analysis is None:
+            reused = (await _get_reused_results("message", [content], message_model)).get(0)
+            if reused is None:
+                reused = _get_campaign_result(signature, message_model)
+            if reused is not None:
+                return reused
         
-        if scan_request.scan_type == "message":
-            # Analyze message for spam/scam
-            prediction = message_model.predict(scan_request.content)
-            explanation = message_model.explain_prediction(scan_request.content)
-            
-            result = {
-                "prediction": prediction["prediction"],
-                "confidence": prediction["confidence"],
-                "details": explanation,
-                "risk_score": _calculate_message_risk_score(prediction)
-            }
-            
-        elif scan_request.scan_type == "url":
-            # Analyze URL for malicious content
-            prediction = url_model.predict(scan_request.content)
-            explanation = url_model.explain_prediction(scan_request.content)
-            
-            result = {
-                "prediction": prediction["prediction"],
-                "confidence": prediction["confidence"],
-                "details": explanation,
-                "risk_score": _calculate_url_risk_score(prediction)
-            }
-            
-        elif scan_request.scan_type == "email":
-            # Check email for breaches
-            breach_result = breach_service.check_email_breaches(scan_request.content)
-            
-            result = {
-                "prediction": "breach_detected" if breach_result["breach_count"] > 0 else "safe",
-                "confidence": min(breach_result["breach_count"] / 10.0, 1.0),
-                "details": breach_result,
-                "risk_score": _calculate_breach_risk_score(breach_result)
-            }
-            
-        elif scan_request.scan_type == "password":
-            # Check password safety
-            password_result = breach_service.check_password_safety(scan_request.content)
-            
-            result = {
-                "prediction": password_result["safety_status"],
-                "confidence": 0.9 if password_result["safety_status"] == "compromised" else 0.1,
-                "details": password_result,
-                "risk_score": _calculate_password_risk_score(password_result)
-            }
-            
+        # Analyze message for spam/scam, sharing one transform between prediction and explanation
+        if analysis is None:
+            analysis = message_model.analyze(content, include_shap=SHAP_EXPLANATIONS == "inline")
+        prediction, explanation = analysis
+        
+        result = {
+            "prediction": prediction["prediction"],
+            "confidence": prediction["confidence"],
+            "details": explanation,
+            "risk_score": _calculate_message_risk_score(prediction),
+            "model_version": message_model.model_version
+        }
+        
+        # SHAP is slow, so by default it runs after the response is sent; the
+        # cascade's first stage settles confident messages without it
+        if SHAP_EXPLANATIONS == "async" and prediction.get("stage") != FIRST_STAGE:
+            result["explanation_id"] = explanation_service.submit(message_model, content)
+        
+        campaign = campaign_index.add(signature, result, message_model.model_version)
+        if campaign is not None:
+            result["details"] = dict(explanation, campaign=campaign)
+        message_verdict_cache.set(content_hash(content), result, message_model.model_version)
+        return dict(result)
+    
+    elif scan_type == "url":
+        url_model = model
+        # Known-bad domains and reused verdicts skip the model when the caller has not predicted yet
+        if analysis is None:
+            listed = _get_reputation_result(content, url_model)
+            if listed is not None:
+                return listed
+            reused = (await _get_reused_results("url", [content], url_model)).get(0)
+            if reused is not None:
+                return reused
+        
+        # Analyze URL for malicious content, sharing one feature extraction
+        if analysis is None:
+            analysis = url_model.analyze(content)
+        prediction, explanation = analysis
+        
+        result = {
+            "prediction": prediction["prediction"],
+            "confidence": prediction["confidence"],
+            "details": explanation,
+            "risk_score": _calculate_url_risk_score(prediction),
+            "model_version": url_model.model_version
+        }
+        url_verdict_cache.set(canonicalize_url(content), result, url_model.model_version)
+        return dict(result)
+    
+    elif scan_type == "email":
+        # Check email for breaches
+        breach_result = breach_service.check_email_breaches(content)
+        
+        return {
+            "prediction": "breach_detected" if breach_result["breach_count"] > 0 else "safe",
+            "confidence": min(breach_result["breach_count"] / 10.0, 1.0),
+            "details": breach_result,
+            "risk_score": _calculate_breach_risk_score(breach_result)
+        }
+    
+    elif scan_type == "password":
+        # Check password safety
+        password_result = breach_service.check_password_safety(content)
+        
+        return {
+            "prediction": password_result["safety_status"],
+            "confidence": 0.9 if password_result["safety_status"] == "compromised" else 0.1,
+            "details": password_result,
+            "risk_score": _calculate_password_risk_score(password_result)
+        }
+    
+    raise ValueError(f"Unsupported scan type: {scan_type}")
+
+def _get_reputation_result(url: str, url_model):
+    """Return a malicious verdict if the URL's domain is on a known-bad list."""
+    if reputation_index is None:
+        return None
+    match = reputation_index.lookup(url)
+    if match is None:
+        return None
+    return {
+        "prediction": "malicious",
+        "confidence": 1.0,
+        "details": {"reputation": match},
+        "risk_score": 100.0,
+        "model_version": url_model.model_version
+    }
+
+def _get_campaign_result(signature, message_model):
+    """Return the verdict of an indexed near-duplicate message, tagged with its campaign.
+    
+    The first message's explanation is not reused, so details only carry the
+    campaign and no explanation_id is returned.
+    """
+    if not CAMPAIGN_VERDICT_REUSE:
+        return None
+    match = campaign_index.lookup(signature, message_model.model_version)
+    if match is None:
+        return None
+    return dict(match["result"], details={"campaign": match["campaign"]})
+
+def _verdict_cache_entry(scan_type: str, content: str):
+    """In-memory verdict cache and key for a message or URL."""
+    if scan_type == "url":
+        return url_verdict_cache, canonicalize_url(content)
+    return message_verdict_cache, content_hash(content)
+
+async def _get_reused_results(scan_type: str, contents: List[str], model) -> dict:
+    """Return copies of earlier results for contents, keyed by position in contents.
+    
+    The in-memory cache is checked first; the misses are then looked up in
+    scan_history by content hash with one query, limited to the same model
+    version and the freshness window. Found results warm the cache.
+    """
+    model_version = model.model_version
+    found = {}
+    missing = []
+    for position, content in enumerate(contents):
+        cache, key = _verdict_cache_entry(scan_type, content)
+        cached = cache.get(key, model_version)
+        if cached is not None:
+            found[position] = dict(cached)
         else:
+            missing.append(position)
+    
+    if not missing or VERDICT_REUSE_MAX_AGE_SECONDS <= 0:
+        return found
+    
+    hashes = {position: content_hash(contents[position]) for position in missing}
+    stored = await get_recent_verdicts(scan_type, sorted(set(hashes.values())), model_version, VERDICT_REUSE_MAX_AGE_SECONDS) or {}
+    for position in missing:
+        result = stored.get(hashes[position])
+        if result is not None:
+            cache, key = _verdict_cache_entry(scan_type, contents[position])
+            cache.set(key, result, model_version)
+            found[position] = dict(result)
+    return found
+
+@router.post("/analyze", response_model=ScanResult)
+async def analyze_content(scan_request: ScanRequest, token: str = None):
+    """Analyze content based on scan type."""
+    user_id, privacy_mode = await _resolve_scan_user(token)
+    
+    try:
+        if scan_request.scan_type not in SUPPORTED_SCAN_TYPES:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Unsupported scan type: {scan_request.scan_type}"
             )
         
+        result = await _build_scan_result(scan_request.scan_type, scan_request.content)
+        
         # Save scan result to database (if user is authenticated)
         if user_id:
             try:
-                scan_id = save_scan_result(user_id, scan_request.scan_type, scan_request.content, result, privacy_mode)
+                scan_id = await save_scan_result(user_id, scan_request.scan_type, scan_request.content, result, privacy_mode)
                 # Add scan_id to result for feedback purposes
                 result["scan_id"] = scan_id
             except Exception as e:
@@ -125,6 +368,132 @@ async def analyze_content(scan_request: ScanRequest, token: str = None):
             detail=f"Analysis failed: {str(e)}"
         )
 
+@router.post("/analyze-batch", response_model=BatchScanResponse)
+async def analyze_content_batch(batch_request: BatchScanRequest, token: str = None):
+    """Analyze a mixed batch of items, returning one result or error per item."""
+    if len(batch_request.items) > MAX_BATCH_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Batch too large: {len(batch_request.items)} items (max {MAX_BATCH_ITEMS})"
+        )
+    
+    user_id, privacy_mode = await _resolve_scan_user(token)
+    
+    # Group item indices by scan type so each model runs once per group
+    groups = {}
+    for index, item in enumerate(batch_request.items):
+        groups.setdefault(item.scan_type, []).append(index)
+    
+    results = {}
+    errors = {}
+    for scan_type, indices in groups.items():
+        if scan_type not in SUPPORTED_SCAN_TYPES:
+            for index in indices:
+                errors[index] = f"Unsupported scan type: {scan_type}"
+            continue
+        
+        # One model version for the whole group, even if a swap happens meanwhile
+        model = _model_for(scan_type)
+        
+        # Serve known-bad URLs, reused verdicts and campaign duplicates, and
+        # only send the rest to the model
+        if scan_type in ("message", "url"):
+            if scan_type == "url":
+                pending = []
+                for index in indices:
+                    listed = _get_reputation_result(batch_request.items[index].content, model)
+                    if listed is not None:
+                        results[index] = listed
+                    else:
+                        pending.append(index)
+                indices = pending
+            
+            reused = await _get_reused_results(scan_type, [batch_request.items[index].content for index in indices], model)
+            pending = []
+            for position, index in enumerate(indices):
+                known = reused.get(position)
+                if known is None and scan_type == "message":
+                    known = _get_campaign_result(campaign_index.signature(batch_request.items[index].content), model)
+                if known is not None:
+                    results[index] = known
+                else:
+                    pending.append(index)
+            indices = pending
+            if not indices:
+                continue
+        
+        contents = [batch_request.items[index].content for index in indices]
+        
+        # One vectorized model call for the whole message or URL group, with
+        # the explanations built from the same transform or feature rows
+        analyses = [None] * len(indices)
+        try:
+            if scan_type == "message":
+                analyses = model.analyze_batch(contents, include_shap=SHAP_EXPLANATIONS == "inline")
+            elif scan_type == "url":
+                analyses = model.analyze_batch(contents)
+        except Exception as e:
+            for index in indices:
+                errors[index] = f"Analysis failed: {str(e)}"
+            continue
+        
+        for index, content, analysis in zip(indices, contents, analyses):
+            try:
+                results[index] = await _build_scan_result(scan_type, content, analysis, model)
+            except Exception as e:
+                errors[index] = f"Analysis failed: {str(e)}"
+    
+    # Save all successful results in one insert (if user is authenticated)
+    if user_id and results:
+        saved_indices = sorted(results)
+        scans = [
+            (batch_request.items[index].scan_type, batch_request.items[index].content, results[index])
+            for index in saved_indices
+        ]
+        try:
+            scan_ids = await save_scan_results(user_id, scans, privacy_mode)
+            for index, scan_id in zip(saved_indices, scan_ids):
+                results[index]["scan_id"] = scan_id
+        except Exception as e:
+            print(f"Warning: Could not save scan results: {e}")
+    
+    return BatchScanResponse(results=[
+        BatchScanItemResult(
+            index=index,
+            scan_type=item.scan_type,
+            result=ScanResult(**results[index]) if index in results else None,
+            error=errors.get(index)
+        )
+        for index, item in enumerate(batch_request.items)
+    ])
+
+@router.get("/cache-stats")
+async def get_cache_stats():
+    """Get verdict cache, campaign index, reputation index and cascade counters."""
+    return {
+        "url_verdict_cache": url_verdict_cache.stats(),
+        "message_verdict_cache": message_verdict_cache.stats(),
+        "domain_reputation_index": reputation_index.stats() if reputation_index else None,
+        "shap_explanations": explanation_service.stats(),
+        "campaign_index": campaign_index.stats(),
+        "cascade": {
+            scan_type: model.first_stage.stats.report() if model.first_stage else None
+            for scan_type, model in (("message", message_models.get()), ("url", url_models.get()))
+        },
+        "models": {"message": message_models.status(), "url": url_models.status()}
+    }
+
+@router.get("/explanation/{explanation_id}")
+async def get_explanation(explanation_id: str):
+    """Get the status, and once ready the SHAP values, of a background explanation."""
+    explanation = explanation_service.get(explanation_id)
+    if explanation is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Explanation not found or expired"
+        )
+    return explanation
+
 def _calculate_message_risk_score(prediction: dict) -> float:
     """Calculate risk score for message analysis."""
     if prediction["prediction"] == "scam":
@@ -158,134 +527,72 @@ def _calculate_password_risk_score(password_result: dict) -> float:
 @router.post("/feedback")
 async def submit_feedback(feedback: FeedbackRequest, token: str = None):
     """Submit feedback for a scan result to improve the model."""
-    conn = get_db_connection()
-    if not conn:
+    if feedback.correct_label is not None and feedback.correct_label not in MESSAGE_LABELS:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Database connection failed"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"correct_label must be one of: {', '.join(MESSAGE_LABELS)}"
         )
     
-    try:
-        cursor = conn.cursor()
-        
-        # Verify that the scan belongs to the user (if authenticated)
-        user_id = None
-        if token:
-            try:
-                payload = decode_access_token(token)
-                if payload:
-                    # In a real implementation, you would get user_id from database
-                    user_id = 1  # Placeholder user ID
-            except:
-                pass
-        
-        # Insert feedback
-        cursor.execute("""
-            INSERT INTO feedback (user_id, scan_id, is_correct, comment)
-            VALUES (%s, %s, %s, %s)
-            RETURNING id
-        """, (user_id, feedback.scan_id, feedback.is_correct, feedback.comment))
-        
-        feedback_id = cursor.fetchone()['id']
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        # In a real implementation, you would:
-        # 1. Collect feedback data
-        # 2. Periodically retrain models with feedback
-        # 3. Update model performance metrics
-        
-        return {
-            "message": "Feedback submitted successfully",
-            "feedback_id": feedback_id
-        }
+    # Feedback without a valid token is stored anonymously and not learned from
+    user_id = await _token_user_id(token)
     
-    except Exception as e:
-        conn.rollback()
-        conn.close()
+    # Insert feedback; a scan still in the write-behind queue is written first
+    await wait_for_scan(feedback.scan_id)
+    feedback_id = await save_feedback(user_id, feedback.scan_id, feedback.is_correct, feedback.comment,
+                                      feedback.content, feedback.correct_label)
+    if feedback_id is None:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to submit feedback: {str(e)}"
+            detail="Failed to submit feedback"
         )
+    
+    # Message feedback that includes the scanned text is folded into the
+    # model incrementally by services/online_learning_service.py (run it periodically)
+    
+    return {
+        "message": "Feedback submitted successfully",
+        "feedback_id": feedback_id
+    }
 
 @router.get("/history", response_model=List[ScanHistory])
 async def get_scan_history(token: str = None):
     """Get scan history for the current user."""
-    conn = get_db_connection()
-    if not conn:
+    # Get user ID from token
+    user_id = await _token_user_id(token)
+    
+    if not user_id:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Database connection failed"
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Authentication required"
         )
     
-    try:
-        cursor = conn.cursor()
-        
-        # Get user ID from token
-        user_id = None
-        if token:
-            try:
-                payload = decode_access_token(token)
-                if payload:
-                    # In a real implementation, you would get user_id from database
-                    user_id = 1  # Placeholder user ID
-            except:
-                pass
-        
-        if not user_id:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Authentication required"
-            )
-        
-        # Query database for user's scan history
-        cursor.execute("""
-            SELECT id, user_id, scan_type, content_preview, result, timestamp
-            FROM scan_history 
-            WHERE user_id = %s 
-            ORDER BY timestamp DESC
-            LIMIT 50
-        """, (user_id,))
-        
-        rows = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        # Format results
-        history = []
-        for row in rows:
-            history.append({
-                "id": row['id'],
-                "user_id": row['user_id'],
-                "scan_type": row['scan_type'],
-                "content": row['content_preview'] or "",
-                "result": row['result'],
-                "timestamp": row['timestamp']
-            })
-        
-        return history
-    
-    except Exception as e:
-        conn.close()
+    # Query database for user's scan history
+    rows = await get_user_scan_history(user_id, limit=50)
+    if rows is None:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to retrieve scan history: {str(e)}"
+            detail="Failed to retrieve scan history"
         )
+    
+    # Format results
+    history = []
+    for row in rows:
+        history.append({
+            "id": row['id'],
+            "user_id": row['user_id'],
+            "scan_type": row['scan_type'],
+            "content": row['content_preview'] or "",
+            "result": row['result'],
+            "timestamp": row['timestamp']
+        })
+    
+    return history
 
 @router.get("/privacy-settings")
 async def get_privacy_settings(token: str = None):
     """Get user privacy settings."""
     # Get user ID from token
-    user_id = None
-    if token:
-        try:
-            payload = decode_access_token(token)
-            if payload:
-                # In a real implementation, you would get user_id from database
-                user_id = 1  # Placeholder user ID
-        except:
-            pass
+    user_id = await _token_user_id(token)
     
     if not user_id:
         raise HTTPException(
@@ -293,7 +600,7 @@ async def get_privacy_settings(token: str = None):
             detail="Authentication required"
         )
     
-    settings = get_user_privacy_settings(user_id)
+    settings = await get_user_privacy_settings(user_id)
     if not settings:
         # Return default settings
         settings = {
@@ -308,15 +615,7 @@ async def get_privacy_settings(token: str = None):
 async def update_privacy_settings(settings: dict, token: str = None):
     """Update user privacy settings."""
     # Get user ID from token
-    user_id = None
-    if token:
-        try:
-            payload = decode_access_token(token)
-            if payload:
-                # In a real implementation, you would get user_id from database
-                user_id = 1  # Placeholder user ID
-        except:
-            pass
+    user_id = await _token_user_id(token)
     
     if not user_id:
         raise HTTPException(
@@ -324,7 +623,7 @@ async def update_privacy_settings(settings: dict, token: str = None):
             detail="Authentication required"
         )
     
-    success = update_user_privacy_settings(user_id, settings)
+    success = await update_user_privacy_settings(user_id, settings)
     if success:
         return {"message": "Privacy settings updated successfully"}
     else:
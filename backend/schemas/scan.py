@@ -12,6 +12,20 @@ class ScanResult(BaseModel):
     details: Dict[str, Any]
     risk_score: float
     scan_id: Optional[int] = None
+    explanation_id: Optional[str] = None  # poll /scan/explanation/{id} for SHAP values
+    model_version: Optional[str] = None  # model that produced the verdict (message/url scans)
+
+class BatchScanRequest(BaseModel):
+    items: List[ScanRequest]
+
+class BatchScanItemResult(BaseModel):
+    index: int
+    scan_type: str
+    result: Optional[ScanResult] = None
+    error: Optional[str] = None
+
+class BatchScanResponse(BaseModel):
+    results: List[BatchScanItemResult]
 
 class ScanHistory(BaseModel):
     id: int
@@ -25,6 +39,8 @@ class FeedbackRequest(BaseModel):
     scan_id: int
     is_correct: bool
     comment: Optional[str] = None
+    content: Optional[str] = None  # scanned message text; kept for learning only if it matches the scan
+    correct_label: Optional[str] = None  # "safe", "suspicious" or "scam" when the verdict was wrong
 
 class PrivacySettings(BaseModel):
     store_raw_content: bool = False
@@ -43,9 +59,12 @@ class MessageAnalysisDetails(BaseModel):
     text_explanation: List[str]
     feature_importance: Dict[str, Any]
     shap_explanation: Optional[Dict[str, Any]] = None
+    campaign: Optional[Dict[str, Any]] = None  # near-duplicate cluster and whether its verdict was reused
+    cascade: Optional[Dict[str, Any]] = None  # set when the first stage settled the message
 
 class URLAnalysisDetails(BaseModel):
     features: Dict[str, float]
     concerns: List[Dict[str, Any]]
     text_explanation: List[str]
-    feature_importance: Dict[str, Any]
\ No newline at end of file
+    feature_importance: Dict[str, Any]
+    feature_attribution: Optional[Dict[str, Any]] = None
\ No newline at end of file
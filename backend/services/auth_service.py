@@ -2,8 +2,10 @@ from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
+from fastapi.concurrency import run_in_threadpool
 import os
 from dotenv import load_dotenv
+from utils.async_database import get_user_by_username
 
 # Load environment variables from .env file
 load_dotenv()
@@ -24,17 +26,15 @@ def get_password_hash(password):
     """Hash a plain password."""
     return pwd_context.hash(password)
 
-def authenticate_user(username: str, password: str, db):
+async def authenticate_user(username: str, password: str):
     """Authenticate a user against the database."""
-    cursor = db.cursor()
-    cursor.execute("SELECT id, username, email, password_hash FROM users WHERE username = %s", (username,))
-    user_record = cursor.fetchone()
-    cursor.close()
+    user_record = await get_user_by_username(username)
     
     if not user_record:
         return False
     
-    if not verify_password(password, user_record['password_hash']):
+    # bcrypt is deliberately slow; verify in a worker thread so other requests keep running
+    if not await run_in_threadpool(verify_password, password, user_record['password_hash']):
         return False
     
     return {
@@ -0,0 +1,220 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+from sklearn.utils import murmurhash3_32
+
+# Characters per shingle; character shingles survive inserted or swapped words
+# better than word shingles. Messages under CAMPAIGN_MIN_WORDS words are not indexed
+SHINGLE_SIZE = 5
+CAMPAIGN_MIN_WORDS = 5
+
+# Prime just above 2**32 for the (a * x + b) mod p permutation family; with
+# a < 2**31 the products stay below 2**63 and fit in uint64
+MINHASH_PRIME = np.uint64(4294967311)
+
+# Only the verdict of a campaign's first message is kept; its explanation
+# describes that message, not the copies that reuse the verdict
+VERDICT_FIELDS = ("prediction", "confidence", "risk_score", "model_version")
+
+TOKEN_PATTERN = re.compile(r"\w+")
+DIGIT_PATTERN = re.compile(r"\d")
+
+class CampaignIndex:
+    """MinHash LSH index of recently classified messages, grouped into campaigns.
+
+    A message is reduced to its set of character shingles (with digits masked,
+    since campaigns vary codes, amounts and phone numbers) and then to a
+    MinHash signature. Signatures are split into bands; messages sharing a
+    band fall in the same bucket and are compared on the full signature,
+    whose agreement estimates their Jaccard similarity. A message at least
+    similarity_threshold similar to an indexed one joins its campaign and
+    can reuse its verdict.
+
+    Entries keep the signature and the verdict fields only, so memory is
+    bounded by max_entries whatever the size of explanations, and campaigns
+    not seen for max_age_seconds are evicted. Like VerdictCache the index is bound to one
+    model version and is cleared when a different version uses it.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, similarity_threshold: float = 0.8,
+                 max_entries: int = 20000, max_age_seconds: float = 6 * 3600, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.model_version = None
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2 ** 31, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 2 ** 31, size=num_perm, dtype=np.uint64)
+
+        self._entries = OrderedDict()  # cluster_id -> entry dict, least recently seen first
+        self._buckets: Dict[tuple, set] = {}  # (band, band bytes) -> cluster_ids
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash signature of a message, or None if it is too short to index."""
+        words = TOKEN_PATTERN.findall(DIGIT_PATTERN.sub("0", text.lower()))
+        if len(words) < CAMPAIGN_MIN_WORDS:
+            return None
+        text = " ".join(words)
+        shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+        hashes = np.fromiter(
+            (murmurhash3_32(shingle, seed=0, positive=True) for shingle in shingles),
+            dtype=np.uint64, count=len(shingles)
+        )
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) % MINHASH_PRIME
+        return permuted.min(axis=1)
+
+    def lookup(self, signature: Optional[np.ndarray], model_version: str) -> Optional[Dict[str, Any]]:
+        """Verdict and campaign of the closest indexed near-duplicate, or None.
+
+        Returns {"result", "campaign"}, where result holds the VERDICT_FIELDS
+        of the campaign's first message; the caller must not modify it.
+        """
+        if signature is None:
+            return None
+        with self._lock:
+            self._bind_version(model_version)
+            self._expire()
+            cluster_id, similarity = self._best_match(signature)
+            if cluster_id is None:
+                self.misses += 1
+                return None
+
+            entry = self._touch(cluster_id)
+            self.hits += 1
+            return {"result": entry["result"], "campaign": self._campaign(entry, similarity, True)}
+
+    def add(self, signature: Optional[np.ndarray], result: Dict[str, Any], model_version: str) -> Optional[Dict[str, Any]]:
+        """Record a classified message and return its campaign.
+
+        A near-duplicate of an indexed message joins that campaign; anything
+        else starts a new one whose verdict (the VERDICT_FIELDS of result)
+        later copies can reuse.
+        """
+        if signature is None:
+            return None
+        with self._lock:
+            self._bind_version(model_version)
+            self._expire()
+            cluster_id, similarity = self._best_match(signature)
+            if cluster_id is not None:
+                return self._campaign(self._touch(cluster_id), similarity, False)
+
+            cluster_id = hashlib.sha256(signature.tobytes()).hexdigest()[:16]
+            now = time.monotonic()
+            entry = {
+                "cluster_id": cluster_id,
+                "signature": signature,
+                "result": {field: result[field] for field in VERDICT_FIELDS if field in result},
+                "members": 1,
+                "first_seen": now,
+                "last_seen": now
+            }
+            self._entries[cluster_id] = entry
+            for key in self._band_keys(signature):
+                self._buckets.setdefault(key, set()).add(cluster_id)
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            return self._campaign(entry, 1.0, False)
+
+    def clear(self):
+        """Drop every indexed campaign."""
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return size and hit/miss/eviction counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "model_version": self.model_version,
+                "campaigns": len(self._entries),
+                "buckets": len(self._buckets),
+                "max_entries": self.max_entries,
+                "max_age_seconds": self.max_age_seconds,
+                "similarity_threshold": self.similarity_threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+    def _band_keys(self, signature: np.ndarray):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def _best_match(self, signature: np.ndarray):
+        """Most similar indexed campaign at or above the threshold, as (cluster_id, similarity)."""
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates.update(self._buckets.get(key, ()))
+
+        best_id, best_similarity = None, self.similarity_threshold
+        for cluster_id in candidates:
+            similarity = float(np.mean(self._entries[cluster_id]["signature"] == signature))
+            if similarity >= best_similarity:
+                best_id, best_similarity = cluster_id, similarity
+        return best_id, best_similarity
+
+    def _touch(self, cluster_id: str) -> Dict[str, Any]:
+        entry = self._entries[cluster_id]
+        entry["members"] += 1
+        entry["last_seen"] = time.monotonic()
+        self._entries.move_to_end(cluster_id)
+        return entry
+
+    @staticmethod
+    def _campaign(entry: Dict[str, Any], similarity: float, reused_verdict: bool) -> Dict[str, Any]:
+        return {
+            "cluster_id": entry["cluster_id"],
+            "members": entry["members"],
+            "similarity": round(similarity, 3),
+            "reused_verdict": reused_verdict
+        }
+
+    def _expire(self):
+        """Evict campaigns not seen for max_age_seconds (oldest are first in order)."""
+        cutoff = time.monotonic() - self.max_age_seconds
+        while self._entries:
+            cluster_id, entry = next(iter(self._entries.items()))
+            if entry["last_seen"] >= cutoff:
+                break
+            self._remove(cluster_id)
+            self.evictions += 1
+
+    def _bind_version(self, model_version: str):
+        """Clear the index when a different model version starts using it."""
+        if model_version != self.model_version:
+            if self._entries:
+                self._entries.clear()
+                self._buckets.clear()
+                self.invalidations += 1
+            self.model_version = model_version
+
+    def _remove(self, cluster_id: str):
+        entry = self._entries.pop(cluster_id)
+        for key in self._band_keys(entry["signature"]):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(cluster_id)
+                if not bucket:
+                    del self._buckets[key]
@@ -0,0 +1,133 @@
+import hashlib
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+from utils.cache import VerdictCache
+
+# IDs carry their model version, so explanations of every version share one
+# cache instead of clearing it on each hot swap
+CACHE_NAMESPACE = "explanations"
+
+# Model loaded by a pool worker: (model class, path, version) -> model
+_worker_model: Dict[tuple, Any] = {}
+
+def _explain_in_worker(model_class: type, model_path: str, model_version: str, content: str) -> Optional[Dict[str, Any]]:
+    """Explain content with the model at model_path, loading it once per worker and version."""
+    key = (model_class, model_path, model_version)
+    model = _worker_model.get(key)
+    if model is None:
+        model = model_class(model_path)
+        model.load_model()
+        if model.model_version != model_version:
+            raise RuntimeError(f"Model at {model_path} is version {model.model_version}, not {model_version}")
+        # One model per worker; a job for another version loads its own
+        _worker_model.clear()
+        _worker_model[key] = model
+    return model.explain_shap(content)
+
+class ExplanationService:
+    """Computes SHAP explanations in worker processes and caches the results.
+    
+    Explanation IDs are the model version plus a hash of the version and
+    the content, so the same text scored by the same model always maps to
+    the same ID and is only ever explained once while its result is cached.
+    Results stay available by ID after the model is hot swapped.
+    
+    Workers load the model from its file, so the GIL-bound explainer does
+    not compete with request handling; models without a file on disk get
+    no background explanations.
+    
+    At most max_pending jobs are queued or running; beyond that new scans
+    get no explanation, so a burst cannot grow the queue without bound.
+    """
+    
+    def __init__(self, max_workers: int = 2, cache: VerdictCache = None, max_pending: int = 1000):
+        self.max_workers = max_workers
+        self.executor = self._new_executor()
+        self.cache = cache or VerdictCache(max_entries=10000, ttl_seconds=24 * 3600)
+        self.max_pending = max_pending
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.rejected = 0
+    
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # Forking a threaded server can copy held locks into the child
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+    
+    @staticmethod
+    def explanation_id(model_version: str, content: str) -> str:
+        """Stable ID for an explanation of content under a model version."""
+        content_hash = hashlib.sha256(content.encode()).hexdigest()
+        digest = hashlib.sha256(f"{model_version}:{content_hash}".encode()).hexdigest()[:32]
+        return f"{model_version}.{digest}"
+    
+    def submit(self, model: Any, content: str) -> Optional[str]:
+        """Schedule a SHAP explanation unless it is cached or already running.
+        
+        Returns the explanation ID, or None if the model has no explainer or
+        model file, or max_pending jobs are already waiting.
+        """
+        model_path = getattr(model, 'model_path', None)
+        if not getattr(model, 'explainer', None) or not model_path:
+            return None
+        
+        model_version = model.model_version
+        explanation_id = self.explanation_id(model_version, content)
+        with self._lock:
+            if explanation_id in self._pending:
+                return explanation_id
+            if self.cache.get(explanation_id, CACHE_NAMESPACE) is not None:
+                return explanation_id
+            if len(self._pending) >= self.max_pending:
+                self.rejected += 1
+                return None
+            
+            job = (_explain_in_worker, type(model), model_path, model_version, content)
+            try:
+                future = self.executor.submit(*job)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); start a fresh pool
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = self._new_executor()
+                future = self.executor.submit(*job)
+            self._pending[explanation_id] = future
+        
+        future.add_done_callback(lambda done: self._store(explanation_id, model_version, done))
+        return explanation_id
+    
+    def get(self, explanation_id: str) -> Optional[Dict[str, Any]]:
+        """Return the status (and result when ready) of an explanation, or None if unknown."""
+        with self._lock:
+            if explanation_id in self._pending:
+                return {"id": explanation_id, "status": "pending"}
+        
+        return self.cache.get(explanation_id, CACHE_NAMESPACE)
+    
+    def _store(self, explanation_id: str, model_version: str, future: Future):
+        entry = {"id": explanation_id, "model_version": model_version}
+        try:
+            shap_explanation = future.result()
+            if shap_explanation is None:
+                entry.update(status="failed", error="SHAP explanation unavailable")
+            else:
+                entry.update(status="ready", shap_explanation=shap_explanation)
+        except Exception as e:
+            entry.update(status="failed", error=str(e))
+        
+        with self._lock:
+            self.cache.set(explanation_id, entry, CACHE_NAMESPACE)
+            self._pending.pop(explanation_id, None)
+    
+    def close(self):
+        """Stop the worker processes, dropping queued jobs."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return pending job count, rejected submissions and cache counters."""
+        with self._lock:
+            pending = len(self._pending)
+            rejected = self.rejected
+        return {"pending": pending, "max_pending": self.max_pending, "rejected": rejected, "cache": self.cache.stats()}
@@ -0,0 +1,144 @@
+import argparse
+import os
+import sys
+import tempfile
+from typing import Any, Dict, Optional
+
+# Add the parent directory to the path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.message_classifier import MessageClassifier
+from models.registry import ModelRegistry
+from utils.database import get_message_feedback_batch
+
+# Feedback rows read and folded into the model per query
+DEFAULT_FEEDBACK_BATCH_SIZE = int(os.getenv("FEEDBACK_BATCH_SIZE", "500"))
+# Feedback is learned once it is this old, so rows still committing are not skipped
+FEEDBACK_MIN_AGE_SECONDS = float(os.getenv("FEEDBACK_MIN_AGE_SECONDS", "60"))
+
+# Label learned when a user marks a prediction as wrong without naming the
+# correct class: "wrong" on "safe" means scam and on "scam" means safe. A
+# wrong "suspicious" could be either, so it is only learned with correct_label
+CORRECTED_LABELS = {"safe": "scam", "scam": "safe"}
+
+class OnlineLearner:
+    """Folds new scan feedback into the message model with partial_fit.
+
+    Feedback is read in id order starting after the watermark stored in the
+    model, so each row is learned exactly once and a run costs time in
+    proportion to the new feedback only. Only the first feedback a signed-in
+    user gives on their own scan is learned, and only if it came with the
+    full message text. The updated model, together with its new watermark,
+    is saved to the model's path with an atomic rename.
+    """
+
+    def __init__(self, model: MessageClassifier, batch_size: int = DEFAULT_FEEDBACK_BATCH_SIZE):
+        self.model = model
+        self.batch_size = batch_size
+        self.label_ids = {name: label for label, name in model.label_map.items()}
+
+    def feedback_label(self, row: Dict[str, Any]) -> Optional[int]:
+        """Class learned from one feedback row, or None if it cannot be inferred."""
+        shown = row.get("prediction")
+        if shown not in self.label_ids:
+            return None
+        if row["is_correct"]:
+            return self.label_ids[shown]
+        corrected = row.get("correct_label")
+        if corrected in self.label_ids and corrected != shown:
+            return self.label_ids[corrected]
+        if corrected is None and shown in CORRECTED_LABELS:
+            return self.label_ids[CORRECTED_LABELS[shown]]
+        return None
+
+    def run(self, max_batches: int = None) -> Dict[str, Any]:
+        """Learn from all feedback after the model's watermark and publish the result."""
+        start = self.model.feedback_watermark
+        watermark = start
+        rows_read = 0
+        rows_learned = 0
+        batches = 0
+
+        while max_batches is None or batches < max_batches:
+            rows = get_message_feedback_batch(watermark, self.batch_size, FEEDBACK_MIN_AGE_SECONDS)
+            if not rows:
+                break
+
+            messages, labels = [], []
+            for row in rows:
+                label = self.feedback_label(row)
+                if label is not None:
+                    messages.append(row["content"])
+                    labels.append(label)
+
+            rows_learned += self.model.partial_fit(messages, labels) if messages else 0
+            rows_read += len(rows)
+            watermark = rows[-1]["id"]
+            batches += 1
+            if len(rows) < self.batch_size:
+                break
+
+        if watermark != start:
+            self.model.feedback_watermark = watermark
+            self.model.save_model()
+
+        return {
+            "feedback_rows": rows_read,
+            "learned": rows_learned,
+            "watermark": watermark,
+            "model_version": self.model.model_version
+        }
+
+def update_from_feedback(registry: ModelRegistry, fallback_path: str, batch_size: int = DEFAULT_FEEDBACK_BATCH_SIZE,
+                         max_batches: int = None) -> Optional[Dict[str, Any]]:
+    """Learn new feedback into the active registry version and publish the result.
+
+    Starts from the version workers serve (fallback_path if none is active
+    yet), so updates build on each other and reach every worker through a
+    hot swap. Returns the learner's stats plus whether a version was
+    published, or None if there is no trained model.
+    """
+    active = registry.active_version("message")
+    source = registry.artifact_path("message", active) if active else fallback_path
+    model = MessageClassifier(source)
+    model.load_model()
+    if not hasattr(model.model.named_steps['classifier'], 'classes_'):
+        return None
+
+    # The registry copy is read-only; the update is written to a scratch file and published from there
+    with tempfile.TemporaryDirectory() as work_dir:
+        model.model_path = os.path.join(work_dir, "message_model.pkl")
+        stats = OnlineLearner(model, batch_size).run(max_batches)
+        stats["published"] = False
+        if stats["feedback_rows"]:
+            registry.publish("message", model.model_path, {
+                "source": "online_learning",
+                "base_version": active,
+                "feedback_rows": stats["feedback_rows"],
+                "feedback_learned": stats["learned"],
+                "feedback_watermark": stats["watermark"]
+            })
+            stats["published"] = True
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Update the served message model from new scan feedback and publish it to the registry.")
+    parser.add_argument("--model", default=os.getenv("MESSAGE_MODEL_PATH", "models/message_model.pkl"),
+                        help="Starting model when the registry has no active message version")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_FEEDBACK_BATCH_SIZE, help="Feedback rows per query")
+    parser.add_argument("--max-batches", type=int, default=None, help="Stop after this many batches")
+    parser.add_argument("--registry", default=os.getenv("MODEL_REGISTRY_DIR", "models/registry"))
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.registry)
+    stats = update_from_feedback(registry, args.model, args.batch_size, args.max_batches)
+    if stats is None:
+        sys.exit("No trained message model to update; run a full training first")
+    print(f"Read {stats['feedback_rows']} feedback rows, learned {stats['learned']}, "
+          f"watermark {stats['watermark']}, model version {stats['model_version']}")
+    if stats["published"]:
+        print(f"Published message model version {stats['model_version']}")
+
+if __name__ == "__main__":
+    main()
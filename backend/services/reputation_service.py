@@ -0,0 +1,196 @@
+import argparse
+import hashlib
+import json
+import os
+import struct
+import sys
+import time
+import numpy as np
+from typing import Any, Dict, List, Optional
+
+# Add the parent directory to the path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.public_suffix import get_default_extractor
+
+INDEX_MAGIC = b"SAFEDIX1"
+
+# magic, entry count, length of the JSON list-name table
+HEADER_FORMAT = "<8sQI"
+
+# How often (seconds) a loaded index checks whether its file was replaced
+RELOAD_CHECK_INTERVAL = 60.0
+
+def hash_domain(domain: str) -> int:
+    """64-bit hash of a normalized domain, as stored in the index."""
+    digest = hashlib.blake2b(domain.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+def normalize_domain(entry: str) -> str:
+    """Turn a list entry (host, domain or URL) into the lowercase host that is indexed."""
+    entry = entry.strip().lower()
+    if entry.startswith("*."):
+        entry = entry[2:]
+    return get_default_extractor().host_from_url(entry).lower()
+
+def build_index(lists: Dict[str, str], output_path: str) -> int:
+    """Build an index file from named domain list files.
+
+    Each list file has one host, domain or URL per line; blank lines and
+    lines starting with '#' are skipped. A domain present in several lists
+    is attributed to the first list given. The file is written next to
+    output_path and moved into place atomically, so running workers never
+    map a half-written index. Returns the number of indexed domains.
+    """
+    list_names = list(lists)
+    hashes = []
+    list_ids = []
+    for list_id, name in enumerate(list_names):
+        with open(lists[name], encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                domain = normalize_domain(line)
+                if domain:
+                    hashes.append(hash_domain(domain))
+                    list_ids.append(list_id)
+
+    hashes = np.array(hashes, dtype="<u8")
+    list_ids = np.array(list_ids, dtype="<u2")
+
+    # Sort by hash, keeping the first list for duplicates
+    order = np.lexsort((list_ids, hashes))
+    hashes, list_ids = hashes[order], list_ids[order]
+    if len(hashes):
+        keep = np.concatenate(([True], hashes[1:] != hashes[:-1]))
+        hashes, list_ids = hashes[keep], list_ids[keep]
+
+    names_json = json.dumps(list_names).encode("utf-8")
+    header = struct.pack(HEADER_FORMAT, INDEX_MAGIC, len(hashes), len(names_json)) + names_json
+    padding = b"\0" * (-len(header) % 8)
+
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header + padding)
+        f.write(hashes.tobytes())
+        f.write(list_ids.tobytes())
+    os.replace(tmp_path, output_path)
+    return len(hashes)
+
+class DomainReputationIndex:
+    """Read-only, memory-mapped index of known-bad domains.
+
+    The index file holds a sorted array of 64-bit domain hashes and a
+    parallel array of list IDs. Both are mapped with np.memmap, so every
+    worker process shares the same page-cache copy instead of loading its
+    own, and lookups are a binary search over the mapped hashes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._load()
+
+    def _load(self):
+        with open(self.path, "rb") as f:
+            header = f.read(struct.calcsize(HEADER_FORMAT))
+            magic, count, names_length = struct.unpack(HEADER_FORMAT, header)
+            if magic != INDEX_MAGIC:
+                raise ValueError(f"Not a domain reputation index: {self.path}")
+            self.list_names = json.loads(f.read(names_length).decode("utf-8"))
+
+        offset = struct.calcsize(HEADER_FORMAT) + names_length
+        offset += -offset % 8
+        self.count = count
+        if count:
+            self.hashes = np.memmap(self.path, dtype="<u8", mode="r", offset=offset, shape=(count,))
+            self.list_ids = np.memmap(self.path, dtype="<u2", mode="r", offset=offset + 8 * count, shape=(count,))
+        else:
+            self.hashes = np.zeros(0, dtype="<u8")
+            self.list_ids = np.zeros(0, dtype="<u2")
+        self._mtime = os.stat(self.path).st_mtime
+        self._last_check = time.monotonic()
+
+    def maybe_reload(self):
+        """Remap the file if it was replaced since it was loaded."""
+        now = time.monotonic()
+        if now - self._last_check < RELOAD_CHECK_INTERVAL:
+            return
+        self._last_check = now
+        try:
+            if os.stat(self.path).st_mtime != self._mtime:
+                self._load()
+        except (OSError, ValueError) as e:
+            print(f"Could not reload domain reputation index: {e}")
+
+    def lookup(self, url: str) -> Optional[Dict[str, Any]]:
+        """Return the matching list entry for a URL's host or parent domains, if any."""
+        self.maybe_reload()
+        if not self.count:
+            return None
+
+        candidates = self._candidate_domains(url)
+        if not candidates:
+            return None
+
+        query = np.array([hash_domain(domain) for domain in candidates], dtype="<u8")
+        positions = np.searchsorted(self.hashes, query)
+        for domain, position, value in zip(candidates, positions, query):
+            if position < self.count and self.hashes[position] == value:
+                return {
+                    "list": self.list_names[int(self.list_ids[position])],
+                    "matched_domain": domain
+                }
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the size and list names of the loaded index."""
+        return {"path": self.path, "domains": int(self.count), "lists": self.list_names}
+
+    @staticmethod
+    def _candidate_domains(url: str) -> List[str]:
+        """Host of the URL plus each parent domain down to its registered domain."""
+        extractor = get_default_extractor()
+        host = extractor.host_from_url(url.strip()).lower()
+        if not host:
+            return []
+
+        registered = extractor.extract(host).registered_domain
+        if not registered or not host.endswith(registered):
+            return [host]
+
+        labels = host.split(".")
+        stop = len(labels) - len(registered.split("."))
+        return [".".join(labels[i:]) for i in range(stop + 1)]
+
+def load_reputation_index(path: str) -> Optional[DomainReputationIndex]:
+    """Open the index at path, or return None if it is missing or invalid."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return DomainReputationIndex(path)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"Could not load domain reputation index: {e}")
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the known-bad domain reputation index.")
+    parser.add_argument("output", help="Path of the index file to write")
+    parser.add_argument(
+        "--list", action="append", required=True, metavar="NAME=PATH",
+        help="Named domain list file; may be given several times"
+    )
+    args = parser.parse_args()
+
+    lists = {}
+    for item in args.list:
+        name, _, path = item.partition("=")
+        if not path:
+            parser.error(f"Expected NAME=PATH, got: {item}")
+        lists[name] = path
+
+    count = build_index(lists, args.output)
+    print(f"Indexed {count} domains from {len(lists)} lists into {args.output}")
+
+if __name__ == "__main__":
+    main()
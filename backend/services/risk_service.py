@@ -1,6 +1,7 @@
 from typing import Dict, Any, List
 from datetime import datetime, timedelta
 import numpy as np
+from utils.async_database import count_user_scans, get_user_scan_results
 
 class RiskService:
     """Service for calculating personal cyber safety scores with cross-platform consistency."""
@@ -14,13 +15,13 @@ class RiskService:
             "password_risk": 0.2
         }
     
-    def calculate_risk_score(self, user_id: int, db) -> Dict[str, Any]:
+    async def calculate_risk_score(self, user_id: int) -> Dict[str, Any]:
         """Calculate the overall risk score for a user with cross-platform consistency."""
         # Get user scan history from all platforms
-        scan_history = self._get_user_scan_history(user_id, db)
+        scan_history = await self._get_user_scan_history(user_id)
         
         # Calculate individual risk factors
-        breach_risk = self._calculate_breach_risk(user_id, db)
+        breach_risk = await self._calculate_breach_risk(user_id)
         url_risk = self._calculate_url_risk(scan_history)
         message_risk = self._calculate_message_risk(scan_history)
         password_risk = self._calculate_password_risk(scan_history)
@@ -67,34 +68,18 @@ class RiskService:
             )
         }
     
-    def _get_user_scan_history(self, user_id: int, db) -> List[Dict]:
+    async def _get_user_scan_history(self, user_id: int) -> List[Dict]:
         """Get user's scan history from all platforms."""
-        cursor = db.cursor()
-        cursor.execute("""
-            SELECT scan_type, result, timestamp 
-            FROM scan_history 
-            WHERE user_id = %s 
-            ORDER BY timestamp DESC
-        """, (user_id,))
-        
-        rows = cursor.fetchall()
-        cursor.close()
-        
-        return [dict(row) for row in rows]
+        rows = await get_user_scan_results(user_id)
+        if rows is None:
+            raise RuntimeError("Could not load scan history")
+        return rows
     
-    def _calculate_breach_risk(self, user_id: int, db) -> float:
+    async def _calculate_breach_risk(self, user_id: int) -> float:
         """Calculate breach risk factor."""
-        cursor = db.cursor()
-        cursor.execute("""
-            SELECT COUNT(*) as breach_count
-            FROM scan_history 
-            WHERE user_id = %s AND scan_type = 'email'
-        """, (user_id,))
-        
-        result = cursor.fetchone()
-        cursor.close()
-        
-        breach_count = result['breach_count'] if result else 0
+        breach_count = await count_user_scans(user_id, 'email')
+        if breach_count is None:
+            raise RuntimeError("Could not count breach checks")
         
         # Normalize to 0-1 scale (assuming max 10 breaches is high risk)
         return min(breach_count / 10.0, 1.0)
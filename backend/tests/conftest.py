@@ -0,0 +1,77 @@
+import os
+import random
+import sys
+
+import pytest
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SAFE_MESSAGES = [
+    "see you at dinner tonight", "can you pick up milk on the way home", "meeting moved to three pm",
+    "happy birthday hope you have a great day", "the kids loved the park today", "call me when you land",
+    "thanks for the lovely flowers", "running ten minutes late sorry", "lunch on friday works for me",
+]
+SUSPICIOUS_MESSAGES = [
+    "your account needs attention please review", "unusual activity noticed check your profile",
+    "confirm your details to keep access", "your package delivery needs an update",
+    "we could not process your request reply soon", "your subscription is about to change",
+]
+SCAM_MESSAGES = [
+    "congratulations you won a prize click here to claim now", "urgent your bank account is locked verify now",
+    "free gift card claim within 24 hours click the link", "you have won cash send your pin to claim",
+    "final notice pay the customs fee now or lose your parcel", "winner selected claim your free iphone now",
+]
+
+SAFE_URLS = [
+    "https://www.wikipedia.org/wiki/{}", "https://github.com/{}/project", "https://news.bbc.co.uk/{}",
+    "https://docs.python.org/3/library/{}.html", "https://www.example.com/about/{}",
+]
+SUSPICIOUS_URLS = [
+    "http://account-update-{}.info/profile", "http://bit-ly.example.top/{}?ref=mail",
+    "http://free-offers.example.xyz/{}/claim",
+]
+MALICIOUS_URLS = [
+    "http://secure-login-{}.example.com/verify?account=123&session=abc",
+    "http://192.168.0.{}/paypal/login.php?redirect=bank", "http://paypal.com.{}.verify-account.ru/signin",
+    "http://apple-id-{}.support-login.cn/unlock?user=admin@",
+]
+
+@pytest.fixture(scope="session")
+def message_corpus():
+    """Small labelled corpus (0 safe, 1 suspicious, 2 scam) with some word variation."""
+    rng = random.Random(7)
+    fillers = ["", " today", " please", " now", " thanks", " asap", " ok"]
+    messages, labels = [], []
+    for label, templates in enumerate((SAFE_MESSAGES, SUSPICIOUS_MESSAGES, SCAM_MESSAGES)):
+        for template in templates:
+            for _ in range(4):
+                messages.append(template + rng.choice(fillers) + rng.choice(fillers))
+                labels.append(label)
+    return messages, labels
+
+@pytest.fixture(scope="session")
+def url_corpus():
+    """Small labelled URL corpus (0 safe, 1 suspicious, 2 malicious)."""
+    rng = random.Random(11)
+    words = ["alpha", "news", "secure", "update", "docs", "team", "42", "shop"]
+    urls, labels = [], []
+    for label, templates in enumerate((SAFE_URLS, SUSPICIOUS_URLS, MALICIOUS_URLS)):
+        for template in templates:
+            for _ in range(6):
+                urls.append(template.format(rng.choice(words) + str(rng.randint(1, 99))))
+                labels.append(label)
+    return urls, labels
+
+@pytest.fixture(scope="session")
+def model_paths(tmp_path_factory, message_corpus, url_corpus):
+    """(message model path, URL model path) of models trained on the small corpora."""
+    from models.message_classifier import MessageClassifier
+    from models.url_classifier import URLClassifier
+
+    model_dir = tmp_path_factory.mktemp("models")
+    message_model = MessageClassifier(str(model_dir / "message_model.pkl"), feature_mode="tfidf")
+    message_model.train(*message_corpus)
+    url_model = URLClassifier(str(model_dir / "url_model.pkl"))
+    url_model.train(*url_corpus)
+    return message_model.model_path, url_model.model_path
@@ -0,0 +1,80 @@
+import math
+
+import pytest
+
+from models.base_model import DEFAULT_MODEL_VERSION
+from models.message_classifier import MessageClassifier
+from models.url_classifier import URLClassifier
+
+URLS = [
+    "http://secure-login.example.com/verify?account=123",
+    "https://www.wikipedia.org/wiki/Python",
+    "http://192.168.0.1/admin/login.php?redirect=paypal",
+    "example.com",
+]
+MESSAGES = [
+    "Congratulations! You have won a prize, click here to claim it now",
+    "URGENT: your bank account is locked, verify account details immediately",
+    "See you at dinner tonight, the kids are excited",
+]
+
+def assert_close(actual, expected, path="result"):
+    """Equal up to float rounding, recursing into dicts and lists."""
+    if isinstance(expected, float):
+        assert math.isclose(actual, expected, rel_tol=1e-9, abs_tol=1e-12), path
+    elif isinstance(expected, dict):
+        assert actual.keys() == expected.keys(), path
+        for key in expected:
+            assert_close(actual[key], expected[key], f"{path}.{key}")
+    elif isinstance(expected, (list, tuple)):
+        assert len(actual) == len(expected), path
+        for i, (a, e) in enumerate(zip(actual, expected)):
+            assert_close(a, e, f"{path}[{i}]")
+    else:
+        assert actual == expected, path
+
+@pytest.fixture(scope="module")
+def url_model(model_paths):
+    model = URLClassifier(model_paths[1])
+    model.load_model()
+    assert model.model_version != DEFAULT_MODEL_VERSION
+    return model
+
+@pytest.fixture(scope="module")
+def message_model(model_paths):
+    model = MessageClassifier(model_paths[0])
+    model.load_model()
+    assert model.model_version != DEFAULT_MODEL_VERSION
+    return model
+
+def test_url_analyze_extracts_features_once(url_model, monkeypatch):
+    calls = []
+    extract_features = url_model.extract_features
+    monkeypatch.setattr(url_model, "extract_features", lambda url: calls.append(url) or extract_features(url))
+    for url in URLS:
+        calls.clear()
+        prediction, explanation = url_model.analyze(url)
+        assert calls == [url]
+        assert_close(prediction, url_model.predict(url))
+        assert_close(explanation, url_model.explain_prediction(url))
+
+    batch = url_model.analyze_batch(URLS)
+    assert_close(batch, [url_model.analyze(url) for url in URLS])
+
+def test_message_analyze_transforms_once(message_model, monkeypatch):
+    vectorizer = message_model.model.named_steps['vectorizer']
+    calls = []
+    transform = vectorizer.transform
+    monkeypatch.setattr(vectorizer, "transform", lambda documents: calls.append(len(documents)) or transform(documents))
+
+    single = [message_model.analyze(message, include_shap=True) for message in MESSAGES]
+    assert calls == [1] * len(MESSAGES)
+    calls.clear()
+    batch = message_model.analyze_batch(MESSAGES, include_shap=True)
+    assert calls == [len(MESSAGES)]
+    assert_close(batch, single)
+
+    monkeypatch.undo()
+    for message, (prediction, explanation) in zip(MESSAGES, single):
+        assert_close(prediction, message_model.predict(message))
+        assert_close(explanation, message_model.explain_prediction(message, include_shap=True))
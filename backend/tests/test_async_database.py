@@ -0,0 +1,147 @@
+import asyncio
+import os
+
+import psycopg2
+import pytest
+
+from utils import async_database
+from utils import database
+from utils.database import content_hash
+
+def _admin_connection():
+    try:
+        conn = psycopg2.connect(host=database.DB_HOST, port=database.DB_PORT, database="postgres",
+                                user=database.DB_USER, password=database.DB_PASSWORD, connect_timeout=3)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL not reachable: {e}")
+    conn.autocommit = True
+    return conn
+
+@pytest.fixture
+def scan_db(monkeypatch):
+    """Empty database with the init_db schema, used by both connection pools for the test."""
+    name = f"async_database_test_{os.getpid()}"
+    admin = _admin_connection()
+    cursor = admin.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS {name}")
+    cursor.execute(f"CREATE DATABASE {name}")
+    monkeypatch.setattr(database, "DB_NAME", name)
+    monkeypatch.setattr(async_database, "DB_NAME", name)
+    monkeypatch.setattr(database, "_pool", None)
+    monkeypatch.setattr(async_database, "_pool", None)
+    try:
+        assert database.init_db()
+        database.close_pool()
+        yield name
+    finally:
+        database.close_pool()
+        cursor.execute(f"DROP DATABASE IF EXISTS {name}")
+        admin.close()
+
+def run(scenario):
+    """Run a coroutine on a fresh loop, closing that loop's pool afterwards."""
+    async def with_pool():
+        try:
+            return await scenario()
+        finally:
+            await async_database.close_async_pool()
+    return asyncio.run(with_pool())
+
+def test_users_round_trip(scan_db):
+    async def scenario():
+        assert await async_database.user_exists("alice", "alice@example.com") is False
+        user = await async_database.create_user("alice", "alice@example.com", "hash")
+        assert await async_database.create_user("alice", "other@example.com", "hash") is None
+        return (user, await async_database.user_exists("someone", "alice@example.com"),
+                await async_database.get_user_by_username("alice"), await async_database.get_user_by_username("bob"))
+
+    user, exists, stored, missing = run(scenario)
+    assert user["username"] == "alice" and user["created_at"] is not None
+    assert exists is True
+    assert stored == {"id": user["id"], "username": "alice", "email": "alice@example.com", "password_hash": "hash"}
+    assert missing is None
+
+def test_batch_insert_returns_ids_in_order_and_decodes_json(scan_db):
+    scans = [
+        ("message", "first message", {"prediction": "scam", "model_version": "v1"}),
+        ("url", "http://example.com", {"prediction": "safe", "model_version": "v1"}),
+        ("email", "alice@example.com", {"prediction": "safe", "details": [1, 2]}),
+    ]
+
+    async def scenario():
+        user = await async_database.create_user("alice", "alice@example.com", "hash")
+        single = await async_database.save_scan_result(user["id"], "message", "single", {"prediction": "safe"})
+        ids = await async_database.save_scan_results(user["id"], scans)
+        history = await async_database.get_scan_history(user["id"])
+        count = await async_database.count_user_scans(user["id"], "message")
+        return single, ids, history, count
+
+    single, ids, history, count = run(scenario)
+    assert ids == sorted(ids) and single < ids[0]
+    by_id = {row["id"]: row for row in history}
+    for scan_id, (scan_type, content, result) in zip(ids, scans):
+        assert by_id[scan_id]["scan_type"] == scan_type
+        assert by_id[scan_id]["result"] == result
+    # Messages and URLs are stored as hashes with a preview only
+    assert by_id[ids[0]]["content_preview"] == "first message"
+    assert count == 2
+
+def test_recent_verdicts_match_hash_and_model_version(scan_db):
+    async def scenario():
+        user = await async_database.create_user("alice", "alice@example.com", "hash")
+        await async_database.save_scan_results(user["id"], [
+            ("message", "old model", {"prediction": "safe", "model_version": "v1"}),
+            ("message", "current", {"prediction": "safe", "model_version": "v2"}),
+            ("message", "current", {"prediction": "scam", "model_version": "v2"}),
+        ])
+        hashes = [content_hash("old model"), content_hash("current"), content_hash("never scanned")]
+        return (await async_database.get_recent_verdicts("message", hashes, "v2", 60),
+                await async_database.get_recent_verdicts("url", hashes, "v2", 60),
+                await async_database.get_recent_verdicts("message", [], "v2", 60))
+
+    current, other_type, empty = run(scenario)
+    assert list(current) == [content_hash("current")]
+    assert current[content_hash("current")]["model_version"] == "v2"
+    assert other_type == {} and empty == {}
+
+def test_feedback_keeps_content_only_when_it_matches_the_scan(scan_db):
+    async def scenario():
+        user = await async_database.create_user("alice", "alice@example.com", "hash")
+        message_id, url_id = await async_database.save_scan_results(user["id"], [
+            ("message", "win a prize now", {"prediction": "safe"}),
+            ("url", "http://example.com", {"prediction": "safe"}),
+        ])
+        await async_database.save_feedback(user["id"], message_id, False, None, "win a prize now", "scam")
+        await async_database.save_feedback(user["id"], message_id, False, None, "something else", "scam")
+        await async_database.save_feedback(user["id"], url_id, False, None, "http://example.com", "malicious")
+        async with async_database.async_db_connection() as conn:
+            return await conn.fetch("SELECT content, correct_label FROM feedback ORDER BY id")
+
+    rows = run(scenario)
+    assert [(row["content"], row["correct_label"]) for row in rows] == [
+        ("win a prize now", "scam"), (None, "scam"), (None, "malicious")
+    ]
+
+def test_privacy_settings_default_then_upsert(scan_db):
+    async def scenario():
+        user = await async_database.create_user("alice", "alice@example.com", "hash")
+        default = await async_database.get_user_privacy_settings(user["id"])
+        assert await async_database.update_user_privacy_settings(user["id"], {"store_raw_content": True})
+        assert await async_database.update_user_privacy_settings(user["id"], {"auto_delete_after_days": 30})
+        return default, await async_database.get_user_privacy_settings(user["id"])
+
+    default, updated = run(scenario)
+    assert default == {"store_raw_content": False, "share_anonymous_data": True, "auto_delete_after_days": 365}
+    assert updated == {"store_raw_content": False, "share_anonymous_data": True, "auto_delete_after_days": 30}
+
+def test_block_left_in_transaction_is_rolled_back(scan_db):
+    async def scenario():
+        async with async_database.async_db_connection() as conn:
+            transaction = conn.transaction()
+            await transaction.start()
+            await conn.execute("INSERT INTO users (username, email, password_hash) VALUES ('bob', 'bob@example.com', 'h')")
+        async with async_database.async_db_connection() as conn:
+            in_transaction = conn.is_in_transaction()
+        return in_transaction, await async_database.user_exists("bob", "bob@example.com")
+
+    assert run(scenario) == (False, False)
@@ -0,0 +1,86 @@
+import json
+import sys
+
+import pytest
+
+import bulk_scan
+from models.message_classifier import MessageClassifier
+from models.url_classifier import URLClassifier
+
+RECORDS = [
+    {"id": "m1", "content": "Your account is suspended, verify your password at this link now"},
+    {"id": "u1", "scan_type": "url", "content": "http://paypal-secure-login.example.tk/verify"},
+    "not an object",
+    {"id": "m2", "content": "See you at lunch tomorrow"},
+    {"id": "x1", "scan_type": "fax", "content": "1234"},
+    {"id": "m3"},
+    {"id": "u2", "scan_type": "url", "content": "https://github.com/python/cpython"},
+]
+
+def write_input(tmp_path):
+    path = tmp_path / "input.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for record in RECORDS:
+            f.write(json.dumps(record) + "\n")
+        f.write("{broken\n")
+    return str(path)
+
+def run_scan(monkeypatch, model_paths, input_path, output_path, *extra):
+    message_model_path, url_model_path = model_paths
+    monkeypatch.setattr(sys, "argv", [
+        "bulk_scan.py", input_path, output_path, "--id-field", "id", "--chunk-size", "2", "--workers", "2",
+        "--message-model", message_model_path, "--url-model", url_model_path, *extra
+    ])
+    with pytest.raises(SystemExit) as exit_info:
+        bulk_scan.main()
+    assert exit_info.value.code == 0
+    with open(output_path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+def test_verdicts_are_written_in_input_order(tmp_path, monkeypatch, model_paths):
+    verdicts = run_scan(monkeypatch, model_paths, write_input(tmp_path), str(tmp_path / "out.ndjson"))
+
+    assert [v["index"] for v in verdicts] == list(range(len(RECORDS) + 1))
+    assert [v.get("id") for v in verdicts] == ["m1", "u1", None, "m2", "x1", "m3", "u2", None]
+    assert verdicts[2]["error"] == "expected a JSON object"
+    assert verdicts[4]["error"] == "Unsupported scan type: fax"
+    assert verdicts[5]["error"] == "Missing 'content' field"
+    assert verdicts[7]["error"].startswith("Invalid JSON")
+
+    message_model = MessageClassifier(model_paths[0])
+    message_model.load_model()
+    url_model = URLClassifier(model_paths[1])
+    url_model.load_model()
+    expected = {
+        0: message_model.predict_batch([RECORDS[0]["content"]])[0],
+        1: url_model.predict_batch([RECORDS[1]["content"]])[0],
+        3: message_model.predict_batch([RECORDS[3]["content"]])[0],
+        6: url_model.predict_batch([RECORDS[6]["content"]])[0],
+    }
+    for index, prediction in expected.items():
+        assert "error" not in verdicts[index]
+        assert verdicts[index]["prediction"] == prediction["prediction"]
+        assert verdicts[index]["confidence"] == pytest.approx(prediction["confidence"])
+
+def test_resume_drops_partial_output_and_continues(tmp_path, monkeypatch, model_paths):
+    input_path = write_input(tmp_path)
+    output_path = str(tmp_path / "out.ndjson")
+    complete = run_scan(monkeypatch, model_paths, input_path, output_path)
+
+    # Simulate a crash after the second chunk was checkpointed but while the third was half written
+    with open(output_path, "rb") as f:
+        lines = f.readlines()
+    kept = b"".join(lines[:4])
+    with open(output_path, "wb") as f:
+        f.write(kept + lines[4][:10])
+    bulk_scan.save_checkpoint(output_path + ".checkpoint", input_path, 4, len(kept))
+
+    resumed = run_scan(monkeypatch, model_paths, input_path, output_path, "--resume")
+    assert resumed == complete
+
+def test_resume_rejects_checkpoint_of_another_input(tmp_path):
+    input_path = write_input(tmp_path)
+    checkpoint_path = str(tmp_path / "out.ndjson.checkpoint")
+    bulk_scan.save_checkpoint(checkpoint_path, str(tmp_path / "other.jsonl"), 2, 10)
+    with pytest.raises(SystemExit, match="belongs to"):
+        bulk_scan.load_checkpoint(checkpoint_path, input_path)
@@ -0,0 +1,63 @@
+import pytest
+
+from services import campaign_service
+from services.campaign_service import CampaignIndex
+
+SCAM = "Your parcel 48213 is held at customs, pay the 2.99 fee at http://parcel-fees.example now"
+VARIANT = "Your parcel 90377 is held at customs, pay the 3.49 fee at http://parcel-fees.example now!"
+OTHER = "Hi grandma, the kids loved the park today and we will visit again next weekend"
+VERDICT = {"prediction": "scam", "confidence": 0.97, "risk_score": 92, "model_version": "v1",
+           "details": {"text_explanation": ["Contains urgent language"]}}
+
+def shingle_jaccard(first, second):
+    def shingles(text):
+        words = campaign_service.TOKEN_PATTERN.findall(campaign_service.DIGIT_PATTERN.sub("0", text.lower()))
+        text = " ".join(words)
+        size = campaign_service.SHINGLE_SIZE
+        return {text[i:i + size] for i in range(len(text) - size + 1)}
+    a, b = shingles(first), shingles(second)
+    return len(a & b) / len(a | b)
+
+def test_near_duplicate_reuses_the_first_verdict():
+    index = CampaignIndex()
+    assert index.lookup(index.signature(SCAM), "v1") is None
+    first = index.add(index.signature(SCAM), VERDICT, "v1")
+    assert first["members"] == 1 and not first["reused_verdict"]
+
+    match = index.lookup(index.signature(VARIANT), "v1")
+    # Only the verdict is kept; the explanation described the first message
+    assert match["result"] == {field: VERDICT[field] for field in campaign_service.VERDICT_FIELDS}
+    assert match["campaign"]["cluster_id"] == first["cluster_id"]
+    assert match["campaign"]["reused_verdict"] and match["campaign"]["members"] == 2
+    assert index.lookup(index.signature(OTHER), "v1") is None
+    assert index.stats()["hits"] == 1
+
+def test_signature_estimates_jaccard_similarity():
+    index = CampaignIndex(num_perm=256, bands=32)
+    edited = SCAM.replace("customs", "the depot")
+    estimate = float((index.signature(SCAM) == index.signature(edited)).mean())
+    assert estimate == pytest.approx(shingle_jaccard(SCAM, edited), abs=0.1)
+    # Digits are masked, so changed codes and amounts do not lower similarity
+    assert (index.signature("code 1234 for your account login now")
+            == index.signature("code 9876 for your account login now")).all()
+    assert index.signature("too short to index") is None
+
+def test_new_model_version_clears_campaigns():
+    index = CampaignIndex()
+    index.add(index.signature(SCAM), VERDICT, "v1")
+    assert index.lookup(index.signature(SCAM), "v2") is None
+    assert index.stats()["campaigns"] == 0
+
+def test_campaigns_are_bounded_by_count_and_age(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(campaign_service.time, "monotonic", lambda: now[0])
+    index = CampaignIndex(max_entries=1, max_age_seconds=60)
+    index.add(index.signature(SCAM), VERDICT, "v1")
+    index.add(index.signature(OTHER), dict(VERDICT, prediction="safe"), "v1")
+    assert index.stats()["evictions"] == 1
+    assert index.lookup(index.signature(SCAM), "v1") is None
+    assert index.lookup(index.signature(OTHER), "v1")["result"]["prediction"] == "safe"
+
+    now[0] += 61
+    assert index.lookup(index.signature(OTHER), "v1") is None
+    assert index.stats()["campaigns"] == 0
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from evaluate_cascade import choose
+from models import cascade
+from models.cascade import FIRST_STAGE, FULL_MODEL, FirstStage, load_first_stage, run_cascade
+
+CLASSES = [0, 1, 2]
+
+def stage_for(probabilities, safe_threshold=None, alert_threshold=0.8):
+    """First stage scoring one-hot row i as probabilities[i].
+
+    The safe threshold defaults to the computed probability of row 1, so
+    that row sits exactly on it.
+    """
+    log_probabilities = np.log(np.asarray(probabilities, dtype=np.float64))
+    stage = FirstStage(log_probabilities, np.zeros(3), CLASSES, 0, 2, 1.0, alert_threshold, "v1")
+    stage.safe_threshold = stage.probabilities(np.eye(len(probabilities)))[1, 0] if safe_threshold is None else safe_threshold
+    return stage
+
+PROBABILITIES = [
+    [0.95, 0.03, 0.02],  # confidently safe
+    [0.92, 0.05, 0.03],  # at the safe threshold
+    [0.85, 0.10, 0.05],  # below it
+    [0.05, 0.10, 0.85],  # confidently scam
+    [0.10, 0.80, 0.10],  # suspicious is never settled
+]
+
+def test_settle_applies_thresholds_inclusively():
+    stage = stage_for(PROBABILITIES)
+    settled, labels, probabilities = stage.settle(np.eye(5))
+    np.testing.assert_allclose(probabilities, PROBABILITIES)
+    assert settled.tolist() == [True, True, False, True, False]
+    assert labels[settled].tolist() == [0, 0, 2]
+
+    settled, _, _ = stage.settle(np.eye(5), safe_threshold=np.nextafter(stage.safe_threshold, 1))
+    assert settled.tolist() == [True, False, False, True, False]
+    settled, _, _ = stage.settle(np.eye(5), safe_threshold=0.8, alert_threshold=0.9)
+    assert settled.tolist() == [True, True, True, False, False]
+    settled, _, _ = stage.settle(np.eye(5), safe_threshold=1.0, alert_threshold=1.0)
+    assert not settled.any()
+
+def test_run_cascade_sends_only_escalated_rows_to_the_full_model():
+    stage = stage_for(PROBABILITIES)
+    calls = []
+
+    def full_predict(rows):
+        calls.append(rows.tolist())
+        return np.array([1] * len(rows)), np.full((len(rows), 3), 1 / 3)
+
+    labels, probabilities, stages = run_cascade(stage, np.eye(5), full_predict)
+    assert calls == [[2, 4]]
+    assert labels.tolist() == [0, 0, 1, 2, 1]
+    assert stages == [FIRST_STAGE, FIRST_STAGE, FULL_MODEL, FIRST_STAGE, FULL_MODEL]
+    np.testing.assert_allclose(probabilities[2], [1 / 3] * 3)
+    report = stage.stats.report()
+    assert report["rows"] == 5 and report[FIRST_STAGE]["exits"] == 3 and report[FULL_MODEL]["exits"] == 2
+
+def test_binary_fit_matches_logistic_regression():
+    from sklearn.linear_model import LogisticRegression
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(200, 4))
+    y = np.where(X[:, 0] + 0.5 * X[:, 1] > 0, 2, 0)
+    stage = FirstStage.fit(X, y, CLASSES, 0, 2, "v1")
+    reference = LogisticRegression(max_iter=1000).fit(X, y).predict_proba(X)
+    probabilities = stage.probabilities(X)
+    np.testing.assert_allclose(probabilities[:, [0, 2]], reference, atol=1e-9)
+    # A class the regression never saw gets probability 0
+    assert not probabilities[:, 1].any()
+
+def test_load_applies_threshold_overrides(tmp_path, monkeypatch):
+    path = str(tmp_path / "model.cascade.pkl")
+    stage_for(PROBABILITIES).save(path)
+    monkeypatch.setattr(cascade, "CASCADE_INFERENCE", "off")
+    assert load_first_stage(path, "v1") is None
+
+    monkeypatch.setattr(cascade, "CASCADE_INFERENCE", "on")
+    assert load_first_stage(path, "v2") is None
+    monkeypatch.setenv("CASCADE_SAFE_THRESHOLD", "0.99")
+    loaded = load_first_stage(path, "v1")
+    assert (loaded.safe_threshold, loaded.alert_threshold) == (0.99, 0.8)
+    assert loaded.settle(np.eye(5))[0].tolist() == [False, False, False, True, False]
+
+def test_choose_prefers_most_exits_within_the_accuracy_budget():
+    report = {"thresholds": [
+        {"safe_threshold": 0.8, "alert_threshold": 0.8, "exit_rate": 0.9, "accuracy_cost": 0.02},
+        {"safe_threshold": 0.9, "alert_threshold": 0.9, "exit_rate": 0.7, "accuracy_cost": 0.004},
+        {"safe_threshold": 0.95, "alert_threshold": 0.95, "exit_rate": 0.7, "accuracy_cost": 0.001},
+        {"safe_threshold": 0.99, "alert_threshold": 0.99, "exit_rate": 0.4, "accuracy_cost": 0.0},
+    ]}
+    assert choose(report, 0.005)["safe_threshold"] == 0.95
+    assert choose(report, 0.05)["safe_threshold"] == 0.8
+    assert choose(report, -0.01) is None
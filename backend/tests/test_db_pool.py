@@ -0,0 +1,181 @@
+import asyncio
+import threading
+
+import pytest
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS
+
+from utils.db_pool import AsyncConnectionPool, ConnectionPool, PoolTimeout
+
+class FakeConnection:
+    """Just enough of a psycopg2 connection for the pool."""
+
+    def __init__(self):
+        self.closed = False
+        self.status = TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+        self.pings = 0
+        self.broken = False
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = TRANSACTION_STATUS_IDLE
+
+    def cursor(self):
+        return self
+
+    def execute(self, query):
+        if self.broken:
+            raise ConnectionError("server closed the connection")
+        self.pings += 1
+
+    def close(self):
+        self.closed = True
+
+class FakeAsyncConnection:
+    """Just enough of an asyncpg connection for the async pool."""
+
+    def __init__(self):
+        self.closed = False
+        self.in_transaction = False
+        self.broken = False
+
+    def is_closed(self):
+        return self.closed
+
+    def is_in_transaction(self):
+        return self.in_transaction
+
+    async def execute(self, query):
+        self.in_transaction = False
+
+    async def fetchval(self, query):
+        if self.broken:
+            raise ConnectionError("server closed the connection")
+        return 1
+
+    async def close(self):
+        self.closed = True
+
+    def terminate(self):
+        self.closed = True
+
+def test_pool_reuses_connections_up_to_max_size():
+    opened = []
+    pool = ConnectionPool(lambda: opened.append(FakeConnection()) or opened[-1], min_size=1, max_size=2)
+    pool.fill()
+    assert len(opened) == 1
+
+    first = pool.acquire()
+    second = pool.acquire()
+    assert first is opened[0] and second is opened[1]
+    pool.release(first)
+    assert pool.acquire() is first
+    stats = pool.stats()
+    assert stats["open"] == 2 and stats["in_use"] == 2 and stats["utilization"] == 1.0
+    assert stats["checkouts"] == 3 and stats["created"] == 2
+
+def test_acquire_times_out_when_exhausted():
+    pool = ConnectionPool(FakeConnection, min_size=0, max_size=1, timeout=0.05)
+    pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    assert pool.stats()["timeouts"] == 1
+
+def test_waiting_thread_gets_released_connection():
+    pool = ConnectionPool(FakeConnection, min_size=0, max_size=1, timeout=5.0)
+    conn = pool.acquire()
+    borrowed = []
+    waiter = threading.Thread(target=lambda: borrowed.append(pool.acquire()))
+    waiter.start()
+    threading.Timer(0.05, pool.release, (conn,)).start()
+    waiter.join(5.0)
+
+    assert borrowed == [conn]
+    stats = pool.stats()
+    assert stats["waits"] == 1 and stats["max_wait_ms"] > 0
+
+def test_release_rolls_back_open_transaction():
+    pool = ConnectionPool(FakeConnection, min_size=0, max_size=1)
+    conn = pool.acquire()
+    conn.status = TRANSACTION_STATUS_INTRANS
+    pool.release(conn)
+    assert conn.rollbacks == 1
+    assert pool.acquire() is conn
+
+def test_dropped_idle_connection_is_replaced_on_checkout():
+    pool = ConnectionPool(FakeConnection, min_size=0, max_size=1, check_idle_seconds=0)
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.broken = True
+
+    replacement = pool.acquire()
+    assert replacement is not conn and conn.closed
+    assert pool.stats()["discarded"] == 1 and pool.stats()["open"] == 1
+
+def test_failed_connect_frees_the_slot():
+    attempts = []
+    def connect():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("database is starting up")
+        return FakeConnection()
+
+    pool = ConnectionPool(connect, min_size=0, max_size=1, timeout=0.05)
+    with pytest.raises(ConnectionError):
+        pool.acquire()
+    assert isinstance(pool.acquire(), FakeConnection)
+
+def test_closed_pool_closes_returned_connections():
+    pool = ConnectionPool(FakeConnection, min_size=1, max_size=2)
+    pool.fill()
+    borrowed = pool.acquire()
+    idle = pool.acquire()
+    pool.release(idle)
+    pool.close()
+    assert idle.closed and not borrowed.closed
+    pool.release(borrowed)
+    assert borrowed.closed and pool.stats()["open"] == 0
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+
+def test_async_pool_hands_released_connection_to_waiter():
+    async def scenario():
+        async def connect():
+            return FakeAsyncConnection()
+
+        pool = AsyncConnectionPool(connect, min_size=0, max_size=1, timeout=5.0)
+        conn = await pool.acquire()
+        conn.in_transaction = True
+        waiter = asyncio.create_task(pool.acquire())
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        await pool.release(conn)
+        assert await waiter is conn and not conn.in_transaction
+
+        pool.timeout = 0.05
+        with pytest.raises(PoolTimeout):
+            await pool.acquire()
+        return pool.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["waits"] == 1 and stats["timeouts"] == 1
+
+def test_async_pool_replaces_dropped_connection():
+    async def scenario():
+        async def connect():
+            return FakeAsyncConnection()
+
+        pool = AsyncConnectionPool(connect, min_size=1, max_size=1, check_idle_seconds=0)
+        await pool.fill()
+        conn = await pool.acquire()
+        await pool.release(conn)
+        conn.broken = True
+        replacement = await pool.acquire()
+        return conn, replacement, pool.stats()
+
+    conn, replacement, stats = asyncio.run(scenario())
+    assert replacement is not conn and conn.closed
+    assert stats["discarded"] == 1 and stats["created"] == 2
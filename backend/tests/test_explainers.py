@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+from models.explainers import LinearContributionExplainer, TreePathExplainer, top_feature_indices
+from models.message_classifier import MessageClassifier
+from models.url_classifier import URLClassifier
+
+@pytest.fixture(scope="module")
+def message_model(model_paths):
+    model = MessageClassifier(model_paths[0])
+    model.load_model()
+    return model
+
+@pytest.fixture(scope="module")
+def url_model(model_paths):
+    model = URLClassifier(model_paths[1])
+    model.load_model()
+    return model
+
+def test_naive_bayes_contributions_reproduce_predict_proba(message_model, message_corpus):
+    assert isinstance(message_model.explainer, LinearContributionExplainer)
+    vectorizer = message_model.model.named_steps['vectorizer']
+    classifier = message_model.model.named_steps['classifier']
+    for message in message_corpus[0][:20]:
+        vector = vectorizer.transform([message_model.preprocess(message)])
+        explanation = message_model.explainer.explain(vector)
+        np.testing.assert_allclose(message_model.explainer.probabilities(explanation),
+                                   classifier.predict_proba(vector)[0], atol=1e-9)
+        # Only the message's own terms are attributed
+        assert sorted(f["index"] for f in explanation["features"]) == sorted(vector.indices.tolist())
+
+def test_binary_logistic_regression_contributions_reproduce_predict_proba(message_corpus):
+    messages, labels = message_corpus
+    vectorizer = TfidfVectorizer()
+    X = vectorizer.fit_transform(messages)
+    binary_labels = [int(label != 0) for label in labels]
+    classifier = LogisticRegression().fit(X, binary_labels)
+    explainer = LinearContributionExplainer.from_classifier(classifier, vectorizer.get_feature_names_out())
+
+    for row in range(10):
+        explanation = explainer.explain(X[row])
+        np.testing.assert_allclose(explainer.probabilities(explanation), classifier.predict_proba(X[row])[0], atol=1e-9)
+        # The same attribution from a dense row
+        dense = explainer.explain(X[row].toarray())
+        assert [f["feature"] for f in dense["features"]] == [f["feature"] for f in explanation["features"]]
+        np.testing.assert_allclose(explainer.probabilities(dense), explainer.probabilities(explanation))
+
+def test_features_are_ordered_by_effect_on_predicted_class(message_model, message_corpus):
+    vector = message_model.model.named_steps['vectorizer'].transform([message_model.preprocess(message_corpus[0][0])])
+    explanation = message_model.explainer.explain(vector)
+    predicted = int(np.argmax(message_model.explainer.probabilities(explanation)))
+    effects = [abs(f["contributions"][predicted]) for f in explanation["features"]]
+    assert effects == sorted(effects, reverse=True)
+    assert top_feature_indices(explanation, predicted, 3) == [f["index"] for f in explanation["features"][:3]]
+
+def test_unsupported_classifier_has_no_linear_explainer():
+    assert LinearContributionExplainer.from_classifier(object()) is None
+
+def test_tree_path_contributions_reproduce_forest_probabilities(url_model, url_corpus):
+    assert isinstance(url_model.explainer, TreePathExplainer)
+    features = url_model.extract_features_batch(url_corpus[0][:20])
+    expected = url_model.model.predict_proba(url_model.scaler.transform(features))
+    for row, probabilities in zip(features, expected):
+        explanation = url_model.explainer.explain(row)
+        np.testing.assert_allclose(url_model.explainer.probabilities(explanation), probabilities, atol=1e-9)
+        assert all(any(f["contributions"]) for f in explanation["features"])
@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+from models.message_classifier import MessageClassifier
+from services.explanation_service import ExplanationService
+
+def trained_model(path, messages, labels):
+    model = MessageClassifier(str(path), feature_mode="tfidf")
+    model.train(messages, labels)
+    model.load_model()
+    return model
+
+def wait_for(service, explanation_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        entry = service.get(explanation_id)
+        if entry is not None and entry["status"] != "pending":
+            return entry
+        time.sleep(0.05)
+    raise AssertionError(f"Explanation {explanation_id} still pending")
+
+@pytest.fixture
+def service():
+    service = ExplanationService(max_workers=1)
+    yield service
+    service.close()
+
+def test_explanations_survive_a_model_swap(tmp_path, message_corpus, service):
+    messages, labels = message_corpus
+    old_model = trained_model(tmp_path / "old.pkl", messages, labels)
+    new_model = trained_model(tmp_path / "new.pkl", messages[::2], labels[::2])
+    assert old_model.model_version != new_model.model_version
+    content = "urgent your bank account is locked verify now"
+
+    old_id = service.submit(old_model, content)
+    assert old_id.startswith(old_model.model_version)
+    old_entry = wait_for(service, old_id)
+    assert old_entry["status"] == "ready"
+    assert old_entry["model_version"] == old_model.model_version
+    assert old_entry["shap_explanation"] == old_model.explain_shap(content)
+
+    # Explaining with the swapped-in model must not drop the old result
+    new_id = service.submit(new_model, content)
+    assert new_id != old_id
+    assert wait_for(service, new_id)["shap_explanation"] == new_model.explain_shap(content)
+    assert service.get(old_id) == old_entry
+    assert service.submit(old_model, content) == old_id
+    assert service.get("unknown") is None
+
+def test_changed_model_file_fails_the_job(tmp_path, message_corpus, service):
+    messages, labels = message_corpus
+    model = trained_model(tmp_path / "model.pkl", messages, labels)
+    # Retraining in place gives the file a different version than the loaded model
+    trained_model(tmp_path / "model.pkl", messages[::2], labels[::2])
+
+    entry = wait_for(service, service.submit(model, "free gift card claim now"))
+    assert entry["status"] == "failed"
+    assert model.model_version in entry["error"]
+
+def test_full_queue_rejects_new_jobs(tmp_path, message_corpus):
+    model = trained_model(tmp_path / "model.pkl", *message_corpus)
+    service = ExplanationService(max_workers=1, max_pending=0)
+    try:
+        assert service.submit(model, "see you at dinner tonight") is None
+        assert service.stats()["rejected"] == 1
+    finally:
+        service.close()
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from models.forest_engine import FlatForest
+
+def fit_forest(X, y, **params):
+    params = dict({"n_estimators": 15, "random_state": 0}, **params)
+    return RandomForestClassifier(**params).fit(X, y)
+
+def threshold_rows(engine, forest, n_features):
+    """Rows placed exactly on, and one float step either side of, every split threshold."""
+    rows = []
+    base = np.zeros(n_features)
+    for node in np.flatnonzero(np.isfinite(engine.threshold)):
+        threshold = engine.threshold[node]
+        for value in (threshold, np.nextafter(threshold, -np.inf), np.nextafter(threshold, np.inf),
+                      np.float32(threshold), np.nextafter(np.float32(threshold), np.float32(np.inf))):
+            row = base.copy()
+            row[engine.feature[node]] = value
+            rows.append(row)
+    return np.array(rows)
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(3)
+    X = rng.normal(size=(400, 6))
+    # Integer-valued columns produce many rows that sit on thresholds
+    X[:, 4] = rng.integers(0, 5, size=400)
+    X[:, 5] = rng.integers(0, 2, size=400)
+    y = (X[:, 0] + X[:, 4] > 2).astype(int) + (X[:, 1] > 1)
+    return X, y
+
+def assert_same(engine, forest, X):
+    # Tree averages are summed in a different order, so allow rounding in the last bits
+    np.testing.assert_allclose(engine.predict_proba(X), forest.predict_proba(X), rtol=0, atol=1e-12)
+    labels, _ = engine.predict_with_proba(X)
+    np.testing.assert_array_equal(labels, forest.predict(X))
+
+def test_matches_sklearn_on_random_and_threshold_rows(data):
+    X, y = data
+    forest = fit_forest(X, y)
+    engine = FlatForest.from_sklearn(forest)
+    rng = np.random.default_rng(4)
+    assert_same(engine, forest, rng.normal(scale=3, size=(500, X.shape[1])))
+    assert_same(engine, forest, threshold_rows(engine, forest, X.shape[1]))
+    assert_same(engine, forest, X)
+
+def test_matches_sklearn_with_folded_scaler(data):
+    X, y = data
+    scaler = StandardScaler().fit(X)
+    forest = fit_forest(scaler.transform(X), y, max_depth=6)
+    engine = FlatForest.from_sklearn(forest, scaler)
+    raw = np.vstack([X, np.random.default_rng(5).normal(scale=2, size=(200, X.shape[1]))])
+    np.testing.assert_allclose(engine.predict_proba(raw), forest.predict_proba(scaler.transform(raw)),
+                               rtol=0, atol=1e-12)
+    assert engine.check_parity(forest, scaler)
+
+def test_single_leaf_trees(data):
+    X, y = data
+    # Constant features leave nothing to split on, so every tree is a single leaf
+    constant = np.zeros_like(X)
+    forest = fit_forest(constant, y)
+    assert all(estimator.tree_.node_count == 1 for estimator in forest.estimators_)
+    engine = FlatForest.from_sklearn(forest)
+    assert engine.max_depth == 0
+    assert_same(engine, forest, np.vstack([constant[:5], X[:5]]))
+
+    # Forests mixing stumps with deeper trees
+    forest = fit_forest(X, y, max_features=1, min_impurity_decrease=0.02)
+    assert min(estimator.tree_.node_count for estimator in forest.estimators_) < max(
+        estimator.tree_.node_count for estimator in forest.estimators_)
+    engine = FlatForest.from_sklearn(forest)
+    assert_same(engine, forest, np.vstack([X, threshold_rows(engine, forest, X.shape[1])]))
+
+def test_single_row(data):
+    X, y = data
+    forest = fit_forest(X, y)
+    engine = FlatForest.from_sklearn(forest)
+    np.testing.assert_allclose(engine.predict_proba(X[0]), forest.predict_proba(X[:1]), rtol=0, atol=1e-12)
@@ -0,0 +1,23 @@
+import os
+
+from models.message_classifier import HASHING_N_FEATURES, MessageClassifier
+
+PROBES = [
+    "claim your free prize now", "see you at lunch", "please review your account details",
+    "your parcel fee is due pay now",
+]
+
+def test_hashing_mode_predicts_like_tfidf(tmp_path, message_corpus):
+    messages, labels = message_corpus
+    models = {}
+    for feature_mode in ("tfidf", "hashing"):
+        model = MessageClassifier(str(tmp_path / f"{feature_mode}.pkl"), feature_mode=feature_mode)
+        model.train(messages, labels)
+        models[feature_mode] = model
+
+    for message in messages + PROBES:
+        tfidf, hashing = (models[mode].predict(message) for mode in ("tfidf", "hashing"))
+        assert hashing["prediction"] == tfidf["prediction"], message
+
+    # The stored model is dominated by the per-bucket arrays, about 56 bytes each
+    assert os.path.getsize(tmp_path / "hashing.pkl") < 64 * HASHING_N_FEATURES
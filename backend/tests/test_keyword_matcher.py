@@ -0,0 +1,51 @@
+import random
+
+from models.message_classifier import MessageClassifier
+from utils.keyword_matcher import KeywordMatcher, get_default_matcher
+
+def naive_match(groups, text):
+    text = text.lower()
+    return {name: {pattern.lower() for pattern in patterns if pattern and pattern.lower() in text}
+            for name, patterns in groups.items()}
+
+def test_overlapping_patterns():
+    groups = {"words": ["he", "she", "his", "hers"], "other": ["ushe", "e"]}
+    matcher = KeywordMatcher(groups)
+    assert matcher.match("USHERS") == {"words": {"he", "she", "hers"}, "other": {"ushe", "e"}}
+    assert matcher.match("") == {"words": set(), "other": set()}
+
+def test_matches_naive_search_on_random_text():
+    rng = random.Random(3)
+    alphabet = "abc d"
+    groups = {
+        f"group{i}": ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 5))) for _ in range(6)]
+        for i in range(4)
+    }
+    groups["group0"].append("")
+    groups["group1"].append("ABC")
+    matcher = KeywordMatcher(groups)
+    for _ in range(300):
+        text = "".join(rng.choice(alphabet + "ABxyz!") for _ in range(rng.randint(0, 40)))
+        assert matcher.match(text) == naive_match(groups, text), text
+
+def test_untrusted_characters_do_not_grow_the_automaton():
+    matcher = KeywordMatcher({"terms": ["verify", "account"]})
+    matcher.match("verify your account")
+    transitions = sum(len(delta) for delta in matcher._delta)
+    matcher.match("".join(chr(code) for code in range(0x4e00, 0x5e00)))
+    assert sum(len(delta) for delta in matcher._delta) == transitions
+
+def test_message_rules_use_any_and_all_groups():
+    model = MessageClassifier("unused")
+    rules = {rule["name"]: rule for rule in model.message_rules}
+    matches = get_default_matcher().match("URGENT: click here to verify account")
+    assert MessageClassifier._rule_applies(rules["urgent_language"], "URGENT", matches)
+    assert MessageClassifier._rule_applies(rules["action_prompt"], "click here", matches)
+    calm = get_default_matcher().match("see you at dinner")
+    assert not MessageClassifier._rule_applies(rules["urgent_language"], "see you at dinner", calm)
+
+    rule = {"name": "gift", "all": ["gift", "Card"], "min_length": 10}
+    matcher = KeywordMatcher({"message:gift:any": [], "message:gift:all": rule["all"]})
+    assert MessageClassifier._rule_applies(rule, "a gift card for you", matcher.match("a gift card for you"))
+    assert not MessageClassifier._rule_applies(rule, "a gift for you", matcher.match("a gift for you"))
+    assert not MessageClassifier._rule_applies(rule, "giftcard", matcher.match("giftcard"))
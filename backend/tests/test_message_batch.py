@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from models.message_classifier import MessageClassifier
+
+@pytest.fixture(scope="module")
+def message_model(model_paths):
+    model = MessageClassifier(model_paths[0])
+    model.load_model()
+    return model
+
+def test_predict_batch_matches_pipeline(message_model, message_corpus):
+    messages = message_corpus[0]
+    results = message_model.predict_batch(messages)
+
+    processed = [message_model.preprocess(message) for message in messages]
+    labels = message_model.model.predict(processed)
+    probabilities = message_model.model.predict_proba(processed)
+    assert [r["prediction"] for r in results] == [message_model.label_map[label] for label in labels]
+    for result, row in zip(results, probabilities):
+        np.testing.assert_allclose(list(result["probabilities"].values()), row, atol=1e-12)
+        assert result["confidence"] == pytest.approx(row.max())
+
+def test_predict_batch_transforms_the_batch_once(message_model, message_corpus, monkeypatch):
+    vectorizer = message_model.model.named_steps['vectorizer']
+    calls = []
+    transform = vectorizer.transform
+    monkeypatch.setattr(vectorizer, "transform", lambda documents: calls.append(len(documents)) or transform(documents))
+
+    message_model.predict_batch(message_corpus[0][:16])
+    assert calls == [16]
+
+def test_predict_is_a_batch_of_one(message_model, message_corpus):
+    message = message_corpus[0][0]
+    assert message_model.predict(message) == message_model.predict_batch([message])[0]
+    assert message_model.predict_batch([]) == []
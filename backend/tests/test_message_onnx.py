@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("skl2onnx")
+
+from models import onnx_backend
+from models.message_classifier import MessageClassifier
+from models.onnx_backend import export_message_model, onnx_path_for, write_onnx_model
+
+class CountingSession:
+    """Wraps an OnnxClassifier and counts the rows it scores."""
+
+    def __init__(self, onnx_model):
+        self.onnx_model = onnx_model
+        self.rows = 0
+
+    def predict_with_proba(self, X):
+        self.rows += len(X)
+        return self.onnx_model.predict_with_proba(X)
+
+@pytest.fixture
+def trained_paths(tmp_path, message_corpus):
+    model_path = str(tmp_path / "message_model.pkl")
+    model = MessageClassifier(model_path, feature_mode="tfidf")
+    model.train(*message_corpus)
+    write_onnx_model(export_message_model(model), onnx_path_for(model_path))
+    return model_path
+
+def test_analyze_paths_score_through_onnx(trained_paths, message_corpus, monkeypatch):
+    monkeypatch.setattr(onnx_backend, "INFERENCE_BACKEND", "onnx")
+    model = MessageClassifier(trained_paths)
+    model.load_model()
+    assert model.onnx_model is not None
+    session = CountingSession(model.onnx_model)
+    model.onnx_model = session
+
+    messages = message_corpus[0][:12]
+    single = [model.analyze(message, include_shap=False) for message in messages]
+    assert session.rows == len(messages)
+    batch = model.analyze_batch(messages, include_shap=False)
+    assert session.rows == 2 * len(messages)
+
+    monkeypatch.setattr(onnx_backend, "INFERENCE_BACKEND", "sklearn")
+    reference = MessageClassifier(trained_paths)
+    reference.load_model()
+    assert reference.onnx_model is None
+    for (prediction, _), (batch_prediction, _), message in zip(single, batch, messages):
+        expected = reference.predict(message)
+        assert prediction["prediction"] == batch_prediction["prediction"] == expected["prediction"]
+        np.testing.assert_allclose(list(prediction["probabilities"].values()),
+                                   list(expected["probabilities"].values()), atol=1e-4)
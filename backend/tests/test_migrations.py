@@ -0,0 +1,106 @@
+import os
+
+import psycopg2
+import pytest
+from psycopg2.extras import RealDictCursor
+
+from utils import database
+from utils import migrations
+from utils.migrations import MIGRATION_LOCK_KEY, MIGRATIONS, migration_status, run_migrations
+
+# Tables as init_db created them before any migration existed
+LEGACY_SCHEMA = """
+    CREATE TABLE users (id SERIAL PRIMARY KEY, username VARCHAR(50));
+    CREATE TABLE scan_history (
+        id SERIAL PRIMARY KEY, user_id INTEGER REFERENCES users(id), scan_type VARCHAR(20) NOT NULL,
+        content_hash VARCHAR(64), content_preview TEXT, result JSONB,
+        is_anonymized BOOLEAN DEFAULT FALSE, timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE feedback (
+        id SERIAL PRIMARY KEY, user_id INTEGER REFERENCES users(id), scan_id INTEGER REFERENCES scan_history(id),
+        is_correct BOOLEAN, comment TEXT, timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+
+def _admin_connection():
+    try:
+        conn = psycopg2.connect(host=database.DB_HOST, port=database.DB_PORT, database="postgres",
+                                user=database.DB_USER, password=database.DB_PASSWORD, connect_timeout=3)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL not reachable: {e}")
+    conn.autocommit = True
+    return conn
+
+@pytest.fixture
+def migration_db(monkeypatch):
+    """Empty database with the legacy schema, used by _connect for the test."""
+    name = f"migrations_test_{os.getpid()}"
+    admin = _admin_connection()
+    cursor = admin.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS {name}")
+    cursor.execute(f"CREATE DATABASE {name}")
+    monkeypatch.setattr(database, "DB_NAME", name)
+    conn = database._connect()
+    conn.autocommit = True
+    conn.cursor().execute(LEGACY_SCHEMA)
+    try:
+        yield conn
+    finally:
+        conn.close()
+        cursor.execute(f"DROP DATABASE IF EXISTS {name}")
+        admin.close()
+
+def query(conn, statement, *params):
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    cursor.execute(statement, params)
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+def valid_indexes(conn):
+    return {row["relname"] for row in query(conn, """
+        SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname LIKE 'idx_scan_history_%%' AND i.indisvalid
+    """)}
+
+def test_applies_pending_migrations_once(migration_db):
+    assert run_migrations(target=2) == [1, 2]
+    status = migration_status()
+    assert status["version"] == 2
+    assert [m.version for m in status["pending"]] == [3, 4]
+
+    assert run_migrations() == [3, 4]
+    assert run_migrations() == []
+    assert migration_status()["version"] == max(m.version for m in MIGRATIONS)
+    assert valid_indexes(migration_db) == {m.index for m in MIGRATIONS if m.index}
+    columns = {row["column_name"] for row in query(
+        migration_db, "SELECT column_name FROM information_schema.columns WHERE table_name = 'feedback'")}
+    assert {"content", "correct_label"} <= columns
+
+def test_rebuilds_an_index_left_invalid_by_an_interrupted_build(migration_db):
+    assert run_migrations(target=1) == [1]
+    cursor = migration_db.cursor()
+    # What a cancelled CREATE INDEX CONCURRENTLY leaves behind, without its version record
+    cursor.execute("UPDATE pg_index SET indisvalid = false WHERE indexrelid = 'idx_scan_history_content_hash'::regclass")
+    cursor.execute("DELETE FROM schema_migrations WHERE version = 1")
+    assert valid_indexes(migration_db) == set()
+
+    assert run_migrations(target=1) == [1]
+    assert valid_indexes(migration_db) == {"idx_scan_history_content_hash"}
+
+def test_failed_migration_rolls_back_and_stops(migration_db, monkeypatch):
+    broken = migrations.Migration(5, "Broken", ("ALTER TABLE feedback ADD COLUMN broken INTEGER", "SELECT 1/0"))
+    monkeypatch.setattr(migrations, "MIGRATIONS", MIGRATIONS + [broken])
+    assert run_migrations() is None
+    assert migration_status()["version"] == max(m.version for m in MIGRATIONS)
+    assert not query(migration_db, "SELECT 1 FROM information_schema.columns WHERE column_name = 'broken'")
+
+def test_skips_when_another_process_holds_the_lock(migration_db):
+    holder = database._connect()
+    try:
+        holder.cursor().execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+        assert run_migrations(wait=False) == []
+        assert migration_status()["version"] == 0
+    finally:
+        holder.close()
+    assert run_migrations(wait=False) == [m.version for m in MIGRATIONS]
@@ -0,0 +1,110 @@
+import os
+
+import pytest
+
+from models import cascade, onnx_backend
+from models.cascade import FirstStage, cascade_path_for
+from models.message_classifier import MessageClassifier
+from models.onnx_backend import export_message_model, onnx_path_for, write_onnx_model
+from models.registry import HotSwapModel, ModelRegistry
+
+@pytest.fixture
+def sidecar_backends(monkeypatch):
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("skl2onnx")
+    monkeypatch.setattr(onnx_backend, "INFERENCE_BACKEND", "onnx")
+    monkeypatch.setattr(cascade, "CASCADE_INFERENCE", "on")
+
+def train(model_path, messages, labels):
+    model = MessageClassifier(model_path, feature_mode="tfidf")
+    model.train(messages, labels)
+    return model
+
+def write_sidecars(model, messages, labels):
+    write_onnx_model(export_message_model(model), onnx_path_for(model.model_path))
+    vectors = model.model.named_steps['vectorizer'].transform([model.preprocess(m) for m in messages])
+    classes = model.model.named_steps['classifier'].classes_
+    stage = FirstStage.fit(vectors, labels, classes, 0, 2, model.model_version)
+    stage.save(cascade_path_for(model.model_path))
+
+def test_hot_swap_loads_published_sidecars(tmp_path, message_corpus, sidecar_backends):
+    messages, labels = message_corpus
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    fallback_path = str(tmp_path / "fallback.pkl")
+    train(fallback_path, messages[::2], labels[::2])
+    served = HotSwapModel(registry, "message", MessageClassifier, fallback_path)
+    assert served.get().onnx_model is None
+
+    model_path = str(tmp_path / "trained" / "message_model.pkl")
+    os.makedirs(os.path.dirname(model_path))
+    model = train(model_path, messages, labels)
+    write_sidecars(model, messages, labels)
+    version = registry.publish("message", model_path)
+
+    version_dir = tmp_path / "registry" / "message" / version
+    assert sorted(os.listdir(version_dir)) == ["metadata.json", "model.cascade.pkl", "model.onnx", "model.pkl"]
+    assert served.refresh()
+    swapped = served.get()
+    assert swapped.model_version == version
+    assert swapped.onnx_model is not None
+    assert swapped.first_stage is not None
+    assert swapped.analyze(messages[0], include_shap=False)[0]["prediction"] in ("safe", "suspicious", "scam")
+
+def test_republish_adds_sidecars_and_checks_them(tmp_path, message_corpus, sidecar_backends):
+    messages, labels = message_corpus
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    model_path = str(tmp_path / "message_model.pkl")
+    model = train(model_path, messages, labels)
+    version = registry.publish("message", model_path)
+    assert registry.metadata("message", version)["sidecars"] == {}
+
+    write_sidecars(model, messages, labels)
+    assert registry.publish("message", model_path) == version
+    assert set(registry.metadata("message", version)["sidecars"]) == {"model.onnx", "model.cascade.pkl"}
+
+    served = HotSwapModel(registry, "message", MessageClassifier, model_path)
+    assert served.get().onnx_model is not None
+
+    with open(tmp_path / "registry" / "message" / version / "model.onnx", "ab") as f:
+        f.write(b"\0")
+    assert not registry.verify("message", version)
+
+def test_swaps_to_published_versions_and_rolls_back(tmp_path, message_corpus):
+    messages, labels = message_corpus
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    first = registry.publish("message", train(str(tmp_path / "first.pkl"), messages, labels).model_path)
+    served = HotSwapModel(registry, "message", MessageClassifier, str(tmp_path / "missing.pkl"))
+    old_model = served.get()
+    assert old_model.model_version == first
+    assert not served.refresh()
+
+    second = registry.publish("message", train(str(tmp_path / "second.pkl"), messages[::2], labels[::2]).model_path)
+    assert [metadata["version"] for metadata in registry.list_versions("message")] == [first, second]
+    assert served.refresh()
+    assert served.get().model_version == second and served.status()["registry_version"] == second
+    # A request that read the old model before the swap keeps using it
+    assert old_model.model_version == first
+
+    registry.activate("message", first)
+    assert served.refresh()
+    assert served.get().model_version == first
+
+def test_corrupt_version_is_rejected_and_not_retried(tmp_path, message_corpus):
+    messages, labels = message_corpus
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    good = registry.publish("message", train(str(tmp_path / "good.pkl"), messages, labels).model_path)
+    served = HotSwapModel(registry, "message", MessageClassifier, str(tmp_path / "missing.pkl"))
+    assert served.get().model_version == good
+
+    bad = registry.publish("message", train(str(tmp_path / "bad.pkl"), messages[::2], labels[::2]).model_path)
+    with open(registry.artifact_path("message", bad), "ab") as f:
+        f.write(b"\0")
+    with pytest.raises(ValueError):
+        registry.activate("message", bad)
+
+    # Marked active behind the registry's back, e.g. by a partial copy
+    with open(tmp_path / "registry" / "message" / "ACTIVE", "w") as f:
+        f.write(bad)
+    assert not served.refresh()
+    assert served.get().model_version == good
+    assert served._rejected == bad
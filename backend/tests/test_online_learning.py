@@ -0,0 +1,83 @@
+import pytest
+
+from models.message_classifier import MessageClassifier
+from models.registry import ModelRegistry
+from services import online_learning_service
+from services.online_learning_service import OnlineLearner, update_from_feedback
+
+LONG_SCAM = ("dear customer your parcel is held at the depot and will be returned today unless "
+             "you pay the redelivery fee at the link below")
+
+def feedback_row(feedback_id, prediction, is_correct, content=LONG_SCAM, correct_label=None):
+    return {"id": feedback_id, "prediction": prediction, "is_correct": is_correct,
+            "correct_label": correct_label, "content": content}
+
+@pytest.fixture
+def feedback_rows(monkeypatch):
+    rows = []
+
+    def get_batch(after_id, limit, min_age_seconds=60):
+        return [row for row in rows if row["id"] > after_id][:limit]
+
+    monkeypatch.setattr(online_learning_service, "get_message_feedback_batch", get_batch)
+    return rows
+
+def test_feedback_labels():
+    learner = OnlineLearner(MessageClassifier())
+    assert learner.feedback_label(feedback_row(1, "scam", True)) == 2
+    assert learner.feedback_label(feedback_row(1, "safe", False)) == 2
+    assert learner.feedback_label(feedback_row(1, "scam", False)) == 0
+    # A wrong "suspicious" is learned only with the class the user gave
+    assert learner.feedback_label(feedback_row(1, "suspicious", False)) is None
+    assert learner.feedback_label(feedback_row(1, "suspicious", False, correct_label="scam")) == 2
+    assert learner.feedback_label(feedback_row(1, "scam", False, correct_label="suspicious")) == 1
+    assert learner.feedback_label(feedback_row(1, "scam", False, correct_label="scam")) is None
+    assert learner.feedback_label(feedback_row(1, "unknown", True)) is None
+
+def test_learns_full_text_into_active_version(tmp_path, message_corpus, feedback_rows, monkeypatch):
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    trained_path = str(tmp_path / "trained.pkl")
+    MessageClassifier(trained_path).train(*message_corpus)
+    base_version = registry.publish("message", trained_path)
+    fallback_path = str(tmp_path / "fallback.pkl")
+
+    learned = []
+    original_partial_fit = MessageClassifier.partial_fit
+    def recording_partial_fit(model, messages, labels):
+        learned.extend(zip(messages, labels))
+        return original_partial_fit(model, messages, labels)
+    monkeypatch.setattr(MessageClassifier, "partial_fit", recording_partial_fit)
+
+    feedback_rows.extend([
+        feedback_row(3, "safe", False),
+        feedback_row(5, "suspicious", False),
+        feedback_row(8, "scam", True, content="you won a prize claim it now"),
+    ])
+    stats = update_from_feedback(registry, fallback_path)
+
+    assert learned == [(LONG_SCAM, 2), ("you won a prize claim it now", 2)]
+    assert stats["published"] and stats["feedback_rows"] == 3 and stats["learned"] == 2
+    version = registry.active_version("message")
+    assert version == stats["model_version"] != base_version
+    assert registry.metadata("message", version)["base_version"] == base_version
+
+    served = MessageClassifier(registry.artifact_path("message", version))
+    served.load_model()
+    assert served.feedback_watermark == 8
+    # The registry copy of the base version is left untouched
+    assert registry.verify("message", base_version)
+
+    # A second run starts from the published version and only reads newer feedback
+    feedback_rows.append(feedback_row(9, "safe", True, content="lunch on friday works for me"))
+    stats = update_from_feedback(registry, fallback_path)
+    assert stats["feedback_rows"] == 1
+    assert learned[-1] == ("lunch on friday works for me", 0)
+    assert registry.metadata("message", registry.active_version("message"))["base_version"] == version
+
+def test_nothing_published_without_new_feedback(tmp_path, message_corpus, feedback_rows):
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    fallback_path = str(tmp_path / "fallback.pkl")
+    MessageClassifier(fallback_path).train(*message_corpus)
+    stats = update_from_feedback(registry, fallback_path)
+    assert stats["feedback_rows"] == 0 and not stats["published"]
+    assert registry.active_version("message") is None
@@ -0,0 +1,51 @@
+import pytest
+
+from models.public_suffix import DEFAULT_SUFFIX_LIST_PATH, DomainParts, PublicSuffixExtractor
+
+URLS = [
+    "https://www.example.com/login", "http://login.bank.co.uk:8080/path?q=1", "HTTP://Mail.Example.COM.",
+    "user:pass@shop.example.org/cart", "//cdn.example.net/lib.js", "https://foo.bar.ck", "https://www.ck/home",
+    "http://192.168.0.1/admin", "http://[2001:db8::1]:8080/", "localhost:3000", "http://xn--bcher-kva.example/",
+    "https://city.kawasaki.jp", "https://a.b.c.kawasaki.jp", "https://example.xn--p1ai/", "999.1.1.1",
+    "https://s3.amazonaws.com/bucket", "",
+]
+
+@pytest.fixture(scope="module")
+def extractor():
+    return PublicSuffixExtractor()
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://www.example.com/login", ("www", "example", "com")),
+    ("http://login.bank.co.uk:8080/path?q=1", ("login", "bank", "co.uk")),
+    ("HTTP://Mail.Example.COM.", ("Mail", "Example", "COM")),
+    ("user:pass@shop.example.org/cart", ("shop", "example", "org")),
+    # *.ck makes every label under ck a suffix, except the !www.ck exception
+    ("https://foo.bar.ck", ("", "foo", "bar.ck")),
+    ("https://www.ck/home", ("", "www", "ck")),
+    ("http://192.168.0.1/admin", ("", "192.168.0.1", "")),
+    ("http://[2001:db8::1]:8080/", ("", "[2001:db8::1]", "")),
+    ("localhost:3000", ("", "localhost", "")),
+    # Private suffixes are not applied, as with tldextract's defaults
+    ("https://s3.amazonaws.com/bucket", ("s3", "amazonaws", "com")),
+])
+def test_splits(extractor, url, expected):
+    assert extractor.extract(url) == DomainParts(*expected)
+
+def test_registered_domain(extractor):
+    assert extractor("http://login.bank.co.uk").registered_domain == "bank.co.uk"
+    assert extractor("http://localhost").registered_domain == ""
+
+def test_splits_are_memoized_per_host(extractor):
+    before = extractor.cache_info().hits
+    extractor.extract("https://repeat.example.com/a")
+    extractor.extract("http://repeat.example.com/b?c=d")
+    assert extractor.cache_info().hits == before + 1
+
+def test_matches_tldextract_on_the_bundled_list(tmp_path, extractor):
+    tldextract = pytest.importorskip("tldextract")
+    reference = tldextract.TLDExtract(
+        cache_dir=str(tmp_path), suffix_list_urls=(f"file://{DEFAULT_SUFFIX_LIST_PATH}",), fallback_to_snapshot=False
+    )
+    for url in URLS:
+        expected = reference(url)
+        assert extractor(url) == (expected.subdomain, expected.domain, expected.suffix), url
@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from services import reputation_service
+from services.reputation_service import build_index, load_reputation_index
+
+@pytest.fixture
+def index_path(tmp_path):
+    phishing = tmp_path / "phishing.txt"
+    phishing.write_text("# phishing hosts\n\nlogin.evil-bank.com\nhttps://Fake-Shop.co.uk/checkout\n*.scam.net\n")
+    malware = tmp_path / "malware.txt"
+    malware.write_text("malware.org\nlogin.evil-bank.com\n")
+    path = str(tmp_path / "bad_domains.idx")
+    assert build_index({"phishing": str(phishing), "malware": str(malware)}, path) == 4
+    return path
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://login.evil-bank.com/verify", {"list": "phishing", "matched_domain": "login.evil-bank.com"}),
+    ("http://a.b.malware.org:8080/x", {"list": "malware", "matched_domain": "malware.org"}),
+    ("https://www.fake-shop.co.uk", {"list": "phishing", "matched_domain": "fake-shop.co.uk"}),
+    ("deep.sub.scam.net", {"list": "phishing", "matched_domain": "scam.net"}),
+    # Listing a subdomain does not flag its parent or siblings
+    ("https://evil-bank.com", None),
+    ("https://www.evil-bank.com", None),
+    # The public suffix itself is never looked up
+    ("https://co.uk", None),
+    ("https://example.com", None),
+    ("", None),
+])
+def test_lookup(index_path, url, expected):
+    assert load_reputation_index(index_path).lookup(url) == expected
+
+def test_replaced_index_is_remapped(index_path, tmp_path, monkeypatch):
+    index = load_reputation_index(index_path)
+    assert index.lookup("https://malware.org") is not None
+
+    fresh = tmp_path / "fresh.txt"
+    fresh.write_text("new-threat.io\n")
+    build_index({"fresh": str(fresh)}, index_path)
+    os.utime(index_path, (0, 0))
+    # Not remapped until the check interval has passed
+    assert index.lookup("https://malware.org") is not None
+    monkeypatch.setattr(reputation_service, "RELOAD_CHECK_INTERVAL", 0.0)
+    assert index.lookup("https://malware.org") is None
+    assert index.lookup("https://new-threat.io/") == {"list": "fresh", "matched_domain": "new-threat.io"}
+
+def test_missing_or_invalid_index(tmp_path):
+    assert load_reputation_index(str(tmp_path / "missing.idx")) is None
+    invalid = tmp_path / "invalid.idx"
+    invalid.write_bytes(b"not an index file at all")
+    assert load_reputation_index(str(invalid)) is None
+
+def test_empty_index(tmp_path):
+    empty = tmp_path / "empty.txt"
+    empty.write_text("# nothing yet\n")
+    path = str(tmp_path / "empty.idx")
+    assert build_index({"empty": str(empty)}, path) == 0
+    assert load_reputation_index(path).lookup("https://malware.org") is None
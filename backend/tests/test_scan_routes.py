@@ -0,0 +1,100 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from models.message_classifier import MessageClassifier
+from models.registry import HotSwapModel, ModelRegistry
+from models.url_classifier import URLClassifier
+from routes import scan_routes
+from services.reputation_service import build_index, load_reputation_index
+from utils.database import content_hash
+
+SCAM = "Congratulations! You have won a prize, click here to claim it now"
+URL = "http://secure-login.example.com/verify?account=123"
+
+@pytest.fixture
+def stored_verdicts(monkeypatch):
+    """scan_history verdicts by content hash, and the lookups the routes made."""
+    stored, lookups = {}, []
+
+    async def get_recent_verdicts(scan_type, content_hashes, model_version, max_age_seconds):
+        lookups.append((scan_type, content_hashes, model_version))
+        return {key: stored[key] for key in content_hashes if key in stored}
+
+    monkeypatch.setattr(scan_routes, "get_recent_verdicts", get_recent_verdicts)
+    return stored, lookups
+
+@pytest.fixture
+def client(tmp_path, monkeypatch, stored_verdicts, model_paths):
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    monkeypatch.setattr(scan_routes, "message_models", HotSwapModel(registry, "message", MessageClassifier, model_paths[0]))
+    monkeypatch.setattr(scan_routes, "url_models", HotSwapModel(registry, "url", URLClassifier, model_paths[1]))
+    monkeypatch.setattr(scan_routes, "SHAP_EXPLANATIONS", "off")
+    monkeypatch.setattr(scan_routes, "reputation_index", None)
+    for cache in (scan_routes.message_verdict_cache, scan_routes.url_verdict_cache, scan_routes.campaign_index):
+        cache.clear()
+    app = FastAPI()
+    app.include_router(scan_routes.router)
+    return TestClient(app)
+
+def analyze(client, scan_type, content):
+    response = client.post("/scan/analyze", json={"scan_type": scan_type, "content": content})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_batch_returns_one_result_per_item_in_order(client):
+    items = [
+        {"scan_type": "url", "content": URL},
+        {"scan_type": "message", "content": SCAM},
+        {"scan_type": "fax", "content": "555-0100"},
+        {"scan_type": "message", "content": "See you at dinner tonight, the kids are excited"},
+        {"scan_type": "password", "content": "password123"},
+    ]
+    response = client.post("/scan/analyze-batch", json={"items": items})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [(row["index"], row["scan_type"]) for row in results] == [(i, item["scan_type"]) for i, item in enumerate(items)]
+    assert results[2]["result"] is None and results[2]["error"] == "Unsupported scan type: fax"
+    assert all(row["error"] is None for i, row in enumerate(results) if i != 2)
+    assert results[1]["result"]["model_version"] == scan_routes.message_models.get().model_version
+
+    # Score each item again on its own, without the verdicts the batch cached
+    for cache in (scan_routes.message_verdict_cache, scan_routes.url_verdict_cache, scan_routes.campaign_index):
+        cache.clear()
+    for row, item in zip(results, items):
+        if row["result"] is not None:
+            single = analyze(client, item["scan_type"], item["content"])
+            assert (row["result"]["prediction"], row["result"]["risk_score"]) == (single["prediction"], single["risk_score"])
+            assert row["result"]["confidence"] == pytest.approx(single["confidence"])
+
+def test_batch_size_is_limited(client, monkeypatch):
+    monkeypatch.setattr(scan_routes, "MAX_BATCH_ITEMS", 2)
+    items = [{"scan_type": "message", "content": SCAM}] * 3
+    response = client.post("/scan/analyze-batch", json={"items": items})
+    assert response.status_code == 400
+
+def test_verdicts_are_reused_by_content_hash(client, stored_verdicts):
+    stored, lookups = stored_verdicts
+    model_version = scan_routes.message_models.get().model_version
+    stored[content_hash(SCAM)] = {
+        "prediction": "suspicious", "confidence": 0.42, "details": {"stored": True},
+        "risk_score": 42.0, "model_version": model_version
+    }
+
+    first = analyze(client, "message", SCAM)
+    assert first["prediction"] == "suspicious" and first["details"] == {"stored": True}
+    assert lookups == [("message", [content_hash(SCAM)], model_version)]
+
+    # The stored verdict warmed the in-memory cache, so the database is not asked again
+    assert analyze(client, "message", SCAM) == first
+    assert len(lookups) == 1
+
+def test_known_bad_domains_skip_the_model(client, tmp_path, monkeypatch):
+    bad_domains = tmp_path / "bad.txt"
+    bad_domains.write_text("example.com\n")
+    build_index({"phishing": str(bad_domains)}, str(tmp_path / "bad.idx"))
+    monkeypatch.setattr(scan_routes, "reputation_index", load_reputation_index(str(tmp_path / "bad.idx")))
+
+    result = analyze(client, "url", URL)
+    assert result["prediction"] == "malicious" and result["risk_score"] == 100.0
+    assert result["details"] == {"reputation": {"list": "phishing", "matched_domain": "example.com"}}
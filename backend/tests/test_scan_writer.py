@@ -0,0 +1,113 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import asyncpg
+import pytest
+
+from utils import scan_writer
+from utils.scan_writer import ScanWriter
+
+class FakeDatabase:
+    """scan_history in memory, rejecting a whole COPY when any row is bad like PostgreSQL does."""
+
+    def __init__(self):
+        self.rows = {}
+        self.next_id = 1
+        self.reachable = True
+        self.copies = 0
+        self.inserts = 0
+
+    @staticmethod
+    def _check(row):
+        if row[2] not in ("url", "message"):
+            raise asyncpg.DataError(f"invalid scan_type {row[2]}")
+
+    async def fetch(self, query, count):
+        ids = list(range(self.next_id, self.next_id + count))
+        self.next_id += count
+        return [{"id": scan_id, "now": datetime.now()} for scan_id in ids]
+
+    async def copy_records_to_table(self, table, records, columns):
+        self.copies += 1
+        for row in records:
+            self._check(row)
+            if row[0] in self.rows:
+                raise asyncpg.UniqueViolationError(f"duplicate key {row[0]}")
+        self.rows.update((row[0], dict(zip(columns, row))) for row in records)
+
+    async def execute(self, query, *row):
+        self.inserts += 1
+        self._check(row)
+        self.rows.setdefault(row[0], dict(zip(scan_writer.COLUMNS, row)))
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakeDatabase()
+
+    @asynccontextmanager
+    async def connection():
+        yield database if database.reachable else None
+
+    monkeypatch.setattr(scan_writer, "async_db_connection", connection)
+    return database
+
+def scans(*scan_types):
+    return [(scan_type, f"content {i}", {"prediction": "safe", "scan_id": 99}) for i, scan_type in enumerate(scan_types)]
+
+def test_queued_rows_are_copied_in_batches(database):
+    async def run():
+        writer = ScanWriter(batch_size=2, id_block_size=10)
+        ids = await writer.save(1, scans("url", "message", "url"))
+        assert database.rows == {}
+        assert await writer.flush()
+        return writer, ids
+
+    writer, ids = asyncio.run(run())
+    assert ids == [1, 2, 3] and sorted(database.rows) == ids
+    assert database.copies == 2 and database.inserts == 0
+    # The stored result is the one the caller had before adding its scan_id
+    assert database.rows[1]["result"] == {"prediction": "safe"}
+    assert writer.stats()["written"] == 3 and writer.stats()["id_blocks"] == 1
+
+def test_rejected_copy_falls_back_to_single_rows(database):
+    async def run():
+        writer = ScanWriter(batch_size=10)
+        ids = await writer.save(1, scans("url", "bogus", "message"))
+        # A row a lost acknowledgement already wrote must not fail the batch again
+        database.rows[ids[0]] = {"id": ids[0]}
+        assert await writer.flush()
+        return writer, ids
+
+    writer, ids = asyncio.run(run())
+    assert sorted(database.rows) == [ids[0], ids[2]]
+    assert database.inserts == 3
+    stats = writer.stats()
+    assert stats["dropped"] == 1 and stats["written"] == 2 and stats["queue_depth"] == 0
+
+def test_rows_stay_queued_while_the_database_is_down(database):
+    async def run():
+        writer = ScanWriter(batch_size=10)
+        ids = await writer.save(1, scans("url", "message"))
+        database.reachable = False
+        assert not await writer.flush()
+        assert not await writer.wait_written(ids[0])
+        assert writer.stats()["queue_depth"] == 2
+        database.reachable = True
+        assert await writer.wait_written(ids[0])
+        return writer, ids
+
+    writer, ids = asyncio.run(run())
+    assert sorted(database.rows) == ids
+    assert writer.stats()["failed_flushes"] == 2
+
+def test_full_queue_writes_on_the_request_path(database):
+    async def run():
+        writer = ScanWriter(queue_size=2, batch_size=10)
+        await writer.save(1, scans("url", "url"))
+        direct = await writer.save(1, scans("message"))
+        return writer, direct
+
+    writer, direct = asyncio.run(run())
+    assert list(database.rows) == direct
+    assert writer.stats()["direct_writes"] == 1 and writer.stats()["queue_depth"] == 2
@@ -0,0 +1,65 @@
+import os
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+import main
+from models.message_classifier import MessageClassifier
+from models.registry import HotSwapModel, ModelRegistry
+from models.url_classifier import URLClassifier
+from routes import scan_routes
+from utils.startup_profile import StartupProfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_importing_the_app_loads_no_models_and_no_shap():
+    script = (
+        "import sys, main\n"
+        "from routes import scan_routes\n"
+        "print('shap' in sys.modules, scan_routes.message_models.current is None, scan_routes.url_models.current is None)\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    assert result.stdout.split()[-3:] == ["False", "True", "True"]
+
+def test_ready_returns_503_until_startup_finishes(monkeypatch):
+    profile = StartupProfile()
+    monkeypatch.setattr(main, "startup_profile", profile)
+    client = TestClient(main.app)
+
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["startup"]["ready_after_ms"] is None
+
+    with profile.phase("warm_up"):
+        pass
+    profile.mark_ready()
+    response = client.get("/ready")
+    assert response.status_code == 200
+    report = response.json()["startup"]
+    assert report["ready"] and report["ready_after_ms"] >= 0
+    assert "warm_up" in report["phases_ms"]
+
+def test_import_timer_records_new_modules_once(tmp_path, monkeypatch):
+    (tmp_path / "startup_probe_module.py").write_text("import time\ntime.sleep(0.01)\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "startup_probe_module", raising=False)
+
+    profile = StartupProfile()
+    with profile.import_timer():
+        import startup_probe_module  # noqa: F401
+        import startup_probe_module  # noqa: F401,F811
+    assert list(profile.imports) == ["startup_probe_module"]
+    assert profile.imports["startup_probe_module"] >= 0.01
+    assert profile.slowest_imports(1) == [("startup_probe_module", profile.imports["startup_probe_module"])]
+
+def test_warm_up_loads_both_models(tmp_path, monkeypatch, model_paths):
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    message_models = HotSwapModel(registry, "message", MessageClassifier, model_paths[0])
+    url_models = HotSwapModel(registry, "url", URLClassifier, model_paths[1])
+    monkeypatch.setattr(scan_routes, "message_models", message_models)
+    monkeypatch.setattr(scan_routes, "url_models", url_models)
+
+    scan_routes.warm_up()
+    assert message_models.current.model_path == model_paths[0]
+    assert url_models.current.engine is not None
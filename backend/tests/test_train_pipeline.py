@@ -0,0 +1,76 @@
+import json
+import sys
+
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+import train_pipeline
+from models.message_classifier import MessageClassifier
+from train_pipeline import TermRuns, build_vocabulary, write_term_run
+
+def run_pipeline(tmp_path, monkeypatch, messages, labels, feature_mode):
+    label_map = MessageClassifier("unused").label_map
+    corpus = tmp_path / "messages.jsonl"
+    with open(corpus, "w", encoding="utf-8") as f:
+        for message, label in zip(messages, labels):
+            f.write(json.dumps({"content": message, "label": label_map[label]}) + "\n")
+    model_path = str(tmp_path / f"pipeline_{feature_mode}.pkl")
+    monkeypatch.setattr(sys, "argv", [
+        "train_pipeline.py", "message", str(corpus), "--model", model_path, "--feature-mode", feature_mode,
+        "--chunk-size", "7", "--workers", "2", "--sweep-workers", "1", "--validation-fraction", "0",
+        "--work-dir", str(tmp_path / "work")
+    ])
+    train_pipeline.main()
+    return model_path
+
+@pytest.mark.parametrize("feature_mode", ["tfidf", "hashing"])
+def test_pipeline_artifact_matches_in_memory_train(tmp_path, monkeypatch, message_corpus, feature_mode):
+    # Merge term runs two at a time so the vocabulary goes through several levels
+    monkeypatch.setattr(train_pipeline, "MERGE_FAN_IN", 2)
+    messages, labels = message_corpus
+    pipeline = MessageClassifier(run_pipeline(tmp_path, monkeypatch, messages, labels, feature_mode))
+    pipeline.load_model()
+
+    in_memory = MessageClassifier(str(tmp_path / f"memory_{feature_mode}.pkl"), feature_mode=feature_mode)
+    in_memory.train(messages, labels)
+
+    processed = [in_memory.preprocess(message) for message in messages]
+    if feature_mode == "tfidf":
+        assert (pipeline.model.named_steps['vectorizer'].vocabulary_
+                == in_memory.model.named_steps['vectorizer'].vocabulary_)
+    np.testing.assert_allclose(pipeline.model.predict_proba(processed),
+                               in_memory.model.predict_proba(processed), atol=1e-10)
+    assert list(pipeline.model.predict(processed)) == list(in_memory.model.predict(processed))
+    assert not (tmp_path / "work" / "term_runs").exists()
+
+def test_vocabulary_from_runs_matches_tfidf_vectorizer(tmp_path, monkeypatch, message_corpus):
+    monkeypatch.setattr(train_pipeline, "MERGE_FAN_IN", 3)
+    messages = message_corpus[0]
+    analyzer = TfidfVectorizer(ngram_range=(1, 2)).build_analyzer()
+    runs = TermRuns(str(tmp_path))
+    for start in range(0, len(messages), 5):
+        term_counts, document_counts = {}, {}
+        for message in messages[start:start + 5]:
+            terms = analyzer(message)
+            for term in terms:
+                term_counts[term] = term_counts.get(term, 0) + 1
+            for term in set(terms):
+                document_counts[term] = document_counts.get(term, 0) + 1
+        path = str(tmp_path / f"run_{start}.tsv")
+        write_term_run(path, ((term, term_counts[term], document_counts[term]) for term in sorted(term_counts)))
+        runs.add(path)
+    assert sum(len(level) for level in runs.levels) < 3 * len(runs.levels)
+
+    reference = TfidfVectorizer(ngram_range=(1, 2)).fit(messages)
+    vocabulary, idf = build_vocabulary(runs.counts(), len(messages), None)
+    assert vocabulary == reference.vocabulary_
+    np.testing.assert_allclose(idf, reference.idf_)
+
+def test_vocabulary_keeps_most_frequent_terms_and_earliest_ties():
+    counts = [("apple", 3, 2), ("bank", 5, 4), ("card", 3, 3), ("claim", 1, 1), ("prize", 3, 1)]
+    vocabulary, idf = build_vocabulary(iter(counts), 4, 3)
+    assert vocabulary == {"apple": 0, "bank": 1, "card": 2}
+    np.testing.assert_allclose(idf, np.log(5 / np.array([3, 5, 4])) + 1)
+    with pytest.raises(ValueError):
+        build_vocabulary(iter([]), 0, 3)
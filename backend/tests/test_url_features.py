@@ -0,0 +1,47 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.url_classifier import BATCH_CHUNK_SIZE, BATCH_MAX_URL_LENGTH, URLClassifier
+
+URLS = [
+    "http://example.com",
+    "https://secure-login.example.co.uk/verify?account=123&session=abc",
+    "http://192.168.0.1:8080/admin/login.php",
+    "http://user@evil.example.com:443/path_with_underscores%20and%20spaces",
+    "https://a.b.c.d.example.org/?a=1&b=2&c=3&d=4&e=5&f=6&g=7",
+    "http://xn--80ak6aa92e.com/ünïcödé/路径",
+    "",
+    "example.com",
+    "http://example.com\x00",
+    "http://example.com/path\x00\x00",
+    "http://example.com/?q=\x00",
+    "\x00",
+    "http://example.com/" + "a" * (BATCH_MAX_URL_LENGTH + 1),
+    "http://example.com/?x=" + "ab1-" * 50000,
+]
+
+@pytest.fixture(scope="module")
+def classifier():
+    return URLClassifier()
+
+def test_batch_features_match_single_extraction(classifier):
+    batch = classifier.extract_features_batch(URLS)
+    assert batch.shape == (len(URLS), len(classifier.get_feature_names()))
+    for url, row in zip(URLS, batch):
+        np.testing.assert_allclose(row, classifier.extract_features(url), err_msg=repr(url[:60]))
+
+def test_batch_features_across_chunks(classifier):
+    urls = [f"http://host{i}.example.com/{'x' * (i % 7)}?id={i}" for i in range(BATCH_CHUNK_SIZE + 3)]
+    urls[BATCH_CHUNK_SIZE] = "http://example.com/" + "b" * (BATCH_MAX_URL_LENGTH * 2)
+    batch = classifier.extract_features_batch(urls)
+    for i in (0, BATCH_CHUNK_SIZE - 1, BATCH_CHUNK_SIZE, len(urls) - 1):
+        np.testing.assert_allclose(batch[i], classifier.extract_features(urls[i]))
+
+def test_empty_batch(classifier):
+    assert classifier.extract_features_batch([]).shape == (0, len(classifier.get_feature_names()))
@@ -0,0 +1,674 @@
+#!/usr/bin/env python3
+"""
+Out-of-core training pipeline for the URL and message classifiers.
+
+Streams a labelled JSONL or CSV file in chunks, extracts features in a
+process pool into memory-mapped matrices under a work directory, trains
+one model per hyperparameter combination in parallel, and writes the one
+that scores best on a held-out split in the format load_model reads.
+The time spent in each stage is printed at the end.
+
+Message classifiers are trained with partial_fit over the stored rows, so
+only one block of features is in memory at a time. In TF-IDF mode each
+chunk's term counts are spilled to a sorted file and the files are merged
+as streams, so picking the vocabulary holds only max_features terms.
+URL forests are fitted directly on a float32 memory map of the scaled
+features.
+
+Examples:
+    python train_pipeline.py url labelled_urls.csv --workers 8 --sweep n_estimators=100,300 --sweep max_depth=none,30
+    python train_pipeline.py message labelled_messages.jsonl --feature-mode hashing --sweep alpha=0.01,0.1,1.0
+"""
+
+import argparse
+import heapq
+import itertools
+import json
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bulk_scan import read_records, read_chunks
+from models.message_classifier import MessageClassifier, FEATURE_MODES
+from models.url_classifier import URLClassifier, FEATURE_NAMES
+from models.registry import ModelRegistry
+
+MODEL_TYPES = ("message", "url")
+
+# Stored feature rows handed to a scaler or model at a time
+STREAM_ROWS = 50000
+
+# Sorted term-count files merged at once, so the open files stay bounded
+MERGE_FAN_IN = 64
+
+# Per-process state set up by the pool initializers
+_worker_state = {}
+
+class StageTimer:
+    """Wall-clock duration of each pipeline stage, in execution order."""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        print(f"[{name}] started", file=sys.stderr)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = time.perf_counter() - started
+            print(f"[{name}] done in {self.stages[name]:.1f}s", file=sys.stderr)
+
+class ArrayWriter:
+    """Append-only 2-D array in a raw file, read back with open_array as a memory map."""
+
+    def __init__(self, path: str, dtype: Any, width: int = 1):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.width = width
+        self.rows = 0
+        self._file = open(path, 'wb')
+
+    def append(self, block: np.ndarray):
+        block = np.ascontiguousarray(block, dtype=self.dtype).reshape(-1, self.width)
+        self._file.write(block.tobytes())
+        self.rows += len(block)
+
+    def close(self):
+        self._file.close()
+
+    def spec(self) -> Dict[str, Any]:
+        return {"path": self.path, "dtype": self.dtype.str, "width": self.width, "rows": self.rows}
+
+def open_array(spec: Dict[str, Any]) -> np.ndarray:
+    """Read-only memory map of an array written by ArrayWriter."""
+    if spec["rows"] == 0:
+        return np.empty((0, spec["width"]), dtype=spec["dtype"])
+    return np.memmap(spec["path"], dtype=spec["dtype"], mode='r', shape=(spec["rows"], spec["width"]))
+
+class SparseWriter:
+    """Append-only CSR matrix stored as data, column index and row length files."""
+
+    def __init__(self, prefix: str, n_features: int):
+        self.n_features = n_features
+        self.data = ArrayWriter(f"{prefix}.data", np.float64)
+        self.indices = ArrayWriter(f"{prefix}.indices", np.int32)
+        self.row_lengths = ArrayWriter(f"{prefix}.rows", np.int64)
+
+    def append(self, matrix: csr_matrix):
+        matrix = matrix.tocsr()
+        self.data.append(matrix.data)
+        self.indices.append(matrix.indices)
+        self.row_lengths.append(np.diff(matrix.indptr))
+
+    def close(self):
+        for writer in (self.data, self.indices, self.row_lengths):
+            writer.close()
+
+    def spec(self) -> Dict[str, Any]:
+        return {
+            "n_features": self.n_features,
+            "data": self.data.spec(),
+            "indices": self.indices.spec(),
+            "row_lengths": self.row_lengths.spec()
+        }
+
+def iter_sparse_blocks(spec: Dict[str, Any], block_rows: int = STREAM_ROWS) -> Iterator[Tuple[int, int, csr_matrix]]:
+    """Yield (start, stop, rows) blocks of a stored CSR matrix, loading one block at a time."""
+    data = open_array(spec["data"])[:, 0]
+    indices = open_array(spec["indices"])[:, 0]
+    indptr = np.concatenate([[0], np.cumsum(open_array(spec["row_lengths"])[:, 0])])
+    n_rows = len(indptr) - 1
+    for start in range(0, n_rows, block_rows):
+        stop = min(start + block_rows, n_rows)
+        low, high = indptr[start], indptr[stop]
+        yield start, stop, csr_matrix(
+            (np.array(data[low:high]), np.array(indices[low:high]), indptr[start:stop + 1] - low),
+            shape=(stop - start, spec["n_features"])
+        )
+
+def iter_dense_blocks(spec: Dict[str, Any], block_rows: int = STREAM_ROWS) -> Iterator[Tuple[int, int, np.ndarray]]:
+    """Yield (start, stop, rows) blocks of a stored dense matrix."""
+    matrix = open_array(spec)
+    for start in range(0, len(matrix), block_rows):
+        stop = min(start + block_rows, len(matrix))
+        yield start, stop, np.asarray(matrix[start:stop])
+
+def parse_sweep(items: List[str]) -> List[Dict[str, Any]]:
+    """Expand NAME=V1,V2 options into the list of parameter combinations."""
+    names, choices = [], []
+    for item in items:
+        name, _, values = item.partition("=")
+        if not values:
+            raise ValueError(f"Expected NAME=V1,V2,..., got: {item}")
+        names.append(name)
+        choices.append([_parse_value(value) for value in values.split(",")])
+    return [dict(zip(names, combination)) for combination in itertools.product(*choices)]
+
+def _parse_value(value: str) -> Any:
+    if value.lower() == "none":
+        return None
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+def label_ids_for(label_map: Dict[int, str]) -> Dict[str, int]:
+    """Accept labels by name or number, e.g. "scam" or "2"."""
+    label_ids = {}
+    for label, name in label_map.items():
+        label_ids[name] = label
+        label_ids[str(label)] = label
+    return label_ids
+
+def is_validation(content: str, fraction: float) -> bool:
+    """Hash-based split, so duplicates of a row always land on the same side."""
+    return zlib.crc32(content.encode("utf-8")) / 2 ** 32 < fraction
+
+def split_records(records: List[Dict[str, Any]], options: Dict[str, Any]):
+    """Parse labelled rows of a chunk into train and validation (contents, labels)."""
+    parts = {"train": ([], []), "validation": ([], [])}
+    skipped = 0
+    for record in records:
+        content = record.get(options["content_field"])
+        label = options["label_ids"].get(str(record.get(options["label_field"])).strip().lower())
+        if not isinstance(content, str) or label is None:
+            skipped += 1
+            continue
+        part = "validation" if is_validation(content, options["validation_fraction"]) else "train"
+        parts[part][0].append(content)
+        parts[part][1].append(label)
+    return parts, skipped
+
+def _ordered_results(pool: ProcessPoolExecutor, function, chunks, options: Dict[str, Any], max_in_flight: int):
+    """Run function on every chunk in the pool and yield the results in input order.
+
+    Only max_in_flight chunks are read ahead, so memory stays flat however
+    large the input is.
+    """
+    pending = deque()
+    for _, records in chunks:
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+        pending.append(pool.submit(function, records, options))
+    while pending:
+        yield pending.popleft().result()
+
+def _init_url_worker():
+    _worker_state["url"] = URLClassifier()
+
+def _extract_url_chunk(records: List[Dict[str, Any]], options: Dict[str, Any]):
+    parts, skipped = split_records(records, options)
+    extractor = _worker_state["url"]
+    features = {}
+    for part, (contents, labels) in parts.items():
+        X = extractor.extract_features_batch(contents) if contents else np.empty((0, len(FEATURE_NAMES)))
+        features[part] = (X, np.asarray(labels, dtype=np.int8))
+    return features, skipped
+
+def _init_message_worker(feature_mode: str, vectorizer: Any):
+    _worker_state["message"] = MessageClassifier(os.devnull, feature_mode=feature_mode)
+    _worker_state["vectorizer"] = vectorizer
+
+def _count_terms_chunk(records: List[Dict[str, Any]], options: Dict[str, Any]):
+    """Write the term and document counts of a chunk's training rows to a sorted run file."""
+    parts, skipped = split_records(records, options)
+    analyzer = _worker_state["vectorizer"].build_analyzer()
+    preprocess = _worker_state["message"].preprocess
+    contents, _ = parts["train"]
+    term_counts, document_counts = Counter(), Counter()
+    for content in contents:
+        terms = analyzer(preprocess(content))
+        term_counts.update(terms)
+        document_counts.update(set(terms))
+    fd, path = tempfile.mkstemp(prefix="terms-", suffix=".tsv", dir=options["runs_dir"])
+    os.close(fd)
+    write_term_run(path, ((term, term_counts[term], document_counts[term]) for term in sorted(term_counts)))
+    return path, len(contents), skipped
+
+def _vectorize_message_chunk(records: List[Dict[str, Any]], options: Dict[str, Any]):
+    parts, skipped = split_records(records, options)
+    vectorizer = _worker_state["vectorizer"]
+    preprocess = _worker_state["message"].preprocess
+    features = {}
+    for part, (contents, labels) in parts.items():
+        if contents:
+            X = vectorizer.transform([preprocess(content) for content in contents])
+        else:
+            X = csr_matrix((0, options["n_features"]))
+        features[part] = (X, np.asarray(labels, dtype=np.int8))
+    return features, skipped
+
+def write_term_run(path: str, counts: Iterator[Tuple[str, int, int]]):
+    """Write (term, term count, document count) rows, already sorted by term, to a run file."""
+    with open(path, 'w', encoding='utf-8') as f:
+        for term, term_count, document_count in counts:
+            f.write(f"{term}\t{term_count}\t{document_count}\n")
+
+def read_term_run(path: str) -> Iterator[Tuple[str, int, int]]:
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            term, term_count, document_count = line.rstrip('\n').split('\t')
+            yield term, int(term_count), int(document_count)
+
+def merge_term_runs(paths: List[str]) -> Iterator[Tuple[str, int, int]]:
+    """Stream the summed counts of several run files, one row per term in sorted order."""
+    current = None
+    for term, term_count, document_count in heapq.merge(*(read_term_run(path) for path in paths)):
+        if current is not None and current[0] == term:
+            current[1] += term_count
+            current[2] += document_count
+            continue
+        if current is not None:
+            yield tuple(current)
+        current = [term, term_count, document_count]
+    if current is not None:
+        yield tuple(current)
+
+class TermRuns:
+    """Sorted term-count files on disk, merged MERGE_FAN_IN at a time as they arrive.
+
+    Runs are kept in levels like an LSM tree: once a level holds MERGE_FAN_IN
+    files they are merged into one file on the next level, so each count is
+    rewritten only a logarithmic number of times and few files stay open.
+    """
+
+    def __init__(self, runs_dir: str):
+        self.runs_dir = runs_dir
+        self.levels: List[List[str]] = []
+
+    def add(self, path: str, level: int = 0):
+        while len(self.levels) <= level:
+            self.levels.append([])
+        self.levels[level].append(path)
+        if len(self.levels[level]) >= MERGE_FAN_IN:
+            paths, self.levels[level] = self.levels[level], []
+            fd, merged = tempfile.mkstemp(prefix="terms-", suffix=".tsv", dir=self.runs_dir)
+            os.close(fd)
+            write_term_run(merged, merge_term_runs(paths))
+            for path in paths:
+                os.remove(path)
+            self.add(merged, level + 1)
+
+    def counts(self) -> Iterator[Tuple[str, int, int]]:
+        return merge_term_runs([path for level in self.levels for path in level])
+
+def build_vocabulary(counts: Iterator[Tuple[str, int, int]], n_documents: int, max_features: int):
+    """Vocabulary and smoothed IDF weights as TfidfVectorizer.fit picks them.
+
+    counts is a stream of (term, term count, document count) rows sorted by
+    term; only the max_features most frequent terms are held at a time.
+    Terms tied on frequency at the cutoff are kept in sorted order, where
+    TfidfVectorizer's unstable argsort may keep a different one of them.
+    """
+    kept = []
+    for index, (term, term_count, document_count) in enumerate(counts):
+        # Ties with the least frequent kept term lose to it, as it sorts first
+        entry = (term_count, -index, term, document_count)
+        if max_features is None or len(kept) < max_features:
+            heapq.heappush(kept, entry)
+        elif term_count > kept[0][0]:
+            heapq.heapreplace(kept, entry)
+    if not kept:
+        raise ValueError("No terms found in the training messages")
+    kept.sort(key=lambda entry: entry[2])
+    terms = [entry[2] for entry in kept]
+    document_frequencies = np.array([entry[3] for entry in kept], dtype=np.float64)
+    idf = np.log((1 + n_documents) / (1 + document_frequencies)) + 1
+    return {term: index for index, term in enumerate(terms)}, idf
+
+def _score(y_true: np.ndarray, y_pred: np.ndarray) -> Dict[str, float]:
+    return {
+        "accuracy": float(accuracy_score(y_true, y_pred)),
+        "f1_macro": float(f1_score(y_true, y_pred, average="macro"))
+    }
+
+def _fit_url_candidate(candidate: Dict[str, Any]) -> Dict[str, Any]:
+    """Fit one forest on the stored features and score it on the validation split."""
+    from sklearn.ensemble import RandomForestClassifier
+
+    stores = candidate["stores"]
+    params = {"n_estimators": 100, "random_state": 42, **candidate["params"]}
+    model = RandomForestClassifier(**params)
+    model.n_jobs = candidate["n_jobs"]
+    started = time.perf_counter()
+    model.fit(open_array(stores["train_features"]), np.asarray(open_array(stores["train_labels"])[:, 0]))
+    fit_seconds = time.perf_counter() - started
+    # Served models predict one request at a time; keep the default of no worker pool
+    model.n_jobs = None
+
+    metrics = None
+    if stores["validation_labels"]["rows"]:
+        predictions = [model.predict(block) for _, _, block in iter_dense_blocks(stores["validation_features"])]
+        metrics = _score(open_array(stores["validation_labels"])[:, 0], np.concatenate(predictions))
+    return _save_candidate(candidate, model, fit_seconds, metrics)
+
+def _fit_message_candidate(candidate: Dict[str, Any]) -> Dict[str, Any]:
+    """Stream the stored rows through partial_fit and score on the validation split."""
+    from sklearn.naive_bayes import MultinomialNB
+
+    stores = candidate["stores"]
+    idf = candidate["idf"]
+    classifier = MultinomialNB(**candidate["params"])
+    labels = open_array(stores["train_labels"])[:, 0]
+    started = time.perf_counter()
+    for start, stop, block in iter_sparse_blocks(stores["train_features"]):
+        classifier.partial_fit(idf.transform(block) if idf is not None else block,
+                               labels[start:stop], classes=candidate["classes"])
+    fit_seconds = time.perf_counter() - started
+
+    metrics = None
+    if stores["validation_labels"]["rows"]:
+        predictions = [
+            classifier.predict(idf.transform(block) if idf is not None else block)
+            for _, _, block in iter_sparse_blocks(stores["validation_features"])
+        ]
+        metrics = _score(open_array(stores["validation_labels"])[:, 0], np.concatenate(predictions))
+    return _save_candidate(candidate, classifier, fit_seconds, metrics)
+
+def _save_candidate(candidate: Dict[str, Any], estimator: Any, fit_seconds: float, metrics: Dict[str, float]) -> Dict[str, Any]:
+    path = os.path.join(candidate["work_dir"], f"candidate_{candidate['id']}.pkl")
+    with open(path, 'wb') as f:
+        pickle.dump(estimator, f)
+    return {"id": candidate["id"], "params": candidate["params"], "path": path,
+            "fit_seconds": fit_seconds, "metrics": metrics}
+
+def run_sweep(fit, candidates: List[Dict[str, Any]], workers: int) -> List[Dict[str, Any]]:
+    """Fit every candidate, in parallel processes when there is more than one."""
+    if workers <= 1 or len(candidates) == 1:
+        results = [fit(candidate) for candidate in candidates]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(fit, candidates))
+    for result in results:
+        metrics = result["metrics"] or {}
+        print(f"  {result['params']}: fit {result['fit_seconds']:.1f}s, "
+              f"accuracy {metrics.get('accuracy', float('nan')):.4f}, f1_macro {metrics.get('f1_macro', float('nan')):.4f}",
+              file=sys.stderr)
+    return results
+
+def _best(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    scored = [result for result in results if result["metrics"]]
+    if not scored:
+        return results[0]
+    return max(scored, key=lambda result: result["metrics"]["f1_macro"])
+
+def _write_atomically(raw: bytes, path: str):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(raw)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def _open_writers(work_dir: str, make_writer) -> Dict[str, Any]:
+    return {part: (make_writer(os.path.join(work_dir, f"{part}_features")),
+                   ArrayWriter(os.path.join(work_dir, f"{part}_labels"), np.int8))
+            for part in ("train", "validation")}
+
+def _append_parts(writers: Dict[str, Any], features: Dict[str, Any]):
+    for part, (X, labels) in features.items():
+        writers[part][0].append(X)
+        writers[part][1].append(labels)
+
+def _close_writers(writers: Dict[str, Any]) -> Dict[str, Any]:
+    stores = {}
+    for part, (feature_writer, label_writer) in writers.items():
+        feature_writer.close()
+        label_writer.close()
+        stores[f"{part}_features"] = feature_writer.spec()
+        stores[f"{part}_labels"] = label_writer.spec()
+    return stores
+
+def train_urls(args, options: Dict[str, Any], timer: StageTimer) -> Dict[str, Any]:
+    work_dir = args.work_dir
+    skipped = 0
+    with timer.stage("extract features"):
+        writers = _open_writers(work_dir, lambda path: ArrayWriter(path, np.float64, len(FEATURE_NAMES)))
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_url_worker) as pool:
+            for features, chunk_skipped in _ordered_results(pool, _extract_url_chunk, _chunks(args), options, args.workers * 2):
+                _append_parts(writers, features)
+                skipped += chunk_skipped
+        raw_stores = _close_writers(writers)
+    _check_training_rows(raw_stores, skipped)
+
+    # The forest is fitted on scaled float32 rows, the dtype its trees compare in anyway
+    with timer.stage("scale features"):
+        scaler = StandardScaler()
+        for _, _, block in iter_dense_blocks(raw_stores["train_features"]):
+            scaler.partial_fit(block)
+        stores = dict(raw_stores)
+        for part in ("train", "validation"):
+            writer = ArrayWriter(os.path.join(work_dir, f"{part}_scaled"), np.float32, len(FEATURE_NAMES))
+            for _, _, block in iter_dense_blocks(raw_stores[f"{part}_features"]):
+                writer.append(scaler.transform(block))
+            writer.close()
+            stores[f"{part}_features"] = writer.spec()
+
+    sweep_workers = _sweep_workers(args)
+    candidates = [
+        {"id": i, "params": params, "stores": stores, "work_dir": work_dir,
+         "n_jobs": max(1, (os.cpu_count() or 1) // sweep_workers)}
+        for i, params in enumerate(args.candidates)
+    ]
+    with timer.stage("hyperparameter sweep"):
+        results = run_sweep(_fit_url_candidate, candidates, sweep_workers)
+        best = _best(results)
+
+    with timer.stage("write model"):
+        with open(best["path"], 'rb') as f:
+            model = pickle.load(f)
+        _write_atomically(pickle.dumps({'model': model, 'scaler': scaler}), args.model)
+        url_model = URLClassifier(args.model)
+        url_model.load_model()
+
+    return _summary(url_model.model_version, stores, skipped, best, results)
+
+def train_messages(args, options: Dict[str, Any], timer: StageTimer) -> Dict[str, Any]:
+    work_dir = args.work_dir
+    message_model = MessageClassifier(args.model, feature_mode=args.feature_mode)
+    vectorizer = message_model.model.named_steps['vectorizer']
+    idf_transformer = None
+    skipped = 0
+
+    if args.feature_mode == "tfidf":
+        # The vocabulary needs corpus-wide counts, collected in parallel per chunk and merged on disk
+        with timer.stage("build vocabulary"):
+            runs_dir = os.path.join(work_dir, "term_runs")
+            os.makedirs(runs_dir, exist_ok=True)
+            runs, n_documents = TermRuns(runs_dir), 0
+            with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_message_worker,
+                                     initargs=(args.feature_mode, vectorizer)) as pool:
+                for path, chunk_rows, _ in _ordered_results(
+                        pool, _count_terms_chunk, _chunks(args), dict(options, runs_dir=runs_dir), args.workers * 2):
+                    runs.add(path)
+                    n_documents += chunk_rows
+            vocabulary, idf = build_vocabulary(runs.counts(), n_documents, vectorizer.max_features)
+            shutil.rmtree(runs_dir, ignore_errors=True)
+            vectorizer.set_params(vocabulary=vocabulary)
+            vectorizer.idf_ = idf
+        row_vectorizer = vectorizer
+        n_features = len(vocabulary)
+    else:
+        # Hashing is stateless; IDF weights are computed from the stored counts afterwards
+        row_vectorizer = vectorizer.named_steps['hashing'] if isinstance(vectorizer, Pipeline) else vectorizer
+        n_features = row_vectorizer.n_features
+        if isinstance(vectorizer, Pipeline):
+            idf_transformer = vectorizer.named_steps['idf']
+
+    options = dict(options, n_features=n_features)
+    with timer.stage("vectorize messages"):
+        writers = _open_writers(work_dir, lambda path: SparseWriter(path, n_features))
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_message_worker,
+                                 initargs=(args.feature_mode, row_vectorizer)) as pool:
+            for features, chunk_skipped in _ordered_results(pool, _vectorize_message_chunk, _chunks(args), options, args.workers * 2):
+                _append_parts(writers, features)
+                skipped += chunk_skipped
+        stores = _close_writers(writers)
+    _check_training_rows(stores, skipped)
+
+    if idf_transformer is not None:
+        with timer.stage("fit idf"):
+            document_frequencies = np.zeros(n_features, dtype=np.int64)
+            for _, _, block in iter_sparse_blocks(stores["train_features"]):
+                document_frequencies += np.bincount(block.indices, minlength=n_features)
+            n_documents = stores["train_labels"]["rows"]
+            idf_transformer.idf_ = np.log((1 + n_documents) / (1 + document_frequencies)) + 1
+
+    classes = np.unique(open_array(stores["train_labels"])[:, 0])
+    candidates = [
+        {"id": i, "params": params, "stores": stores, "work_dir": work_dir,
+         "idf": idf_transformer, "classes": classes}
+        for i, params in enumerate(args.candidates)
+    ]
+    with timer.stage("hyperparameter sweep"):
+        results = run_sweep(_fit_message_candidate, candidates, _sweep_workers(args))
+        best = _best(results)
+
+    with timer.stage("write model"):
+        with open(best["path"], 'rb') as f:
+            classifier = pickle.load(f)
+        message_model.model = Pipeline([('vectorizer', vectorizer), ('classifier', classifier)])
+        message_model.feedback_watermark = 0
+        message_model.bucket_names = None
+        if args.feature_mode == "hashing":
+            message_model.bucket_names = message_model._build_bucket_names(
+                message_model.preprocess(content) for content in _training_contents(args, options)
+            )
+        message_model.save_model()
+        loaded = MessageClassifier(args.model)
+        loaded.load_model()
+
+    return _summary(loaded.model_version, stores, skipped, best, results)
+
+def _chunks(args):
+    return read_chunks(read_records(args.input, args.format), args.chunk_size)
+
+def _training_contents(args, options: Dict[str, Any]) -> Iterator[str]:
+    """Stream the training-split contents of the input again, in file order."""
+    for _, records in _chunks(args):
+        parts, _ = split_records(records, options)
+        yield from parts["train"][0]
+
+def _sweep_workers(args) -> int:
+    return max(1, min(args.sweep_workers, len(args.candidates)))
+
+def _check_training_rows(stores: Dict[str, Any], skipped: int):
+    if skipped:
+        print(f"Skipped {skipped} rows without content or with an unknown label", file=sys.stderr)
+    if not stores["train_labels"]["rows"]:
+        raise SystemExit("No labelled training rows found")
+
+def _summary(model_version: str, stores: Dict[str, Any], skipped: int, best: Dict[str, Any],
+             results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "model_version": model_version,
+        "training_samples": stores["train_labels"]["rows"],
+        "validation_samples": stores["validation_labels"]["rows"],
+        "skipped_rows": skipped,
+        "params": best["params"],
+        "metrics": best["metrics"],
+        "sweep": [{key: result[key] for key in ("params", "fit_seconds", "metrics")} for result in results]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Train a classifier from a labelled file too large for memory.")
+    parser.add_argument("model_type", choices=MODEL_TYPES)
+    parser.add_argument("input", help="Labelled JSONL or CSV file")
+    parser.add_argument("--model", default=None, help="Output model file (default: MESSAGE_MODEL_PATH / URL_MODEL_PATH)")
+    parser.add_argument("--format", choices=["auto", "jsonl", "csv"], default="auto", help="Input format (default: by extension)")
+    parser.add_argument("--content-field", default="content", help="Field holding the message or URL")
+    parser.add_argument("--label-field", default="label", help="Field holding the label name or number")
+    parser.add_argument("--feature-mode", choices=FEATURE_MODES, default=os.getenv("MESSAGE_FEATURE_MODE", "tfidf"),
+                        help="Message feature mode")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Records per worker task")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Feature extraction processes")
+    parser.add_argument("--sweep", action="append", default=[], metavar="NAME=V1,V2",
+                        help="Classifier parameter values to try; may be repeated (grid)")
+    parser.add_argument("--sweep-workers", type=int, default=os.cpu_count() or 1, help="Models fitted in parallel")
+    parser.add_argument("--validation-fraction", type=float, default=0.1, help="Share of rows held out for scoring")
+    parser.add_argument("--work-dir", default=None, help="Directory for the feature matrices (default: a temporary one next to the model)")
+    parser.add_argument("--keep-work-dir", action="store_true", help="Keep the default work directory after training")
+    parser.add_argument("--report", default=None, help="Also write the timings and sweep results to this JSON file")
+    parser.add_argument("--publish", action="store_true", help="Publish and activate the model in the model registry")
+    parser.add_argument("--registry", default=os.getenv("MODEL_REGISTRY_DIR", "models/registry"))
+    args = parser.parse_args()
+
+    if args.model is None:
+        args.model = (os.getenv("MESSAGE_MODEL_PATH", "models/message_model.pkl") if args.model_type == "message"
+                      else os.getenv("URL_MODEL_PATH", "models/url_model.pkl"))
+    if args.format == "auto":
+        args.format = "csv" if args.input.lower().endswith(".csv") else "jsonl"
+    try:
+        args.candidates = parse_sweep(args.sweep)
+    except ValueError as e:
+        parser.error(str(e))
+    if len(args.candidates) > 1 and args.validation_fraction <= 0:
+        parser.error("--sweep needs a validation split (--validation-fraction > 0)")
+
+    created_work_dir = args.work_dir is None
+    if created_work_dir:
+        args.work_dir = tempfile.mkdtemp(prefix="train-", dir=os.path.dirname(os.path.abspath(args.model)))
+    else:
+        os.makedirs(args.work_dir, exist_ok=True)
+
+    label_map = URLClassifier().label_map if args.model_type == "url" else MessageClassifier(os.devnull).label_map
+    options = {
+        "content_field": args.content_field,
+        "label_field": args.label_field,
+        "label_ids": label_ids_for(label_map),
+        "validation_fraction": args.validation_fraction
+    }
+
+    timer = StageTimer()
+    started = time.perf_counter()
+    try:
+        train = train_urls if args.model_type == "url" else train_messages
+        summary = train(args, options, timer)
+    finally:
+        if created_work_dir and not args.keep_work_dir:
+            shutil.rmtree(args.work_dir, ignore_errors=True)
+    summary["stage_seconds"] = timer.stages
+    summary["total_seconds"] = time.perf_counter() - started
+
+    print(f"Wrote {args.model} (version {summary['model_version']}) with {summary['params'] or 'default parameters'}: "
+          f"{summary['training_samples']} training rows, validation metrics {summary['metrics']}")
+    for name, seconds in timer.stages.items():
+        print(f"  {name}: {seconds:.1f}s")
+    print(f"  total: {summary['total_seconds']:.1f}s")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(summary, f, indent=2, default=float)
+
+    if args.publish:
+        version = ModelRegistry(args.registry).publish(args.model_type, args.model, {
+            "source": "train_pipeline",
+            "training_samples": summary["training_samples"],
+            "metrics": summary["metrics"] or {},
+            "params": summary["params"]
+        })
+        print(f"Published {args.model_type} model version {version}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+import asyncpg
+
+from utils.database import (
+    DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD,
+    DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT_SECONDS, DB_POOL_CHECK_IDLE_SECONDS,
+    DB_CONNECT_TIMEOUT_SECONDS, DB_STATEMENT_TIMEOUT_MS, content_hash, prepare_scan_row
+)
+from utils.db_pool import AsyncConnectionPool
+
+# Data access for the async route handlers. Queries run on asyncpg
+# connections from a pool bound to the serving event loop, so a slow query
+# suspends only the request waiting for it. The synchronous helpers in
+# utils.database remain for scripts and startup.
+
+_pool = None
+_pool_loop = None
+
+async def _connect():
+    """Open a new asyncpg connection with the statement timeout and JSON codecs applied."""
+    conn = await asyncpg.connect(
+        host=DB_HOST,
+        port=int(DB_PORT),
+        database=DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        timeout=DB_CONNECT_TIMEOUT_SECONDS,
+        server_settings={"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+    )
+    # Return JSON columns as Python objects, as RealDictCursor does. The
+    # binary format also lets COPY write them; jsonb prefixes a version byte.
+    await conn.set_type_codec("json", encoder=_encode_json, decoder=_decode_json,
+                              schema="pg_catalog", format="binary")
+    await conn.set_type_codec("jsonb", encoder=lambda value: b"\x01" + _encode_json(value),
+                              decoder=lambda data: _decode_json(data[1:]), schema="pg_catalog", format="binary")
+    return conn
+
+def _encode_json(value) -> bytes:
+    return json.dumps(value).encode()
+
+def _decode_json(data: bytes):
+    return json.loads(data.decode())
+
+async def get_async_pool() -> AsyncConnectionPool:
+    """The connection pool of the running event loop, created on first use."""
+    global _pool, _pool_loop
+    loop = asyncio.get_running_loop()
+    if _pool is None or _pool_loop is not loop:
+        pool = AsyncConnectionPool(
+            _connect,
+            min_size=DB_POOL_MIN_SIZE,
+            max_size=DB_POOL_MAX_SIZE,
+            timeout=DB_POOL_TIMEOUT_SECONDS,
+            check_idle_seconds=DB_POOL_CHECK_IDLE_SECONDS
+        )
+        _pool, _pool_loop = pool, loop
+        await pool.fill()
+    return _pool
+
+@asynccontextmanager
+async def async_db_connection():
+    """Borrow a pooled asyncpg connection for the block and give it back afterwards.
+
+    Yields None if no connection could be obtained. A transaction the block
+    leaves open is rolled back when the connection is returned.
+    """
+    pool = await get_async_pool()
+    try:
+        conn = await pool.acquire()
+    except Exception as e:
+        print(f"Error connecting to database: {e}")
+        yield None
+        return
+    try:
+        yield conn
+    finally:
+        await pool.release(conn)
+
+def async_pool_stats() -> Optional[Dict[str, Any]]:
+    """Utilization and wait counters of the async pool, if it was created."""
+    return _pool.stats() if _pool is not None else None
+
+async def close_async_pool():
+    """Close the pooled connections, e.g. on shutdown."""
+    global _pool
+    if _pool is not None and _pool_loop is asyncio.get_running_loop():
+        await _pool.close()
+    _pool = None
+
+async def user_exists(username: str, email: str) -> Optional[bool]:
+    """Whether a user has this username or email; None on errors."""
+    async with async_db_connection() as conn:
+        if conn is None:
+            return None
+        try:
+            return await conn.fetchval(
+                "SELECT EXISTS (SELECT 1 FROM users WHERE username = $1 OR email = $2)", username, email
+            )
+        except Exception as e:
+            print(f"Error checking user: {e}")
+            return None
+
+async def create_user(username: str, email: str, password_hash: str) -> Optional[dict]:
+    """Insert a user and return its id, username, email and created_at; None on errors."""
+    async with async_db_connection() as conn:
+        if conn is None:
+            return None
+        try:
+            row = await conn.fetchrow("""
+                INSERT INTO users (username, email, password_hash)
+                VALUES ($1, $2, $3)
+                RETURNING id, username, email, created_at
+            """, username, email, password_hash)
+            return dict(row)
+        except Exception as e:
+            print(f"Error creating user: {e}")
+            return None
+
+async def get_user_by_username(username: str) -> Optional[dict]:
+    """Get id, username, email and password_hash of a user, or None."""
+    async with async_db_connection() as conn:
+        if conn is None:
+            return None
+        try:
+            row = await conn.fetchrow(
+                "SELECT id, username, email, password_hash FROM users WHERE username = $1", username
+            )
+            return dict(row) if row else None
+        except Exception as e:
+            print(f"Error getting user: {e}")
+            return None
+
+async def save_scan_result(user_id: int, scan_type: str, content: str, result: dict, privacy_mode: bool = False):
+    """Save scan result with privacy-preserving options."""
+    async with async_db_connection() as conn:
+        if conn is None:
+            return None
+        try:
+            return await conn.fetchval("""
+                INSERT INTO scan_history
+                (user_id, scan_type, content_hash, content_preview, result, is_anonymized)
+                VALUES ($1, $2, $3, $4, $5, $6)
+                RETURNING id
+            """, *prepare_scan_row(user_id, scan_type, content, result, privacy_mode))
+        except Exception as e:
+            print(f"Error saving scan result: {e}")
+            return None
+
+async def save_scan_results(user_id: int, scans: List[Tuple[str, str, dict]], privacy_mode: bool = False) -> List[Optional[int]]:
+    """Save several (scan_type, content, result) scans with one multi-row insert.
+
+    Returns the new scan IDs in the same order as scans, or None for every
+    scan if the insert failed.
+    """
+    if not scans:
+        return []
+
+    async with async_db_connection() as conn:
+        if conn is None:
+            return [None] * len(scans)
+        try:
+            rows = [prepare_scan_row(user_id, scan_type, content, result, privacy_mode)
+                    for scan_type, content, result in scans]
+            columns = [list(column) for column in zip(*rows)]
+            # Results travel as text and are cast in SQL, one array per column
+            columns[4] = [json.dumps(result) for result in columns[4]]
+            inserted = await conn.fetch("""
+                INSERT INTO scan_history
+                (user_id, scan_type, content_hash, content_preview, result, is_anonymized)
+                SELECT user_id, scan_type, content_hash, content_preview, result::jsonb, is_anonymized
+                FROM unnest($1::integer[], $2::varchar[], $3::varchar[], $4::text[], $5::text[], $6::boolean[])
+                    AS rows (user_id, scan_type, content_hash, content_preview, result, is_anonymized)
+                RETURNING id
+            """, *columns)
+            return [row['id'] for row in inserted]
+        except Exception as e:
+            print(f"Error saving scan results: {e}")
+            return [None] * len(scans)
+
+async def get_recent_verdicts(scan_type: str, content_hashes: List[str], model_version: str,
+                              max_age_seconds: float) -> Optional[Dict[str, dict]]:
+    """Get the newest stored result per content hash from one model version.
+
+    Only scans younger than max_age_seconds are considered. Returns a dict
+    of content_hash -> result for the hashes found, or None on errors.
+    """
+    if not content_hashes:
+        return {}
+
+    async with async_db_connection() as conn:
+        if conn is None:
+            return None
+        try:
+            rows = await conn.fetch("""
+                SELECT DISTINCT ON (content_hash) content_hash, result
+                FROM scan_history
+                WHERE scan_type = $1
+                  AND content_hash = ANY($2::varchar[])
+                  AND result->>'model_version' = $3
+                  AND timestamp >= CURRENT_TIMESTAMP - $4::float8 * INTERVAL '1 second'
+                ORDER BY content_hash, timestamp DESC
+            """, scan_type, content_hashes, model_version, float(max_age_seconds))
+            return {row['content_hash']: row['result'] for row in rows}
+        except Exception as e:
+            print(f"Error getting stored verdicts: {e}")
+            return None
+
+async def get_scan_history(user_id: int, limit: int = 50) -> Optional[List[dict]]:
+    """Get a user's most recent scans, newest first; None on errors."""
+    async with async_db_connection() as conn:
+        if conn is None:
+            return None
+        try:
+            rows = await conn.fetch("""
+                SELECT id, user_id, scan_type, content_preview, result, timestamp
+                FROM scan_history
+                WHERE user_id = $1
+                ORDER BY timestamp DESC
+                LIMIT $2
+            """, user_id, limit)
+            return [dict(row) for row in rows]
+        except Exception as e:
+            print(f"Error getting scan history: {e}")
+            return None
+
+async def get_user_scan_results(user_id: int) -> Optional[List[dict]]:
+    """Get scan_type, result and timestamp of all of a user's scans, newest first."""
+    async with async_db_connection() as conn:
+        if conn is None:
+            return None
+        try:
+            rows = await conn.fetch("""
+                SELECT scan_type, result, timestamp
+                FROM scan_history
+                WHERE user_id = $1
+                ORDER BY timestamp DESC
+            """, user_id)
+            return [dict(row) for row in rows]
+        except Exception as e:
+            print(f"Error getting scan results: {e}")
+            return None
+
+async def count_user_scans(user_id: int, scan_type: str) -> Optional[int]:
+    """Count a user's scans of one type; None on errors."""
+    async with async_db_connection() as conn:
+        if conn is None:
+            return None
+        try:
+            return await conn.fetchval(
+                "SELECT COUNT(*) FROM scan_history WHERE user_id = $1 AND scan_type = $2", user_id, scan_type
+            )
+        except Exception as e:
+            print(f"Error counting scans: {e}")
+            return None
+
+async def save_feedback(user_id: Optional[int], scan_id: int, is_correct: bool, comment: Optional[str],
+                        content: Optional[str] = None, correct_label: Optional[str] = None) -> Optional[int]:
+    """Insert feedback on a scan and return its id; None on errors.
+    
+    content is stored only for message scans whose content hash it matches,
+    so the online learner sees the full text that was scored.
+    """
+    async with async_db_connection() as conn:
+        if conn is None:
+            return None
+        try:
+            return await conn.fetchval("""
+                INSERT INTO feedback (user_id, scan_id, is_correct, comment, content, correct_label)
+                VALUES ($1, $2, $3, $4, (
+                    SELECT $5::text FROM scan_history
+                    WHERE id = $2 AND scan_type = 'message' AND content_hash = $6
+                ), $7)
+                RETURNING id
+            """, user_id, scan_id, is_correct, comment, content,
+                content_hash(content) if content is not None else None, correct_label)
+        except Exception as e:
+            print(f"Error saving feedback: {e}")
+            return None
+
+async def get_user_privacy_settings(user_id: int):
+    """Get user privacy settings."""
+    async with async_db_connection() as conn:
+        if conn is None:
+            return None
+        try:
+            row = await conn.fetchrow("""
+                SELECT store_raw_content, share_anonymous_data, auto_delete_after_days
+                FROM privacy_settings
+                WHERE user_id = $1
+            """, user_id)
+            if row:
+                return dict(row)
+            # Return default settings
+            return {
+                "store_raw_content": False,
+                "share_anonymous_data": True,
+                "auto_delete_after_days": 365
+            }
+        except Exception as e:
+            print(f"Error getting privacy settings: {e}")
+            return None
+
+async def update_user_privacy_settings(user_id: int, settings: dict):
+    """Update user privacy settings."""
+    async with async_db_connection() as conn:
+        if conn is None:
+            return False
+        try:
+            values = (settings.get('store_raw_content', False),
+                      settings.get('share_anonymous_data', True),
+                      settings.get('auto_delete_after_days', 365))
+            async with conn.transaction():
+                updated = await conn.execute("""
+                    UPDATE privacy_settings
+                    SET store_raw_content = $2, share_anonymous_data = $3, auto_delete_after_days = $4, updated_at = NOW()
+                    WHERE user_id = $1
+                """, user_id, *values)
+                if updated == "UPDATE 0":
+                    await conn.execute("""
+                        INSERT INTO privacy_settings
+                        (user_id, store_raw_content, share_anonymous_data, auto_delete_after_days)
+                        VALUES ($1, $2, $3, $4)
+                    """, user_id, *values)
+            return True
+        except Exception as e:
+            print(f"Error updating privacy settings: {e}")
+            return False
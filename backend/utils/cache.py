@@ -0,0 +1,145 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+def canonicalize_url(url: str) -> str:
+    """Normalize a URL so trivially different spellings share a cache key.
+    
+    Lowercases the scheme and host, drops default ports, trailing host dots
+    and fragments, and gives an empty path a single slash.
+    """
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+        host = (parts.hostname or "").rstrip(".")
+        port = parts.port
+    except ValueError:
+        return url
+    
+    if not host:
+        return url
+    
+    scheme = parts.scheme.lower()
+    netloc = host
+    if parts.username or parts.password:
+        userinfo = parts.username or ""
+        if parts.password:
+            userinfo += ":" + parts.password
+        netloc = f"{userinfo}@{netloc}"
+    if port is not None and DEFAULT_PORTS.get(scheme) != port:
+        netloc = f"{netloc}:{port}"
+    
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+class VerdictCache:
+    """Thread-safe LRU cache with per-entry TTL and an approximate memory cap.
+    
+    The cache is bound to a single model version: looking up or storing
+    with a different version clears every entry first, so verdicts from a
+    previously loaded model are never served.
+    """
+    
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 3600, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.model_version = None
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+    
+    def get(self, key: str, model_version: str) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss."""
+        with self._lock:
+            self._bind_version(model_version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            expires_at, size, value = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def set(self, key: str, value: Any, model_version: str):
+        """Store value under key, evicting least recently used entries as needed."""
+        size = self._estimate_size(key, value)
+        if size > self.max_bytes:
+            return
+        
+        with self._lock:
+            self._bind_version(model_version)
+            if key in self._entries:
+                self._remove(key)
+            
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, size, value)
+            self._bytes += size
+            
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+    
+    def clear(self):
+        """Drop every cached entry."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.invalidations += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return size and hit/miss/eviction counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "model_version": self.model_version,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
+    
+    def _bind_version(self, model_version: str):
+        """Clear the cache when a different model version starts using it."""
+        if model_version != self.model_version:
+            if self._entries:
+                self._entries.clear()
+                self._bytes = 0
+                self.invalidations += 1
+            self.model_version = model_version
+    
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+    
+    @staticmethod
+    def _estimate_size(key: str, value: Any) -> int:
+        """Approximate the memory held by an entry from its serialized size."""
+        try:
+            return len(key) + len(json.dumps(value, default=str))
+        except (TypeError, ValueError):
+            return len(key) + len(repr(value))
@@ -1,8 +1,12 @@
 import psycopg2
 from psycopg2.extras import RealDictCursor
+import hashlib
 import os
-from typing import Optional
+import threading
+from contextlib import contextmanager
+from typing import List, Optional
 from dotenv import load_dotenv
+from utils.db_pool import ConnectionPool
 
 # Load environment variables from .env file
 load_dotenv()
@@ -14,213 +18,217 @@ DB_NAME = os.getenv("DB_NAME", "safety_assistant")
 DB_USER = os.getenv("DB_USER", "postgres")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "password")
 
-def get_db_connection():
-    """Create and return a database connection."""
+# Connection pool of each worker process
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "5"))
+DB_POOL_CHECK_IDLE_SECONDS = float(os.getenv("DB_POOL_CHECK_IDLE_SECONDS", "30"))
+DB_CONNECT_TIMEOUT_SECONDS = int(os.getenv("DB_CONNECT_TIMEOUT_SECONDS", "5"))
+# Queries running longer than this are cancelled by the server (0 = no limit)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "5000"))
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def _connect():
+    """Open a new database connection with the statement timeout applied."""
+    return psycopg2.connect(
+        host=DB_HOST,
+        port=DB_PORT,
+        database=DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        cursor_factory=RealDictCursor,
+        connect_timeout=DB_CONNECT_TIMEOUT_SECONDS,
+        options=f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+    )
+
+def get_pool() -> ConnectionPool:
+    """The connection pool of this process, created on first use.
+    
+    A forked child (e.g. a bulk_scan worker) gets its own pool rather than
+    sharing the parent's sockets.
+    """
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                pool = ConnectionPool(
+                    _connect,
+                    min_size=DB_POOL_MIN_SIZE,
+                    max_size=DB_POOL_MAX_SIZE,
+                    timeout=DB_POOL_TIMEOUT_SECONDS,
+                    check_idle_seconds=DB_POOL_CHECK_IDLE_SECONDS
+                )
+                pool.fill()
+                _pool, _pool_pid = pool, os.getpid()
+    return _pool
+
+@contextmanager
+def db_connection():
+    """Borrow a pooled connection for the block and give it back afterwards.
+    
+    Yields None if no connection could be obtained. A transaction the block
+    leaves open is rolled back when the connection is returned.
+    """
+    pool = get_pool()
     try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            cursor_factory=RealDictCursor
-        )
-        return conn
+        conn = pool.acquire()
     except Exception as e:
         print(f"Error connecting to database: {e}")
-        return None
+        yield None
+        return
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+def close_pool():
+    """Close the pooled connections, e.g. on shutdown."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.close()
+        _pool = None
 
 def init_db():
     """Initialize database tables."""
-    conn = get_db_connection()
-    if conn is None:
-        return False
-    
-    try:
-        cursor = conn.cursor()
+    with db_connection() as conn:
+        if conn is None:
+            return False
         
-        # Create users table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id SERIAL PRIMARY KEY,
-                username VARCHAR(50) UNIQUE NOT NULL,
-                email VARCHAR(100) UNIQUE NOT NULL,
-                password_hash VARCHAR(255) NOT NULL,
-                privacy_mode BOOLEAN DEFAULT FALSE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Create scan_history table with privacy features
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS scan_history (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER REFERENCES users(id),
-                scan_type VARCHAR(20) NOT NULL,
-                content_hash VARCHAR(64),  -- Store hash instead of raw content for privacy
-                content_preview TEXT,      -- Small preview for user reference
-                result JSONB,
-                is_anonymized BOOLEAN DEFAULT FALSE,  -- Indicates if content was anonymized
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Create feedback table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS feedback (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER REFERENCES users(id),
-                scan_id INTEGER REFERENCES scan_history(id),
-                is_correct BOOLEAN,
-                comment TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Create privacy_settings table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS privacy_settings (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER REFERENCES users(id) UNIQUE,
-                store_raw_content BOOLEAN DEFAULT FALSE,
-                share_anonymous_data BOOLEAN DEFAULT TRUE,
-                auto_delete_after_days INTEGER DEFAULT 365,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        return True
-    except Exception as e:
-        print(f"Error initializing database: {e}")
-        if conn:
-            conn.rollback()
-            conn.close()
-        return False
+        try:
+            cursor = conn.cursor()
+            
+            # Create users table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS users (
+                    id SERIAL PRIMARY KEY,
+                    username VARCHAR(50) UNIQUE NOT NULL,
+                    email VARCHAR(100) UNIQUE NOT NULL,
+                    password_hash VARCHAR(255) NOT NULL,
+                    privacy_mode BOOLEAN DEFAULT FALSE,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            # Create scan_history table with privacy features
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS scan_history (
+                    id SERIAL PRIMARY KEY,
+                    user_id INTEGER REFERENCES users(id),
+                    scan_type VARCHAR(20) NOT NULL,
+                    content_hash VARCHAR(64),  -- Store hash instead of raw content for privacy
+                    content_preview TEXT,      -- Small preview for user reference
+                    result JSONB,
+                    is_anonymized BOOLEAN DEFAULT FALSE,  -- Indicates if content was anonymized
+                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            # Indexes are created by the migrations in utils/migrations.py
+            
+            # Create feedback table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS feedback (
+                    id SERIAL PRIMARY KEY,
+                    user_id INTEGER REFERENCES users(id),
+                    scan_id INTEGER REFERENCES scan_history(id),
+                    is_correct BOOLEAN,
+                    comment TEXT,
+                    content TEXT,              -- Message text sent with the feedback, for learning
+                    correct_label VARCHAR(20), -- Class the user named when the verdict was wrong
+                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            # Create privacy_settings table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS privacy_settings (
+                    id SERIAL PRIMARY KEY,
+                    user_id INTEGER REFERENCES users(id) UNIQUE,
+                    store_raw_content BOOLEAN DEFAULT FALSE,
+                    share_anonymous_data BOOLEAN DEFAULT TRUE,
+                    auto_delete_after_days INTEGER DEFAULT 365,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            conn.commit()
+            cursor.close()
+            return True
+        except Exception as e:
+            print(f"Error initializing database: {e}")
+            return False
 
-def save_scan_result(user_id: int, scan_type: str, content: str, result: dict, privacy_mode: bool = False):
-    """Save scan result with privacy-preserving options."""
-    conn = get_db_connection()
-    if conn is None:
-        return None
-    
-    try:
-        cursor = conn.cursor()
-        
-        # Handle privacy mode
-        content_hash = None
-        content_preview = None
-        is_anonymized = False
-        
-        if privacy_mode or scan_type in ['message', 'url']:
-            # Store hash instead of raw content
-            import hashlib
-            content_hash = hashlib.sha256(content.encode()).hexdigest()
-            # Store only a small preview for user reference
-            content_preview = content[:50] + "..." if len(content) > 50 else content
-            is_anonymized = True
-        else:
-            # For non-sensitive data, we can store more
-            content_preview = content[:100] + "..." if len(content) > 100 else content
-        
-        # Insert scan result
-        cursor.execute("""
-            INSERT INTO scan_history 
-            (user_id, scan_type, content_hash, content_preview, result, is_anonymized)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            RETURNING id
-        """, (user_id, scan_type, content_hash, content_preview, 
-              psycopg2.extras.Json(result), is_anonymized))
-        
-        scan_id = cursor.fetchone()['id']
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        return scan_id
-    except Exception as e:
-        print(f"Error saving scan result: {e}")
-        if conn:
-            conn.rollback()
-            conn.close()
-        return None
+def content_hash(content: str) -> str:
+    """SHA-256 hex digest stored in scan_history.content_hash for a scanned item."""
+    return hashlib.sha256(content.encode()).hexdigest()
 
-def get_user_privacy_settings(user_id: int):
-    """Get user privacy settings."""
-    conn = get_db_connection()
-    if conn is None:
-        return None
+def prepare_scan_row(user_id: int, scan_type: str, content: str, result: dict, privacy_mode: bool = False) -> tuple:
+    """Build the scan_history column values for one scan, applying privacy rules.
     
-    try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT store_raw_content, share_anonymous_data, auto_delete_after_days
-            FROM privacy_settings 
-            WHERE user_id = %s
-        """, (user_id,))
-        
-        result = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        
-        if result:
-            return dict(result)
-        else:
-            # Return default settings
-            return {
-                "store_raw_content": False,
-                "share_anonymous_data": True,
-                "auto_delete_after_days": 365
-            }
-    except Exception as e:
-        print(f"Error getting privacy settings: {e}")
-        if conn:
-            conn.close()
-        return None
+    The result column is left as a plain dict for the caller's driver to encode.
+    """
+    hashed_content = None
+    content_preview = None
+    is_anonymized = False
+    
+    if privacy_mode or scan_type in ['message', 'url']:
+        # Store hash instead of raw content
+        hashed_content = content_hash(content)
+        # Store only a small preview for user reference
+        content_preview = content[:50] + "..." if len(content) > 50 else content
+        is_anonymized = True
+    else:
+        # For non-sensitive data, we can store more
+        content_preview = content[:100] + "..." if len(content) > 100 else content
+    
+    return (user_id, scan_type, hashed_content, content_preview, result, is_anonymized)
 
-def update_user_privacy_settings(user_id: int, settings: dict):
-    """Update user privacy settings."""
-    conn = get_db_connection()
-    if conn is None:
-        return False
+def get_message_feedback_batch(after_id: int, limit: int, min_age_seconds: float = 60) -> Optional[List[dict]]:
+    """Get up to limit message feedback rows with id > after_id, joined to their scans.
     
-    try:
-        cursor = conn.cursor()
-        
-        # Check if settings exist
-        cursor.execute("SELECT id FROM privacy_settings WHERE user_id = %s", (user_id,))
-        existing = cursor.fetchone()
+    Only feedback the scan's owner gave while signed in counts, and only the
+    first of it per scan, so repeated posts cannot outweigh other users.
+    Rows younger than min_age_seconds are left for a later read: a feedback
+    row can commit after one with a higher id, which a watermark would skip.
+    
+    Only feedback that came with the scanned message text is returned. Each
+    row has the feedback id, is_correct, correct_label, that text and the
+    prediction that was shown to the user. Returns None on errors.
+    """
+    with db_connection() as conn:
+        if conn is None:
+            return None
         
-        if existing:
-            # Update existing settings
-            cursor.execute("""
-                UPDATE privacy_settings 
-                SET store_raw_content = %s, share_anonymous_data = %s, auto_delete_after_days = %s, updated_at = NOW()
-                WHERE user_id = %s
-            """, (settings.get('store_raw_content', False), 
-                  settings.get('share_anonymous_data', True),
-                  settings.get('auto_delete_after_days', 365),
-                  user_id))
-        else:
-            # Insert new settings
+        try:
+            cursor = conn.cursor()
             cursor.execute("""
-                INSERT INTO privacy_settings 
-                (user_id, store_raw_content, share_anonymous_data, auto_delete_after_days)
-                VALUES (%s, %s, %s, %s)
-            """, (user_id, settings.get('store_raw_content', False), 
-                  settings.get('share_anonymous_data', True),
-                  settings.get('auto_delete_after_days', 365)))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        return True
-    except Exception as e:
-        print(f"Error updating privacy settings: {e}")
-        if conn:
-            conn.rollback()
-            conn.close()
-        return False
\ No newline at end of file
+                SELECT f.id, f.is_correct, f.correct_label, f.content, s.result->>'prediction' AS prediction
+                FROM feedback f
+                JOIN scan_history s ON s.id = f.scan_id
+                WHERE f.id > %s
+                  AND f.timestamp < CURRENT_TIMESTAMP - %s * INTERVAL '1 second'
+                  AND s.scan_type = 'message'
+                  AND f.is_correct IS NOT NULL
+                  AND f.content IS NOT NULL
+                  AND f.user_id = s.user_id
+                  AND NOT EXISTS (
+                      SELECT 1 FROM feedback earlier
+                      WHERE earlier.scan_id = f.scan_id
+                        AND earlier.user_id = f.user_id
+                        AND earlier.id < f.id
+                  )
+                ORDER BY f.id
+                LIMIT %s
+            """, (after_id, min_age_seconds, limit))
+            
+            rows = cursor.fetchall()
+            cursor.close()
+            return [dict(row) for row in rows]
+        except Exception as e:
+            print(f"Error getting feedback: {e}")
+            return None
@@ -0,0 +1,327 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict
+
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+class PoolTimeout(Exception):
+    """No connection became available within the pool's timeout."""
+
+class _PoolCounters:
+    """Sizing settings and checkout counters shared by the sync and async pools."""
+
+    def __init__(self, min_size: int, max_size: int, timeout: float, check_idle_seconds: float):
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_idle_seconds = check_idle_seconds
+
+        self._idle = deque()  # (connection, returned_at), most recently returned last
+        self._size = 0  # open connections, idle or in use
+        self._closed = False
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+        self.created = 0
+        self.discarded = 0
+
+    def _record_checkout(self, waited: bool, waited_seconds: float):
+        self.checkouts += 1
+        if waited:
+            self.waits += 1
+            self.wait_seconds += waited_seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, waited_seconds)
+
+    def _stats(self) -> Dict[str, Any]:
+        in_use = self._size - len(self._idle)
+        return {
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "open": self._size,
+            "in_use": in_use,
+            "idle": len(self._idle),
+            "utilization": in_use / self.max_size,
+            "checkouts": self.checkouts,
+            "waits": self.waits,
+            "mean_wait_ms": 1000 * self.wait_seconds / self.waits if self.waits else 0.0,
+            "max_wait_ms": 1000 * self.max_wait_seconds,
+            "timeouts": self.timeouts,
+            "created": self.created,
+            "discarded": self.discarded
+        }
+
+    def _timeout_error(self) -> PoolTimeout:
+        self.timeouts += 1
+        return PoolTimeout(f"No database connection free after {self.timeout}s ({self.max_size} in use)")
+
+class ConnectionPool(_PoolCounters):
+    """Thread-safe pool of database connections shared by a worker process.
+
+    Up to max_size connections are open at once; min_size of them are
+    opened up front and kept even when idle. acquire blocks for up to
+    timeout seconds when every connection is in use. On checkout a
+    connection is checked locally (closed or left inside a transaction),
+    and one idle for more than check_idle_seconds is also pinged with
+    SELECT 1, so connections the server or a proxy dropped are replaced
+    instead of failing the request. 0 pings on every checkout.
+    """
+
+    def __init__(self, connect: Callable[[], Any], min_size: int = 1, max_size: int = 10,
+                 timeout: float = 5.0, check_idle_seconds: float = 30.0):
+        super().__init__(min_size, max_size, timeout, check_idle_seconds)
+        self.connect = connect
+        self._condition = threading.Condition()
+
+    def fill(self):
+        """Open connections until min_size exist; errors are left to the first checkout."""
+        while True:
+            with self._condition:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._open()
+            except Exception as e:
+                with self._condition:
+                    self._size -= 1
+                print(f"Could not pre-open database connection: {e}")
+                return
+            self.release(conn)
+
+    def acquire(self):
+        """Borrow a healthy connection, waiting up to timeout for one to free up."""
+        started = time.perf_counter()
+        deadline = started + self.timeout
+        waited = False
+        while True:
+            with self._condition:
+                while not self._idle and self._size >= self.max_size and not self._closed:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        raise self._timeout_error()
+                    waited = True
+                    self._condition.wait(remaining)
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                else:
+                    conn, returned_at = None, None
+                    self._size += 1
+
+            # Connect and ping outside the lock so other threads are not held up
+            try:
+                if conn is None:
+                    conn = self._open()
+                elif not self._healthy(conn, returned_at):
+                    self._discard(conn)
+                    continue
+            except Exception:
+                with self._condition:
+                    self._size -= 1
+                    self._condition.notify()
+                raise
+
+            with self._condition:
+                self._record_checkout(waited, time.perf_counter() - started)
+            return conn
+
+    def release(self, conn, discard: bool = False):
+        """Return a borrowed connection; broken or discarded ones are closed instead."""
+        if not discard and not conn.closed:
+            try:
+                # Never hand out a connection with a transaction left open
+                if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+        if discard or conn.closed:
+            self._discard(conn)
+            return
+
+        with self._condition:
+            if self._closed:
+                self._size -= 1
+                conn.close()
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._condition.notify()
+
+    def close(self):
+        """Close idle connections now and borrowed ones when they are returned."""
+        with self._condition:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._size -= 1
+                conn.close()
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return size, utilization and checkout wait counters."""
+        with self._condition:
+            return self._stats()
+
+    def _open(self):
+        conn = self.connect()
+        with self._condition:
+            self.created += 1
+        return conn
+
+    def _healthy(self, conn, returned_at: float) -> bool:
+        if conn.closed or conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            return False
+        if time.monotonic() - returned_at < self.check_idle_seconds:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._condition:
+            self._size -= 1
+            self.discarded += 1
+            self._condition.notify()
+
+class AsyncConnectionPool(_PoolCounters):
+    """asyncio counterpart of ConnectionPool for asyncpg connections.
+
+    Same sizing, bounded checkout wait, checkout health checks and
+    statistics, but waiting for a connection or a query suspends only the
+    calling coroutine, never the event loop. connect is a coroutine
+    function. The pool belongs to the event loop it is first used on.
+    """
+
+    def __init__(self, connect: Callable[[], Awaitable[Any]], min_size: int = 1, max_size: int = 10,
+                 timeout: float = 5.0, check_idle_seconds: float = 30.0):
+        super().__init__(min_size, max_size, timeout, check_idle_seconds)
+        self.connect = connect
+        self._condition = asyncio.Condition()
+
+    async def fill(self):
+        """Open connections until min_size exist; errors are left to the first checkout."""
+        while not self._closed and self._size < self.min_size:
+            self._size += 1
+            try:
+                conn = await self._open()
+            except Exception as e:
+                self._size -= 1
+                print(f"Could not pre-open database connection: {e}")
+                return
+            await self.release(conn)
+
+    async def acquire(self):
+        """Borrow a healthy connection, waiting up to timeout for one to free up."""
+        started = time.perf_counter()
+        deadline = started + self.timeout
+        waited = False
+        while True:
+            async with self._condition:
+                while not self._idle and self._size >= self.max_size and not self._closed:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        raise self._timeout_error()
+                    waited = True
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                else:
+                    conn, returned_at = None, None
+                    self._size += 1
+
+            try:
+                if conn is None:
+                    conn = await self._open()
+                elif not await self._healthy(conn, returned_at):
+                    await self._discard(conn)
+                    continue
+            except BaseException:
+                # Also on cancellation, so the slot is not leaked
+                self._size -= 1
+                async with self._condition:
+                    self._condition.notify()
+                raise
+
+            self._record_checkout(waited, time.perf_counter() - started)
+            return conn
+
+    async def release(self, conn, discard: bool = False):
+        """Return a borrowed connection; broken or discarded ones are closed instead."""
+        if not discard and not conn.is_closed():
+            try:
+                # Never hand out a connection with a transaction left open
+                if conn.is_in_transaction():
+                    await conn.execute("ROLLBACK")
+            except Exception:
+                discard = True
+        if discard or conn.is_closed():
+            await self._discard(conn)
+            return
+
+        async with self._condition:
+            if self._closed:
+                self._size -= 1
+                await conn.close()
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._condition.notify()
+
+    async def close(self):
+        """Close idle connections now and borrowed ones when they are returned."""
+        async with self._condition:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._size -= 1
+                await conn.close()
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return size, utilization and checkout wait counters."""
+        return self._stats()
+
+    async def _open(self):
+        conn = await self.connect()
+        self.created += 1
+        return conn
+
+    async def _healthy(self, conn, returned_at: float) -> bool:
+        if conn.is_closed() or conn.is_in_transaction():
+            return False
+        if time.monotonic() - returned_at < self.check_idle_seconds:
+            return True
+        try:
+            await conn.fetchval("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    async def _discard(self, conn):
+        # terminate does not wait on a connection that may be broken
+        conn.terminate()
+        self._size -= 1
+        self.discarded += 1
+        async with self._condition:
+            self._condition.notify()
@@ -0,0 +1,123 @@
+import json
+import os
+from collections import deque
+from typing import Dict, Iterable, List, Set
+
+# Keyword and phrase lists used by the URL and message heuristics
+DEFAULT_KEYWORDS_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "data", "keywords.json"
+)
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over named groups of case-insensitive patterns.
+
+    All patterns from every group are compiled into one automaton, so a
+    single pass over the input reports matches for all groups at once.
+    Transitions that fall back through failure links are memoized on first
+    use, which turns repeated lookups into one dict access per character.
+    Characters that occur in no pattern always lead back to the root and are
+    not memoized, so untrusted text cannot grow the automaton beyond
+    states x pattern alphabet.
+    """
+
+    def __init__(self, groups: Dict[str, Iterable[str]]):
+        self.groups = {name: [pattern.lower() for pattern in patterns if pattern] for name, patterns in groups.items()}
+        self._delta: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[List[tuple]] = [[]]
+        self._alphabet = frozenset(ch for patterns in self.groups.values() for pattern in patterns for ch in pattern)
+        self._build()
+
+    def _build(self):
+        # Trie of all patterns, tagging each terminal state with (group, pattern)
+        for group, patterns in self.groups.items():
+            for pattern in patterns:
+                state = 0
+                for ch in pattern:
+                    next_state = self._delta[state].get(ch)
+                    if next_state is None:
+                        next_state = len(self._delta)
+                        self._delta.append({})
+                        self._fail.append(0)
+                        self._outputs.append([])
+                        self._delta[state][ch] = next_state
+                    state = next_state
+                self._outputs[state].append((group, pattern))
+
+        # Breadth-first failure links; outputs inherit those of their failure state
+        queue = deque(self._delta[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in list(self._delta[state].items()):
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and ch not in self._delta[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._delta[fallback].get(ch, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._outputs[next_state] = self._outputs[next_state] + self._outputs[self._fail[next_state]]
+
+    def _resolve(self, state: int, ch: str) -> int:
+        """Follow failure links for a missing transition and memoize the result."""
+        fallback = state
+        while fallback and ch not in self._delta[fallback]:
+            fallback = self._fail[fallback]
+        target = self._delta[fallback].get(ch, 0)
+        self._delta[state][ch] = target
+        return target
+
+    def match(self, text: str) -> Dict[str, Set[str]]:
+        """Return the distinct patterns found in text, grouped by list name."""
+        found = {group: set() for group in self.groups}
+        delta = self._delta
+        outputs = self._outputs
+        alphabet = self._alphabet
+        state = 0
+        for ch in text.lower():
+            next_state = delta[state].get(ch)
+            if next_state is None:
+                next_state = self._resolve(state, ch) if ch in alphabet else 0
+            state = next_state
+            for group, pattern in outputs[state]:
+                found[group].add(pattern)
+        return found
+
+    def patterns(self, group: str) -> List[str]:
+        """Return the (lowercased) patterns configured for a group."""
+        return list(self.groups.get(group, []))
+
+def load_keyword_config(path: str = None) -> dict:
+    """Load the keyword configuration file (KEYWORD_LISTS_PATH or the bundled default)."""
+    path = path or os.getenv("KEYWORD_LISTS_PATH", DEFAULT_KEYWORDS_PATH)
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+# Shared configuration and automaton, built once per process
+_default_config = None
+_default_matcher = None
+
+def get_keyword_config() -> dict:
+    """Return the process-wide keyword configuration."""
+    global _default_config
+    if _default_config is None:
+        _default_config = load_keyword_config()
+    return _default_config
+
+def get_default_matcher() -> KeywordMatcher:
+    """Return one automaton covering every URL and message keyword group.
+
+    Message rules contribute "message:<name>:any" and "message:<name>:all"
+    groups so a rule's conditions can be checked from a single match result.
+    """
+    global _default_matcher
+    if _default_matcher is None:
+        config = get_keyword_config()
+        groups = {
+            "url_feature_keywords": config.get("url_feature_keywords", []),
+            "url_phishing_terms": config.get("url_phishing_terms", [])
+        }
+        for rule in config.get("message_patterns", []):
+            groups[f"message:{rule['name']}:any"] = rule.get("any", [])
+            groups[f"message:{rule['name']}:all"] = rule.get("all", [])
+        _default_matcher = KeywordMatcher(groups)
+    return _default_matcher
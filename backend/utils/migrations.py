@@ -0,0 +1,186 @@
+import os
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from psycopg2 import sql
+
+from utils.database import _connect
+
+# "true" to also apply pending migrations in the background when a worker
+# starts; by default they are a deploy step (`python migrate.py up`)
+DB_MIGRATE_ON_STARTUP = os.getenv("DB_MIGRATE_ON_STARTUP", "false").lower() == "true"
+
+# Advisory lock held while migrating, so concurrent workers never run them twice
+MIGRATION_LOCK_KEY = 727274
+
+class Migration(NamedTuple):
+    """One schema change, applied once and recorded in schema_migrations.
+
+    Statements of a migration with an index name run outside a transaction,
+    as CREATE INDEX CONCURRENTLY requires; the rest run in one transaction
+    together with the version record.
+    """
+    version: int
+    description: str
+    statements: Tuple[str, ...]
+    index: Optional[str] = None
+
+# Append new migrations with the next version; never edit applied ones.
+# Indexes on scan_history are built concurrently so scans keep being written.
+MIGRATIONS = [
+    Migration(1, "Index scan_history by content hash for verdict reuse", ("""
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_scan_history_content_hash
+        ON scan_history (scan_type, content_hash, timestamp DESC)
+        WHERE content_hash IS NOT NULL
+    """,), index="idx_scan_history_content_hash"),
+    Migration(2, "Index scan_history by user and time for scan history", ("""
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_scan_history_user_timestamp
+        ON scan_history (user_id, timestamp DESC)
+    """,), index="idx_scan_history_user_timestamp"),
+    Migration(3, "Index scan_history by user and scan type for risk scoring", ("""
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_scan_history_user_scan_type
+        ON scan_history (user_id, scan_type)
+    """,), index="idx_scan_history_user_scan_type"),
+    Migration(4, "Keep the message text and corrected class given with feedback", ("""
+        ALTER TABLE feedback
+        ADD COLUMN IF NOT EXISTS content TEXT,
+        ADD COLUMN IF NOT EXISTS correct_label VARCHAR(20)
+    """,)),
+]
+
+def _open_connection():
+    """Dedicated autocommit connection without the statement timeout, for long index builds."""
+    conn = _connect()
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute("SET statement_timeout = 0")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.close()
+    return conn
+
+def _applied_versions(conn) -> Dict[int, dict]:
+    cursor = conn.cursor()
+    cursor.execute("SELECT version, description, applied_at FROM schema_migrations ORDER BY version")
+    rows = cursor.fetchall()
+    cursor.close()
+    return {row['version']: row for row in rows}
+
+def migration_status() -> Optional[dict]:
+    """Current schema version with the applied and pending migrations; None on errors."""
+    try:
+        conn = _open_connection()
+    except Exception as e:
+        print(f"Error connecting to database: {e}")
+        return None
+    try:
+        applied = _applied_versions(conn)
+        return {
+            "version": max(applied, default=0),
+            "applied": list(applied.values()),
+            "pending": [m for m in MIGRATIONS if m.version not in applied]
+        }
+    except Exception as e:
+        print(f"Error reading schema version: {e}")
+        return None
+    finally:
+        conn.close()
+
+def _drop_invalid_index(cursor, name: str):
+    """Drop what a failed concurrent build left behind, which IF NOT EXISTS would keep."""
+    cursor.execute("""
+        SELECT n.nspname AS schema
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relname = %s AND n.nspname = current_schema() AND NOT i.indisvalid
+    """, (name,))
+    row = cursor.fetchone()
+    if row:
+        print(f"Dropping invalid index {name} left by an interrupted build")
+        cursor.execute(sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}.{}").format(
+            sql.Identifier(row['schema']), sql.Identifier(name)))
+
+def _apply(conn, migration: Migration):
+    cursor = conn.cursor()
+    try:
+        if migration.index:
+            _drop_invalid_index(cursor, migration.index)
+        else:
+            cursor.execute("BEGIN")
+        for statement in migration.statements:
+            cursor.execute(statement)
+        # A concurrent index already built is kept if this fails; IF NOT EXISTS reruns cleanly
+        cursor.execute("INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                       (migration.version, migration.description))
+        if not migration.index:
+            cursor.execute("COMMIT")
+    except Exception:
+        if not migration.index and not conn.closed:
+            cursor.execute("ROLLBACK")
+        raise
+    finally:
+        cursor.close()
+
+def run_migrations(target: Optional[int] = None, wait: bool = True) -> Optional[List[int]]:
+    """Apply pending migrations up to target (default: all) in version order.
+
+    Only one process migrates at a time. If another one holds the lock,
+    wait=True waits for it to finish; wait=False returns [] at once.
+    Returns the versions applied, or None if a migration failed.
+    """
+    try:
+        conn = _open_connection()
+    except Exception as e:
+        print(f"Error connecting to database: {e}")
+        return None
+
+    cursor = conn.cursor()
+    try:
+        if wait:
+            cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+        else:
+            cursor.execute("SELECT pg_try_advisory_lock(%s) AS locked", (MIGRATION_LOCK_KEY,))
+            if not cursor.fetchone()['locked']:
+                print("Another process is running migrations; skipping")
+                return []
+
+        # Read after taking the lock, so work another process finished is not redone
+        applied = _applied_versions(conn)
+        versions = []
+        for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+            if migration.version in applied or (target is not None and migration.version > target):
+                continue
+            started = time.perf_counter()
+            try:
+                _apply(conn, migration)
+            except Exception as e:
+                print(f"Error applying migration {migration.version} ({migration.description}): {e}")
+                return None
+            print(f"Applied migration {migration.version}: {migration.description} "
+                  f"({time.perf_counter() - started:.1f}s)")
+            versions.append(migration.version)
+        return versions
+    except Exception as e:
+        print(f"Error running migrations: {e}")
+        return None
+    finally:
+        cursor.close()
+        # Closing the session also releases the advisory lock
+        conn.close()
+
+def start_background_migrations() -> threading.Thread:
+    """Apply pending migrations in a daemon thread, so startup and readiness do not wait.
+
+    A build cut short by shutdown leaves an invalid index, which the next
+    run drops and rebuilds.
+    """
+    thread = threading.Thread(target=run_migrations, kwargs={"wait": False}, name="schema-migrations", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,292 @@
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import asyncpg
+
+from utils import async_database
+from utils.async_database import async_db_connection
+from utils.database import prepare_scan_row
+
+# "on" to queue scan_history rows in memory and write them in batches
+SCAN_WRITE_BEHIND = os.getenv("SCAN_WRITE_BEHIND", "off")
+# Most rows waiting in memory; scans beyond it are written immediately
+SCAN_WRITE_QUEUE_SIZE = int(os.getenv("SCAN_WRITE_QUEUE_SIZE", "10000"))
+# A flush starts once this many rows are queued, or after SCAN_WRITE_FLUSH_SECONDS
+SCAN_WRITE_BATCH_SIZE = int(os.getenv("SCAN_WRITE_BATCH_SIZE", "500"))
+SCAN_WRITE_FLUSH_SECONDS = float(os.getenv("SCAN_WRITE_FLUSH_SECONDS", "1"))
+# Scan IDs reserved from the scan_history sequence per round trip
+SCAN_ID_BLOCK_SIZE = int(os.getenv("SCAN_ID_BLOCK_SIZE", "1000"))
+# How long shutdown keeps retrying to write what is still queued
+SCAN_WRITE_SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("SCAN_WRITE_SHUTDOWN_TIMEOUT_SECONDS", "30"))
+
+COLUMNS = ("id", "user_id", "scan_type", "content_hash", "content_preview", "result", "is_anonymized", "timestamp")
+
+_writer = None
+_writer_loop = None
+
+class ScanWriter:
+    """Write-behind buffer for scan_history rows.
+
+    save reserves IDs from the table's sequence (a block at a time), queues
+    the rows and returns the IDs at once; a background task writes queued
+    rows with COPY when batch_size are waiting or every flush_seconds. Rows
+    stay queued when the database is unreachable and are retried on the next
+    flush. If one row makes a COPY fail, the batch is written row by row and
+    only the bad rows are dropped. Once queue_size rows are waiting, further
+    scans are written on the request path instead.
+
+    Queued rows are lost if the process dies without a graceful shutdown,
+    which is why the mode is off by default.
+    """
+
+    def __init__(self, queue_size: int = 10000, batch_size: int = 500, flush_seconds: float = 1.0,
+                 id_block_size: int = 1000):
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.id_block_size = id_block_size
+
+        self._rows = deque()
+        self._pending_ids = set()
+        self._ids = deque()
+        # Database LOCALTIMESTAMP minus local time, so queued rows carry the
+        # scan time on the same clock as the column default
+        self._clock_offset = None
+        self._id_lock = asyncio.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._closing = False
+
+        self.enqueued = 0
+        self.written = 0
+        self.direct_writes = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.flush_seconds_total = 0.0
+        self.max_flush_seconds = 0.0
+        self.last_flush_rows = 0
+        self.id_blocks = 0
+
+    def start(self):
+        """Start the background flush task on the running event loop."""
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def save(self, user_id: int, scans: List[Tuple[str, str, dict]], privacy_mode: bool = False) -> List[Optional[int]]:
+        """Queue (scan_type, content, result) scans and return their IDs in order.
+
+        Returns None for every scan if no IDs could be reserved or a direct
+        write failed.
+        """
+        if not scans:
+            return []
+
+        ids = await self._reserve_ids(len(scans))
+        if ids is None:
+            return [None] * len(scans)
+        scanned_at = datetime.now() + self._clock_offset
+        rows = [(scan_id,) + prepare_scan_row(user_id, scan_type, content, _snapshot(result), privacy_mode) + (scanned_at,)
+                for scan_id, (scan_type, content, result) in zip(ids, scans)]
+
+        if self._closing or len(self._rows) + len(rows) > self.queue_size:
+            # Full (or shutting down): write now, so memory stays bounded and
+            # callers feel the database's pace
+            self.direct_writes += len(rows)
+            return ids if await self._write(rows) else [None] * len(rows)
+
+        self._rows.extend(rows)
+        self._pending_ids.update(ids)
+        self.enqueued += len(rows)
+        self.max_depth = max(self.max_depth, len(self._rows))
+        if len(self._rows) >= self.batch_size:
+            self._wakeup.set()
+        return ids
+
+    async def wait_written(self, scan_id: int) -> bool:
+        """Flush now if scan_id is still queued, e.g. before feedback references it."""
+        if scan_id not in self._pending_ids:
+            return True
+        await self.flush()
+        return scan_id not in self._pending_ids
+
+    async def flush(self) -> bool:
+        """Write everything queued; False if rows remain because a write failed."""
+        async with self._flush_lock:
+            while self._rows:
+                batch = [self._rows.popleft() for _ in range(min(self.batch_size, len(self._rows)))]
+                if not await self._write(batch):
+                    # Put the batch back in front and retry on the next flush
+                    self._rows.extendleft(reversed(batch))
+                    return False
+                self._pending_ids.difference_update(row[0] for row in batch)
+            return True
+
+    async def close(self, timeout: float = 30.0):
+        """Stop the flush task and write the remaining rows, retrying for up to timeout seconds."""
+        self._closing = True
+        if self._task is not None:
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+        deadline = time.monotonic() + timeout
+        while not await self.flush() and time.monotonic() < deadline:
+            await asyncio.sleep(min(1.0, max(deadline - time.monotonic(), 0)))
+        if self._rows:
+            print(f"Could not write {len(self._rows)} queued scan results before shutdown")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth, row counters and flush latency."""
+        succeeded = self.flushes - self.failed_flushes
+        return {
+            "queue_depth": len(self._rows),
+            "max_queue_depth": self.max_depth,
+            "queue_size": self.queue_size,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "direct_writes": self.direct_writes,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "mean_flush_ms": 1000 * self.flush_seconds_total / succeeded if succeeded else 0.0,
+            "max_flush_ms": 1000 * self.max_flush_seconds,
+            "last_flush_rows": self.last_flush_rows,
+            "reserved_ids": len(self._ids),
+            "id_blocks": self.id_blocks
+        }
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error in scan result flush: {e}")
+
+    async def _reserve_ids(self, count: int) -> Optional[List[int]]:
+        async with self._id_lock:
+            if len(self._ids) < count:
+                async with async_db_connection() as conn:
+                    if conn is None:
+                        return None
+                    try:
+                        rows = await conn.fetch("""
+                            SELECT nextval(pg_get_serial_sequence('scan_history', 'id')) AS id, LOCALTIMESTAMP AS now
+                            FROM generate_series(1, $1)
+                        """, max(self.id_block_size, count - len(self._ids)))
+                        self._clock_offset = rows[0]['now'] - datetime.now()
+                    except Exception as e:
+                        print(f"Error reserving scan IDs: {e}")
+                        return None
+                self._ids.extend(row['id'] for row in rows)
+                self.id_blocks += 1
+            return [self._ids.popleft() for _ in range(count)]
+
+    async def _write(self, rows: List[tuple]) -> bool:
+        started = time.perf_counter()
+        self.flushes += 1
+        dropped = 0
+        async with async_db_connection() as conn:
+            if conn is None:
+                self.failed_flushes += 1
+                return False
+            try:
+                try:
+                    await conn.copy_records_to_table("scan_history", records=rows, columns=COLUMNS)
+                except (asyncpg.DataError, asyncpg.IntegrityConstraintViolationError) as e:
+                    # Also covers rows a lost acknowledgement left already written
+                    print(f"Scan result batch rejected ({e}); writing its rows one by one")
+                    dropped = await self._write_rows_singly(conn, rows)
+            except Exception as e:
+                print(f"Error writing scan results: {e}")
+                self.failed_flushes += 1
+                return False
+
+        elapsed = time.perf_counter() - started
+        self.written += len(rows) - dropped
+        self.flush_seconds_total += elapsed
+        self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+        self.last_flush_rows = len(rows)
+        return True
+
+    async def _write_rows_singly(self, conn, rows: List[tuple]) -> int:
+        dropped = 0
+        for row in rows:
+            try:
+                await conn.execute("""
+                    INSERT INTO scan_history
+                    (id, user_id, scan_type, content_hash, content_preview, result, is_anonymized, timestamp)
+                    VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+                    ON CONFLICT (id) DO NOTHING
+                """, *row)
+            except (asyncpg.DataError, asyncpg.IntegrityConstraintViolationError) as e:
+                print(f"Dropping scan result {row[0]}: {e}")
+                dropped += 1
+        self.dropped += dropped
+        return dropped
+
+def _snapshot(result: dict) -> dict:
+    """Copy of a result as it is stored, taken before the caller adds its scan_id."""
+    return {key: value for key, value in json.loads(json.dumps(result)).items() if key != "scan_id"}
+
+def get_scan_writer() -> Optional[ScanWriter]:
+    """The writer of the running event loop, or None when write-behind is off."""
+    if _writer is not None and _writer_loop is asyncio.get_running_loop():
+        return _writer
+    return None
+
+async def start_scan_writer():
+    """Start write-behind persistence on this event loop if SCAN_WRITE_BEHIND is on."""
+    global _writer, _writer_loop
+    if SCAN_WRITE_BEHIND != "on":
+        return
+    _writer = ScanWriter(
+        queue_size=SCAN_WRITE_QUEUE_SIZE,
+        batch_size=SCAN_WRITE_BATCH_SIZE,
+        flush_seconds=SCAN_WRITE_FLUSH_SECONDS,
+        id_block_size=SCAN_ID_BLOCK_SIZE
+    )
+    _writer_loop = asyncio.get_running_loop()
+    _writer.start()
+
+async def stop_scan_writer():
+    """Write the queued rows and stop, e.g. on shutdown before the pool closes."""
+    global _writer
+    writer = get_scan_writer()
+    _writer = None
+    if writer is not None:
+        await writer.close(SCAN_WRITE_SHUTDOWN_TIMEOUT_SECONDS)
+
+def scan_writer_stats() -> Optional[Dict[str, Any]]:
+    """Queue depth and flush latency of the writer, if write-behind is on."""
+    return _writer.stats() if _writer is not None else None
+
+async def save_scan_result(user_id: int, scan_type: str, content: str, result: dict, privacy_mode: bool = False):
+    """Save one scan, through the write-behind queue when it is on."""
+    writer = get_scan_writer()
+    if writer is None:
+        return await async_database.save_scan_result(user_id, scan_type, content, result, privacy_mode)
+    return (await writer.save(user_id, [(scan_type, content, result)], privacy_mode))[0]
+
+async def save_scan_results(user_id: int, scans: List[Tuple[str, str, dict]], privacy_mode: bool = False) -> List[Optional[int]]:
+    """Save several scans, through the write-behind queue when it is on."""
+    writer = get_scan_writer()
+    if writer is None:
+        return await async_database.save_scan_results(user_id, scans, privacy_mode)
+    return await writer.save(user_id, scans, privacy_mode)
+
+async def wait_for_scan(scan_id: int) -> bool:
+    """Make sure a scan saved through the queue is in the database."""
+    writer = get_scan_writer()
+    return True if writer is None else await writer.wait_written(scan_id)
@@ -0,0 +1,83 @@
+import builtins
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Tuple
+
+# Slowest imports printed at startup and returned by the readiness endpoint
+REPORTED_IMPORTS = 15
+
+class StartupProfile:
+    """Import and warm-up timings of a worker, and whether it is ready.
+
+    Import times are cumulative per module: the time of the first import of
+    a module includes the modules it pulls in, like the cumulative column of
+    python -X importtime. Modules already loaded are not counted again.
+    """
+
+    def __init__(self):
+        self.imports: Dict[str, float] = {}
+        self.phases: Dict[str, float] = {}
+        self.ready = False
+        self._started = time.perf_counter()
+        self._ready_after = None
+
+    @contextmanager
+    def import_timer(self):
+        """Record how long each module first imported inside the block takes."""
+        original_import = builtins.__import__
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            # "from package import module" loads the submodule, so it is a candidate too
+            candidates = [name] + [f"{name}.{item}" for item in fromlist or () if item != "*"]
+            new_modules = [module for module in candidates if module not in sys.modules]
+            # Relative and repeated imports are cheap lookups; only time new modules
+            if level or not new_modules:
+                return original_import(name, globals, locals, fromlist, level)
+            started = time.perf_counter()
+            try:
+                return original_import(name, globals, locals, fromlist, level)
+            finally:
+                loaded = [module for module in new_modules if module in sys.modules]
+                if loaded:
+                    self.imports.setdefault(", ".join(loaded), time.perf_counter() - started)
+
+        builtins.__import__ = timed_import
+        try:
+            yield self
+        finally:
+            builtins.__import__ = original_import
+
+    @contextmanager
+    def phase(self, name: str):
+        """Record the duration of a named startup phase."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - started
+
+    def mark_ready(self):
+        self.ready = True
+        self._ready_after = time.perf_counter() - self._started
+
+    def slowest_imports(self, limit: int = REPORTED_IMPORTS) -> List[Tuple[str, float]]:
+        return sorted(self.imports.items(), key=lambda item: -item[1])[:limit]
+
+    def report(self) -> Dict[str, Any]:
+        """Timings in milliseconds, slowest imports first."""
+        return {
+            "ready": self.ready,
+            "ready_after_ms": round(self._ready_after * 1000, 1) if self._ready_after is not None else None,
+            "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()},
+            "imports_ms": {name: round(seconds * 1000, 1) for name, seconds in self.slowest_imports()}
+        }
+
+    def print_report(self):
+        for name, seconds in self.phases.items():
+            print(f"Startup phase {name}: {seconds * 1000:.1f} ms")
+        for name, seconds in self.slowest_imports():
+            print(f"Import {name}: {seconds * 1000:.1f} ms")
+
+# Profile of this worker process
+startup_profile = StartupProfile()